@@ -0,0 +1,113 @@
+"""
+Микробенчмарк разбора callback_data администратора.
+
+Сравнивает прежнюю цепочку startswith/split из AdminFlow.handle_callback
+(воспроизведена ниже без вызовов обработчиков) с admin_callbacks.resolve()
+на смеси реальных callback_data в старом текстовом и в упакованном
+(callback_codec.py) виде. Прежний код перед разбором всегда читал
+состояние администратора из базы, поэтому отдельно печатается, сколько
+чтений состояния приходится на callback теперь.
+
+Запуск: python benchmarks/bench_callback_router.py --iterations 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from admin_constants import *  # noqa: E402,F403
+from admin_settings import GAME_WORKFLOW  # noqa: E402
+from admin_flow import admin_callbacks  # noqa: E402
+from callback_codec import decode_callback, encode_callback  # noqa: E402
+
+
+def sample_callbacks() -> list[str]:
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    return [
+        f"{ADMIN}:{SELECT}|{ids[0]}",
+        f"{ADMIN}:{DONE}:{ids[1]}",
+        f"{ADMIN}:{CLOSE_QUESTION}|{ids[2]}",
+        f"{ADMIN}:{CHANGE_QUESTION}|3",
+        f"{ADMIN}:{PAGE_GAMES}|2",
+        f"{ADMIN}:{PAGE_QUESTIONS}|1",
+        f"{ADMIN}:{WAITING_START}:{GAME_TO_START}:{ids[0]}",
+        f"{ADMIN}:{SHOW_RESULTS}:{ids[1]}",
+        f"{ADMIN}:{GAME_OPTIONS}:{ids[0]}",
+        f"{ADMIN}:{QUESTION_OPTIONS}:{ids[1]}",
+        f"{ADMIN}:{ADMIN_OPTIONS}",
+    ]
+
+
+def legacy_resolve(data: str):
+    """
+    Разбор из прежнего handle_callback: та же последовательность проверок.
+    """
+    if not data.startswith(f"{ADMIN}:"):
+        return None
+    next_state = data.split(":", 1)[1]
+    raw_state = next_state.split(":")[0]
+    if next_state.startswith(f"{SHOW_RESULTS}:"):
+        return SHOW_RESULTS, next_state.split(":")[-1]
+    if next_state.startswith(f"{GAME_WORKFLOW}:"):
+        return GAME_WORKFLOW, next_state.split(":")[-1]
+    if next_state.startswith(f"{DONE}"):
+        return DONE, next_state.split(":")[-1]
+    if next_state.startswith(f"{SELECT}|"):
+        return SELECT, next_state.split("|")[-1]
+    if next_state.startswith(f"{CLOSE_QUESTION}|"):
+        return CLOSE_QUESTION, next_state.split("|")[-1]
+    if next_state.startswith(f"{CHANGE_QUESTION}|"):
+        return CHANGE_QUESTION, int(next_state.split("|")[-1])
+    if next_state.startswith(f"{PAGE_GAMES}"):
+        return PAGE_GAMES, int(next_state.split("|", 1)[-1])
+    if next_state.startswith(f"{PAGE_QUESTIONS}"):
+        return PAGE_QUESTIONS, int(next_state.split("|", 1)[-1])
+    if next_state.startswith(f"{PAGE_VARIANTS}"):
+        return PAGE_VARIANTS, int(next_state.split("|", 1)[-1])
+    if next_state.startswith(f"{CHANGE_CORRECTNESS}"):
+        return CHANGE_CORRECTNESS, next_state.split(":")[-1]
+    if next_state.startswith(f"{WAITING_START}:"):
+        return WAITING_START, next_state.split(":")[-1]
+    return raw_state, next_state
+
+
+def measure(resolve, callbacks: list[str], iterations: int) -> float:
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        resolve(callbacks[i % len(callbacks)])
+    return (time.perf_counter() - started_at) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    callbacks = sample_callbacks()
+    for data in callbacks:
+        route, arguments = admin_callbacks.resolve(data)
+        print(f"{data[:40]:40} -> {route.handler.__name__}{arguments if route.action else ''}")
+
+    packed = []
+    for data in callbacks:
+        payload = decode_callback(data)
+        packed.append(encode_callback(payload.scope, payload.action, *payload.args))
+
+    legacy = measure(legacy_resolve, callbacks, args.iterations)
+    router = measure(admin_callbacks.resolve, callbacks, args.iterations)
+    router_packed = measure(admin_callbacks.resolve, packed, args.iterations)
+    state_reads = sum(admin_callbacks.resolve(data)[0].needs_state for data in callbacks) / len(callbacks)
+    print(f"legacy chain:    {legacy * 1e6:.2f} us/callback, state reads per callback: 1.00")
+    print(f"router, text:    {router * 1e6:.2f} us/callback, state reads per callback: {state_reads:.2f}")
+    print(f"router, packed:  {router_packed * 1e6:.2f} us/callback")
+    print(f"callback_data size, bytes: text max {max(map(len, callbacks))}, packed max {max(map(len, packed))}")
+
+
+if __name__ == "__main__":
+    main()
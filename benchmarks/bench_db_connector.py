@@ -0,0 +1,86 @@
+"""
+Бенчмарк пропускной способности обработки апдейтов с блокирующим
+DatabaseConnector и с AsyncDatabaseConnector.
+
+Каждый "апдейт" повторяет горячий путь GamerFlow.handle_callback:
+запись ответа и увеличение счёта (два commit), плюс ожидание ответа
+Telegram API. Дополнительно измеряется максимальная задержка event loop.
+
+Запуск: python benchmarks/bench_db_connector.py --updates 300 --api-latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from queries import DatabaseConnector, AsyncDatabaseConnector, init_db_connector  # noqa: E402
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    max_lag = 0.0
+    while not stop.is_set():
+        started_at = time.monotonic()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.monotonic() - started_at - interval)
+    return max_lag
+
+
+async def handle_update(connector, blocking: bool, player_id: int, game_session_id: str, variant_id: str, api_latency: float):
+    if blocking:
+        connector.create_answer(variant_id, player_id, f"answer:{variant_id}", int(time.time()))
+        connector.increase_result_score(player_id, game_session_id, 1)
+    else:
+        await connector.create_answer(variant_id, player_id, f"answer:{variant_id}", int(time.time()))
+        await connector.increase_result_score(player_id, game_session_id, 1)
+    # ответ Telegram API на query.answer()
+    await asyncio.sleep(api_latency)
+
+
+async def run(blocking: bool, updates: int, api_latency: float) -> dict:
+    directory = tempfile.mkdtemp()
+    async_connector = init_db_connector(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    blocking_connector = DatabaseConnector(async_connector.session_factory())
+    connector: DatabaseConnector | AsyncDatabaseConnector = blocking_connector if blocking else async_connector
+    game = blocking_connector.create_game("quiz", "benchmark")
+    game_session = blocking_connector.create_game_session(game.id, "BENCH", "benchmark")
+    question = blocking_connector.create_question(game.id, "question")
+    variant = blocking_connector.create_variant(question.id, "variant", True)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started_at = time.monotonic()
+    await asyncio.gather(*(
+        handle_update(connector, blocking, player_id, game_session.id, variant.id, api_latency)
+        for player_id in range(updates)
+    ))
+    duration = time.monotonic() - started_at
+    stop.set()
+    max_lag = await lag_task
+    return {
+        "mode": "blocking" if blocking else "async",
+        "updates": updates,
+        "duration_s": round(duration, 3),
+        "throughput_per_s": round(updates / duration, 1),
+        "max_loop_lag_ms": round(max_lag * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    for blocking in (True, False):
+        print(asyncio.run(run(blocking, args.updates, args.api_latency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Бенчмарк снятия клавиатур при закрытии вопроса.
+
+Сравнивает последовательный обход сообщений (как раньше работал
+remove_inline_keyboards) с AdminFlow.remove_inline_keyboards, который
+правит сообщения параллельно через Broadcaster. Telegram API заменён
+заглушкой с задержкой --api-latency. Игроки, которые уже ответили,
+сами убрали клавиатуру и в реестр не попадают (--answered-share).
+
+Запуск: python benchmarks/bench_keyboard_teardown.py --players 300 --global-rate 30
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("BROADCAST_PER_CHAT_INTERVAL", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from admin_flow import AdminFlow  # noqa: E402
+from admin_sessions import admin_sessions  # noqa: E402
+from answer_buffer import answer_buffer  # noqa: E402
+from broadcaster import Broadcaster  # noqa: E402
+from game_codes import game_codes  # noqa: E402
+from keyboard_cache import KeyboardCache  # noqa: E402
+from leaderboard import leaderboards  # noqa: E402
+from live_game_state import live_games  # noqa: E402
+from message_registry import MessageRegistry  # noqa: E402
+from queries import db_connector  # noqa: E402
+from question_scheduler import QuestionScheduler  # noqa: E402
+
+
+class FakeBot:
+    def __init__(self, api_latency: float):
+        self.api_latency = api_latency
+        self.edits = 0
+
+    async def edit_message_reply_markup(self, chat_id: int, message_id: int, reply_markup=None):
+        await asyncio.sleep(self.api_latency)
+        self.edits += 1
+        return True
+
+
+def fill(registry: MessageRegistry, players: int, answered_share: float):
+    unanswered = players - int(players * answered_share)
+    for chat_id in range(unanswered):
+        registry.record("session", "question", chat_id, chat_id + 1)
+
+
+async def sequential(bot: FakeBot, registry: MessageRegistry):
+    for chat_id, message_ids in registry.pop("session").items():
+        for message_id in message_ids:
+            await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None)
+
+
+async def run(args) -> list[dict]:
+    reports = []
+    registry = MessageRegistry()
+    admin_flow = AdminFlow(
+        db_connector,
+        Broadcaster(global_rate=args.global_rate),
+        answer_buffer,
+        live_games,
+        leaderboards,
+        QuestionScheduler(db_connector),
+        registry,
+        KeyboardCache(),
+        game_codes,
+        admin_sessions,
+    )
+    for mode in ("sequential", "concurrent"):
+        bot = FakeBot(args.api_latency)
+        fill(registry, args.players, args.answered_share)
+        started_at = time.monotonic()
+        if mode == "sequential":
+            await sequential(bot, registry)
+        else:
+            await admin_flow.remove_inline_keyboards(bot, "session")
+        reports.append({
+            "mode": mode,
+            "players": args.players,
+            "edits": bot.edits,
+            "duration_s": round(time.monotonic() - started_at, 3),
+            "left_in_registry": len(registry),
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=300)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--global-rate", type=float, default=1000)
+    parser.add_argument("--answered-share", type=float, default=0.0)
+    args = parser.parse_args()
+    for report in asyncio.run(run(args)):
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
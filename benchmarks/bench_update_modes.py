@@ -0,0 +1,91 @@
+"""
+Сравнение polling и webhook на локальной заглушке Bot API (fake_bot_api.py).
+
+Для каждого режима поднимается заглушка, бот собирается через
+main.build_application() и проигрывает один и тот же сценарий
+(по умолчанию - вход --players игроков в игру). Печатается JSON с
+пропускной способностью и задержкой от выдачи апдейта до ответа бота.
+
+Запуск: python benchmarks/bench_update_modes.py --players 200 --api-latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+API_PORT = 8081
+WEBHOOK_PORT = 8082
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ["BOT_API_BASE_URL"] = f"http://127.0.0.1:{API_PORT}/bot"
+os.environ.setdefault("CONCURRENT_UPDATES", "32")
+os.environ.setdefault("BROADCAST_PER_CHAT_INTERVAL", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main as bot_main  # noqa: E402
+from fake_bot_api import FakeBotApi, join_scenario, load_updates, serve  # noqa: E402
+from game_codes import game_codes  # noqa: E402
+from queries import db_connector  # noqa: E402
+from webhook_server import WebhookServer, run_webhook  # noqa: E402
+
+
+async def run_polling(application):
+    await application.initialize()
+    await application.post_init(application)
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+    await application.start()
+    return application
+
+
+async def stop_polling(application):
+    await application.updater.stop()
+    await application.stop()
+    await application.post_shutdown(application)
+    await application.shutdown()
+
+
+async def run(mode: str, updates: list[dict], api_latency: float) -> dict:
+    api = FakeBotApi(updates, api_latency)
+    runner = await serve(api, "127.0.0.1", API_PORT)
+    application = bot_main.build_application()
+    if mode == "polling":
+        await run_polling(application)
+        await api.done.wait()
+        await stop_polling(application)
+    else:
+        stop_event = asyncio.Event()
+        server = WebhookServer(application, "127.0.0.1", WEBHOOK_PORT, "/telegram", "benchmark-secret")
+        task = asyncio.create_task(run_webhook(application, f"http://127.0.0.1:{WEBHOOK_PORT}", stop_event=stop_event, server=server))
+        await api.done.wait()
+        stop_event.set()
+        await task
+    await runner.cleanup()
+    return {"mode": mode, **api.report()}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", help="JSONL с записанными апдейтами")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    game = await db_connector.create_game("quiz", "benchmark")
+    game_code = (await game_codes.allocate(game.id, "benchmark")).game_code
+    for index, mode in enumerate(("polling", "webhook")):
+        if args.updates:
+            updates = load_updates(args.updates)
+        else:
+            # у каждого режима свои игроки, чтобы оба проходили регистрацию с нуля
+            updates = join_scenario(args.players, game_code, first_chat_id=10_000 + index * 100_000)
+        print(json.dumps(await run(mode, updates, args.api_latency), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Проверка резервного файла AnswerBuffer.
+
+Коннектор, который всегда падает при записи, заставляет ответ исчерпать
+ANSWER_FLUSH_RETRIES попыток. Скрипт проверяет, что ответ сохранён
+в JSON-файл в dump_dir с теми же полями, что у PendingAnswer,
+и завершается с кодом 1, если файла нет или он отличается.
+
+Запуск: python benchmarks/check_answer_dump.py
+"""
+
+import asyncio
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from answer_buffer import AnswerBuffer, PendingAnswer  # noqa: E402
+
+
+class FailingConnector:
+    async def save_answers(self, answers: list[PendingAnswer]):
+        raise RuntimeError("database is unavailable")
+
+
+async def run(dump_dir: str) -> list[dict]:
+    buffer = AnswerBuffer(FailingConnector(), flush_interval=0.01, max_attempts=3, dump_dir=dump_dir)
+    # те же типы полей, что у ответа из GamerFlow.handle_callback
+    buffer.put(PendingAnswer("variant-id", 42, "session-id", "game_workflow:variant-id", int(time.time()), 1, 1500))
+    await buffer.start()
+    await buffer.stop()
+    dumped = []
+    for path in sorted(glob.glob(os.path.join(dump_dir, "*.json"))):
+        with open(path, encoding="utf-8") as file:
+            dumped.extend(json.load(file))
+    return dumped
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as dump_dir:
+        dumped = asyncio.run(run(dump_dir))
+    expected = {"variant_id": "variant-id", "telegram_id": 42, "game_session_id": "session-id", "answer_text": "game_workflow:variant-id", "score": 1, "response_time_ms": 1500}
+    ok = len(dumped) == 1 and all(dumped[0].get(key) == value for key, value in expected.items()) and isinstance(dumped[0].get("answered_at"), int)
+    print(f"dumped answers: {dumped}")
+    print("ok" if ok else "FAILED: ответ не сохранён в резервный файл")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Проверка планов запросов горячего пути DatabaseConnector.
+
+Скрипт вызывает методы коннектора на временной базе, перехватывает
+выполненный SQL и прогоняет каждый SELECT/UPDATE/DELETE через
+EXPLAIN QUERY PLAN. Если хоть один запрос читает таблицу целиком (SCAN;
+просмотр уже отфильтрованного подзапроса не считается),
+скрипт печатает план и завершается с кодом 1.
+
+Запуск: python benchmarks/check_query_plans.py
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import event  # noqa: E402
+from models import Base  # noqa: E402
+from queries import DatabaseConnector, init_db_connector  # noqa: E402
+from answer_buffer import PendingAnswer  # noqa: E402
+
+
+def hot_queries(connector: DatabaseConnector, game_id: str, game_session_id: str, question_id: str, variant_id: str, telegram_id: int):
+    """
+    Запросы, которые выполняются на каждый апдейт во время игры.
+    """
+    connector.get_player_by_telegram_id(telegram_id)
+    connector.update_player_fields_by_telegram_id(telegram_id, state="check")
+    connector.get_players_by_game_session_id(game_session_id)
+    connector.get_internal_user_by_telegram_id(0)
+    connector.update_internal_user_state(0, "check")
+    connector.set_internal_user_state(0, "check")
+    connector.get_game_session_by_code("CHECK")
+    connector.get_game_session(game_session_id)
+    connector.update_game_session_question_id(game_session_id, question_id)
+    connector.get_questions_by_game(game_id)
+    connector.get_question(question_id)
+    connector.get_variants_by_question(question_id)
+    connector.get_correct_variants_by_question_id(question_id)
+    connector.get_variants_by_game(game_id)
+    connector.get_variant(variant_id)
+    connector.increase_result_score(telegram_id, game_session_id, 1)
+    connector.save_answers([PendingAnswer(variant_id, telegram_id, game_session_id, "check", int(time.time()), 1)])
+    connector.get_results_for_game_session(game_session_id)
+    # страницы списков администратора
+    connector.get_games_page(game_id, 6, after=game_id)
+    connector.get_games_page(game_id, 6, before=game_id)
+    connector.count_games_by_creator_id(game_id)
+    connector.get_questions_page(game_id, 6, after=0)
+    connector.get_questions_page(game_id, 6, offset=6)
+    connector.count_questions_by_game(game_id)
+    connector.get_variants_page(question_id, 6, before=variant_id)
+    connector.count_variants_by_question(question_id)
+    # порядок вопросов
+    connector.get_next_question(game_id, 0)
+    connector.get_previous_question(game_id, 1)
+
+
+def scanned_table(detail: str) -> str | None:
+    words = detail.split()
+    if not words or words[0].upper() != "SCAN":
+        return None
+    # в старых версиях SQLite: "SCAN TABLE players"
+    name = words[2] if len(words) > 2 and words[1].upper() == "TABLE" else words[1]
+    return name if name in Base.metadata.tables else None
+
+
+def main() -> int:
+    async_connector = init_db_connector("sqlite://")
+    engine = async_connector.session_factory.kw["bind"]
+    connector = DatabaseConnector(async_connector.session_factory())
+
+    internal_user = connector.create_internal_user(0, "check", "check")
+    game = connector.create_game("quiz", "check", created_by=internal_user.id)
+    game_session = connector.create_game_session(game.id, "CHECK", "check")
+    question = connector.create_question(game.id, "question")
+    variant = connector.create_variant(question.id, "variant", True)
+    player = connector.create_player(1, "check", "check", "check", game_session.id)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    hot_queries(connector, game.id, game_session.id, question.id, variant.id, player.telegram_id)
+    event.remove(engine, "before_cursor_execute", record)
+
+    failures = 0
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            details = [row[-1] for row in plan]
+            if any(scanned_table(detail) for detail in details):
+                failures += 1
+                print(f"SCAN: {' '.join(statement.split())}")
+                for detail in details:
+                    print(f"    {detail}")
+    print(f"checked {len(statements)} statements, {failures} with full scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
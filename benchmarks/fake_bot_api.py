@@ -0,0 +1,259 @@
+"""
+Локальная заглушка Telegram Bot API для офлайн-бенчмарков.
+
+Сервер отвечает на методы, которые использует бот (getMe, getUpdates,
+setWebhook, sendMessage, sendPhoto, editMessageReplyMarkup, ...) с
+настраиваемой задержкой и проигрывает заранее записанные апдейты.
+Апдейты каждого чата отдаются по одному: следующий апдейт чата
+появляется, когда бот ответил на предыдущий (как живой игрок), и время
+от выдачи апдейта до ответа записывается как задержка обработки.
+В режиме polling апдейты забираются через getUpdates, после setWebhook
+сервер сам отправляет их POST-запросами на адрес бота.
+
+Апдейты - JSONL, по одному объекту Update Telegram в строке (например,
+сохранённый ответ getUpdates). Без файла генерируется сценарий входа
+игроков в игру: /start, код игры, никнейм.
+
+Запуск отдельно: python benchmarks/fake_bot_api.py --port 8081 --players 200
+затем бот с BOT_API_BASE_URL=http://127.0.0.1:8081/bot
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import time
+from collections import deque
+
+from aiohttp import ClientSession, web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bot", "username": "fake_bot"}
+# Методы без chat_id, ответ на которые привязывается к апдейту по id callback_query
+CALLBACK_METHODS = {"answerCallbackQuery"}
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+
+def join_scenario(players: int, game_code: str, first_chat_id: int = 10_000) -> list[dict]:
+    updates = []
+    for chat_id in range(first_chat_id, first_chat_id + players):
+        user = {"id": chat_id, "is_bot": False, "first_name": f"player{chat_id}"}
+        chat = {"id": chat_id, "type": "private"}
+        for text in ("/start", game_code, f"nick{chat_id}"):
+            message = {"message_id": len(updates) + 1, "date": int(time.time()), "chat": chat, "from": user, "text": text}
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+            updates.append({"message": message})
+    return updates
+
+
+def load_updates(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def update_chat_id(update: dict) -> int | None:
+    for key in ("message", "edited_message"):
+        if key in update:
+            return update[key]["chat"]["id"]
+    if "callback_query" in update:
+        return update["callback_query"]["from"]["id"]
+    return None
+
+
+class FakeBotApi:
+    def __init__(self, updates: list[dict], api_latency: float = 0.05, reply_timeout: float = 5.0):
+        self.api_latency = api_latency
+        self.reply_timeout = reply_timeout
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        # чат -> апдейты, которые ещё не выданы
+        self.scripts: dict[int, deque[dict]] = {}
+        for update in updates:
+            self.scripts.setdefault(update_chat_id(update), deque()).append(update)
+        self.total = len(updates)
+        # выданные апдейты, на которые бот ещё не ответил: чат -> время выдачи
+        self.waiting: dict[int, float] = {}
+        self.callback_chats: dict[str, int] = {}
+        self.ready: deque[dict] = deque()
+        self.ready_event = asyncio.Event()
+        self.webhook_url: str | None = None
+        self.webhook_secret: str | None = None
+        self.webhook_task: asyncio.Task | None = None
+        self.webhook_connections = asyncio.Semaphore(40)
+        self.latencies: list[float] = []
+        self.api_calls: dict[str, int] = {}
+        self.timeouts = 0
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.done = asyncio.Event()
+
+    # ---------------------------
+    # Выдача апдейтов
+    # ---------------------------
+    def start(self):
+        self.started_at = time.monotonic()
+        for chat_id in list(self.scripts):
+            self.release_next(chat_id)
+        asyncio.create_task(self.watch_timeouts())
+
+    def release_next(self, chat_id: int):
+        script = self.scripts.get(chat_id)
+        if not script:
+            self.scripts.pop(chat_id, None)
+            if not self.scripts and not self.waiting:
+                self.finished_at = time.monotonic()
+                self.done.set()
+            return
+        update = dict(script.popleft(), update_id=next(self.update_ids))
+        if "callback_query" in update:
+            self.callback_chats[update["callback_query"]["id"]] = chat_id
+        self.waiting[chat_id] = time.monotonic()
+        self.ready.append(update)
+        self.ready_event.set()
+
+    def replied(self, chat_id: int | None):
+        issued_at = self.waiting.pop(chat_id, None)
+        if issued_at is None:
+            return
+        self.latencies.append(time.monotonic() - issued_at)
+        self.release_next(chat_id)
+
+    async def watch_timeouts(self):
+        while not self.done.is_set():
+            await asyncio.sleep(self.reply_timeout / 4)
+            now = time.monotonic()
+            for chat_id, issued_at in list(self.waiting.items()):
+                if now - issued_at > self.reply_timeout:
+                    # апдейт без ответа бота: не ждём его и идём дальше
+                    self.timeouts += 1
+                    del self.waiting[chat_id]
+                    self.release_next(chat_id)
+
+    async def take_updates(self, timeout: float, limit: int) -> list[dict]:
+        if not self.ready:
+            self.ready_event.clear()
+            try:
+                await asyncio.wait_for(self.ready_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch = []
+        while self.ready and len(batch) < limit:
+            batch.append(self.ready.popleft())
+        return batch
+
+    async def push_webhook(self):
+        async with ClientSession() as session:
+            while True:
+                for update in await self.take_updates(1.0, 100):
+                    await self.webhook_connections.acquire()
+                    asyncio.create_task(self.post_update(session, update))
+
+    async def post_update(self, session: ClientSession, update: dict):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        try:
+            async with session.post(self.webhook_url, json=update, headers=headers) as response:
+                await response.read()
+        finally:
+            self.webhook_connections.release()
+
+    # ---------------------------
+    # Методы Bot API
+    # ---------------------------
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.api_calls[method] = self.api_calls.get(method, 0) + 1
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        result = await self.call(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    async def call(self, method: str, params: dict):
+        if self.started_at is None and method in ("getUpdates", "setWebhook"):
+            # отсчёт начинается, когда бот готов забирать апдейты
+            self.start()
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            timeout = float(params.get("timeout") or 0)
+            return await self.take_updates(timeout, int(params.get("limit") or 100))
+        if method == "setWebhook":
+            self.webhook_url = params["url"]
+            self.webhook_secret = params.get("secret_token")
+            self.webhook_connections = asyncio.Semaphore(int(params.get("max_connections") or 40))
+            if self.webhook_task is None:
+                self.webhook_task = asyncio.create_task(self.push_webhook())
+            return True
+        if method in ("deleteWebhook", "close", "logOut"):
+            return True
+
+        await asyncio.sleep(self.api_latency)
+        if method in CALLBACK_METHODS:
+            self.replied(self.callback_chats.pop(params.get("callback_query_id"), None))
+            return True
+        chat_id = int(params["chat_id"]) if "chat_id" in params else None
+        self.replied(chat_id)
+        if method in ("sendMessage", "sendPhoto"):
+            message = {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text") or params.get("caption") or "",
+            }
+            if method == "sendPhoto":
+                message["photo"] = [{"file_id": "fake-file-id", "file_unique_id": "fake", "width": 1, "height": 1}]
+            return message
+        return True
+
+    def report(self) -> dict:
+        duration = (self.finished_at or time.monotonic()) - (self.started_at or time.monotonic())
+        return {
+            "updates": self.total,
+            "answered": len(self.latencies),
+            "timeouts": self.timeouts,
+            "duration_s": round(duration, 3),
+            "throughput_per_s": round(len(self.latencies) / duration, 1) if duration else 0,
+            "latency_p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "latency_p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "api_calls": self.api_calls,
+        }
+
+
+async def serve(api: FakeBotApi, host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--updates", help="JSONL с записанными апдейтами")
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--game-code", required=True, help="код игры, который бот показал администратору")
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    updates = load_updates(args.updates) if args.updates else join_scenario(args.players, args.game_code)
+    api = FakeBotApi(updates, args.api_latency)
+    runner = await serve(api, args.host, args.port)
+    print(f"fake Bot API on http://{args.host}:{args.port}/bot, {api.total} updates")
+    await api.done.wait()
+    print(json.dumps(api.report()))
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,274 @@
+"""
+Нагрузочный тест: сотни игроков входят в игру по коду, который бот выдал администратору, и отвечают на вопросы.
+
+Синтетические Update прогоняются через routing_start_command,
+routing_message_handler и routing_callback_handler (обработчики из
+main.build_application()) на временной базе SQLite. Telegram заменён
+заглушкой Bot, которая отвечает с задержкой --api-latency.
+
+Отчёт - JSON (stdout и --output), чтобы сравнивать прогоны между собой:
+- по фазам (join, start_game, answers, results): пропускная способность
+  и p50/p95/p99 задержки обработки апдейта;
+- db_time_share: доля времени выполнения SQL от суммарного времени обработчиков;
+- broadcasts: время веерной рассылки каждого вопроса и её p50/p99 по получателям.
+
+Запуск: python benchmarks/load_test.py --players 500 --questions 3 --output load_test.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "1")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.db')}"
+os.environ.setdefault("CONCURRENT_UPDATES", "64")
+os.environ.setdefault("SCHEDULER_TICK", "0.05")
+os.environ.setdefault("BROADCAST_PER_CHAT_INTERVAL", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import event  # noqa: E402
+from telegram import Bot, TelegramObject, Update  # noqa: E402
+
+import main as bot_main  # noqa: E402
+from broadcaster import broadcaster, percentile  # noqa: E402
+from answer_buffer import answer_buffer  # noqa: E402
+from keyboard_cache import keyboard_cache  # noqa: E402
+from game_codes import game_codes  # noqa: E402
+from player_cache import player_cache  # noqa: E402
+from admin_sessions import admin_sessions  # noqa: E402
+from state_machine import admin_states, gamer_states  # noqa: E402
+from queries import db_connector  # noqa: E402
+from settings import CONCURRENT_UPDATES, ROOT_ID  # noqa: E402
+
+GAME_CODE_PATTERN = re.compile(r"Код игры: (\w+)")
+GAME_TITLE = "Load test"
+
+
+class FakeBot(Bot):
+    """
+    Bot, у которого запрос к Telegram заменён ответом из памяти с задержкой.
+    Последняя клавиатура каждого чата сохраняется, чтобы игроки могли её нажать.
+    """
+    def __init__(self, token: str, api_latency: float):
+        super().__init__(token)
+        self._api_latency = api_latency
+        self._message_id = 0
+        self._keyboards: dict[int, list[dict]] = {}
+        self._texts: dict[int, str] = {}
+        self._calls: dict[str, int] = {}
+
+    async def _do_post(self, endpoint: str, data: dict, *args, **kwargs):
+        self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+        if endpoint == "getMe":
+            return {"id": 999, "is_bot": True, "first_name": "bot", "username": "load_test_bot"}
+        await asyncio.sleep(self._api_latency)
+        if endpoint not in ("sendMessage", "sendPhoto"):
+            return True
+        self._message_id += 1
+        chat_id = int(data["chat_id"])
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data.get("text") or data.get("caption") or "",
+        }
+        self._texts[chat_id] = message["text"]
+        reply_markup = data.get("reply_markup")
+        if isinstance(reply_markup, TelegramObject):
+            reply_markup = reply_markup.to_dict()
+        if reply_markup:
+            message["reply_markup"] = reply_markup
+            self._keyboards[chat_id] = [button for row in reply_markup["inline_keyboard"] for button in row]
+        if endpoint == "sendPhoto":
+            message["photo"] = [{"file_id": "load-test-file", "file_unique_id": "load-test", "width": 1, "height": 1}]
+        return message
+
+    def button(self, chat_id: int, label: str) -> dict:
+        for button in self._keyboards.get(chat_id, []):
+            if button["text"].startswith(label):
+                return button
+        raise KeyError(f"no button '{label}' for chat {chat_id}")
+
+
+class DatabaseTimer:
+    """
+    Суммирует время выполнения SQL через события курсора SQLAlchemy.
+    """
+    def __init__(self, engine):
+        self.total = 0.0
+        self.statements = 0
+        event.listen(engine, "before_cursor_execute", self.before)
+        event.listen(engine, "after_cursor_execute", self.after)
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += time.perf_counter() - conn.info["query_started_at"].pop()
+        self.statements += 1
+
+
+class LoadTest:
+    def __init__(self, players: int, questions: int, api_latency: float, concurrency: int):
+        self.players = list(range(100_000, 100_000 + players))
+        self.questions = questions
+        self.bot = FakeBot(os.environ["BOT_TOKEN"], api_latency)
+        self.application = bot_main.build_application(self.bot)
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.update_id = 0
+        self.phases: dict[str, dict] = {}
+
+    # ---------------------------
+    # Синтетические апдейты
+    # ---------------------------
+    def next_update_id(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    def text_update(self, chat_id: int, text: str) -> Update:
+        message = {
+            "message_id": self.next_update_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"player{chat_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return Update.de_json({"update_id": self.update_id, "message": message}, self.bot)
+
+    def callback_update(self, chat_id: int, data: str) -> Update:
+        update_id = self.next_update_id()
+        return Update.de_json({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"player{chat_id}"},
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {"message_id": 1, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}},
+            },
+        }, self.bot)
+
+    async def process(self, update: Update) -> float:
+        async with self.semaphore:
+            started_at = time.perf_counter()
+            # как при polling/webhook: через PerChatUpdateProcessor приложения
+            await self.application.update_processor.process_update(update, self.application.process_update(update))
+            return time.perf_counter() - started_at
+
+    async def phase(self, name: str, updates: list[Update]):
+        started_at = time.perf_counter()
+        latencies = await asyncio.gather(*(self.process(update) for update in updates))
+        duration = time.perf_counter() - started_at
+        self.phases[name] = {
+            "updates": len(updates),
+            "duration_s": round(duration, 3),
+            "throughput_per_s": round(len(updates) / duration, 1) if duration else 0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "handler_time_s": round(sum(latencies), 3),
+        }
+
+    async def click(self, chat_id: int, label: str) -> Update:
+        return self.callback_update(chat_id, self.bot.button(chat_id, label)["callback_data"])
+
+    # ---------------------------
+    # Сценарий
+    # ---------------------------
+    async def seed_game(self):
+        await self.process(self.text_update(ROOT_ID, "/start"))
+        internal_user = await db_connector.get_internal_user_by_telegram_id(ROOT_ID)
+        game = await db_connector.create_game("quiz", GAME_TITLE, created_by=internal_user.id)
+        for number in range(self.questions):
+            question = await db_connector.create_question(game.id, f"Вопрос {number + 1}?")
+            for variant in "ABCD":
+                await db_connector.create_variant(question.id, f"{variant}{number}", variant == "A")
+
+    async def run(self) -> dict:
+        await self.application.initialize()
+        await bot_main.on_startup(self.application)
+        database_timer = DatabaseTimer(db_connector.session_factory.kw["bind"])
+        try:
+            await self.seed_game()
+            await self.process(self.text_update(ROOT_ID, "/start"))
+            await self.process(await self.click(ROOT_ID, "Начать игру"))
+            await self.process(await self.click(ROOT_ID, GAME_TITLE))
+            game_code = GAME_CODE_PATTERN.search(self.bot._texts[ROOT_ID]).group(1)
+
+            for step, text in (("join_start", "/start"), ("join_code", game_code), ("join_nickname", None)):
+                await self.phase(step, [self.text_update(player, text or f"nick{player}") for player in self.players])
+
+            await self.phase("start_game", [await self.click(ROOT_ID, "Поехали")])
+            for number in range(self.questions):
+                # каждый второй игрок отвечает правильно
+                await self.phase(f"answers_{number + 1}", [
+                    await self.click(player, f"A{number}" if player % 2 == 0 else f"B{number}")
+                    for player in self.players
+                ])
+                # вопрос закрывается, когда ответили все: ждём кнопку следующего вопроса
+                while not any(button["text"] == "➡️" for button in self.bot._keyboards.get(ROOT_ID, [])):
+                    await asyncio.sleep(0.01)
+                await self.phase(f"next_question_{number + 1}", [await self.click(ROOT_ID, "➡️")])
+            await self.phase("results", [await self.click(ROOT_ID, "Показать результаты")])
+        finally:
+            await bot_main.on_shutdown(self.application)
+            await self.application.shutdown()
+
+        handler_time = sum(phase["handler_time_s"] for phase in self.phases.values())
+        question_broadcasts = [report for report in broadcaster.reports if len(report.results) == len(self.players)]
+        return {
+            "players": len(self.players),
+            "questions": self.questions,
+            "concurrency": self.concurrency,
+            "phases": self.phases,
+            "db_time_s": round(database_timer.total, 3),
+            "db_statements": database_timer.statements,
+            "db_time_share": round(database_timer.total / handler_time, 3) if handler_time else 0,
+            "broadcasts": [
+                {
+                    "recipients": len(report.results),
+                    "fan_out_s": round(report.fan_out_duration, 3),
+                    "p50_ms": round(report.p50 * 1000, 1),
+                    "p99_ms": round(report.p99 * 1000, 1),
+                    "failed": report.failed,
+                }
+                for report in question_broadcasts
+            ],
+            "update_processor": self.application.update_processor.metrics(),
+            "answer_buffer": answer_buffer.metrics(),
+            "keyboard_cache": keyboard_cache.metrics(),
+            "game_codes": game_codes.metrics(),
+            "player_cache": player_cache.metrics(),
+            "admin_sessions": admin_sessions.metrics(),
+            "state_transitions": {"admin": admin_states.metrics(), "gamer": gamer_states.metrics()},
+            "api_calls": self.bot._calls,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENT_UPDATES, help="сколько апдейтов держать в обработке одновременно")
+    parser.add_argument("--output", help="куда дополнительно записать JSON-отчёт")
+    args = parser.parse_args()
+    report = asyncio.run(LoadTest(args.players, args.questions, args.api_latency, args.concurrency).run())
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+
+
+if __name__ == "__main__":
+    main()
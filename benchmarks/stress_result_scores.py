@@ -0,0 +1,92 @@
+"""
+Стресс-тест начисления очков: много параллельных ответов одних и тех же
+игроков из пула потоков базы данных.
+
+Сравниваются чтение-изменение-запись строки Result в Python (как раньше
+работал increase_result_score) и DatabaseConnector.add_result_scores,
+который прибавляет очки одной командой INSERT ... ON CONFLICT DO UPDATE.
+Для каждого режима печатается ожидаемая и фактическая сумма очков.
+Если add_result_scores потерял хоть одно приращение, скрипт завершается с кодом 1.
+
+Запуск: python benchmarks/stress_result_scores.py --players 5 --answers 400
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ROOT_ID", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Result  # noqa: E402
+from queries import AsyncDatabaseConnector, DatabaseConnector, init_db_connector  # noqa: E402
+
+
+def read_modify_write(connector: DatabaseConnector, player_id: int, game_session_id: str, increment: int):
+    result = connector.session.query(Result).filter(
+        Result.user_id == player_id,
+        Result.game_session_id == game_session_id,
+    ).first()
+    # окно, в которое другой поток успевает прочитать то же значение
+    time.sleep(0.001)
+    result.score += increment
+    connector.session.commit()
+
+
+def increment_in_own_session(connector: AsyncDatabaseConnector, atomic: bool, player_id: int, game_session_id: str):
+    with connector.session_factory() as session:
+        sync_connector = DatabaseConnector(session)
+        if atomic:
+            sync_connector.add_result_scores({(player_id, game_session_id): 1})
+        else:
+            read_modify_write(sync_connector, player_id, game_session_id, 1)
+
+
+async def run(atomic: bool, players: int, answers: int) -> dict:
+    directory = tempfile.mkdtemp()
+    connector = init_db_connector(f"sqlite:///{os.path.join(directory, 'stress.db')}")
+    setup = DatabaseConnector(connector.session_factory())
+    game = setup.create_game("quiz", "stress")
+    game_session = setup.create_game_session(game.id, "STRESS", "stress")
+    for player_id in range(players):
+        setup.create_or_update_result(player_id, game_session.id, 0)
+
+    started_at = time.monotonic()
+    await asyncio.gather(*(
+        connector.run(increment_in_own_session, connector, atomic, answer % players, game_session.id)
+        for answer in range(answers)
+    ))
+    duration = time.monotonic() - started_at
+
+    with connector.session_factory() as session:
+        total = sum(result.score for result in session.query(Result).filter(Result.game_session_id == game_session.id))
+    return {
+        "mode": "add_result_scores" if atomic else "read_modify_write",
+        "expected": answers,
+        "actual": total,
+        "lost": answers - total,
+        "duration_s": round(duration, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=5)
+    parser.add_argument("--answers", type=int, default=400)
+    args = parser.parse_args()
+    lost = 0
+    for atomic in (False, True):
+        report = asyncio.run(run(atomic, args.players, args.answers))
+        print(report)
+        if atomic:
+            lost = report["lost"]
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
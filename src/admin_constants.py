@@ -16,6 +16,8 @@ QUESTION_TO_DELETE          = "question_to_delete"
 QUESTION_OPTIONS            = "question_options"
 EDIT_QUESTION_TEXT          = "question_edit_text"
 DELETE_QUESTION             = "question_delete"
+MOVE_QUESTION_UP            = "question_move_up"
+MOVE_QUESTION_DOWN          = "question_move_down"
 
 VARIANT_OPTIONS             = "variant_options"
 ADD_VARIANT                 = "variant_add"
@@ -47,6 +49,8 @@ EDIT_QUESTION_TEXT_LABEL    = "Изменить текст вопроса"
 VARIANT_OPTIONS_LABEL       = "Редактирование вариантов"
 UPDATE_IMAGE_LABEL          = "Обновить картинку"
 CHANGE_CORRECTNESS_LABEL    = "Изменить правильные варианты"
+MOVE_QUESTION_UP_LABEL      = "⬆️ Раньше"
+MOVE_QUESTION_DOWN_LABEL    = "⬇️ Позже"
 
 ADD_VARIANT_LABEL           = "Добавить вариант"
 EDIT_VARIANT_LABEL          = "Изменить вариант"
@@ -59,3 +63,6 @@ CANCEL_LABEL                = "Отмена"
 GAME_TO_START               = "game_to_start"
 WAITING_START               = "waiting_start"
 SHOW_RESULTS                = "show_results"
+CHANGE_QUESTION             = "change_question"
+CLOSE_QUESTION              = "close_question"
+NEXT_QUESTION               = "next_question"
@@ -1,13 +1,17 @@
 # admin_flow.py
 """
 Модуль, инкапсулирующий админскую логику.
-Состояние администратора хранится в базе данных (через модель AdminSession).
-Методы класса AdminFlow получают актуальное состояние из базы и обновляют его,
-что позволяет сохранять данные даже при перезапуске приложения.
+Состояние администратора хранится в базе данных (InternalUser.state).
+Методы класса AdminFlow получают и обновляют его через AdminSessionCache
+(admin_sessions.py): за апдейт состояние читается не больше одного раза
+и записывается в базу один раз в конце обработки, поэтому сохраняется
+и при перезапуске приложения.
 """
 
 import os
+from functools import wraps
 from telegram import (
+    Bot,
     CallbackQuery,
     InlineKeyboardButton, 
     InlineKeyboardMarkup,
@@ -18,7 +22,7 @@ from telegram.ext import (
 )
 from logger import get_logger
 from sqlalchemy.orm import Session
-from queries import DatabaseConnector
+from queries import AsyncDatabaseConnector
 from models import Game, Question, Variant
 from settings import ROOT_ID
 import inspect
@@ -31,215 +35,292 @@ from admin_options import (
 )
 from admin_settings import *
 from inline_buttons_generator import generate_inline_buttons_by_state
+from broadcaster import Broadcaster, broadcaster
+from media_cache import MediaCache
+from answer_buffer import AnswerBuffer, answer_buffer
+from live_game_state import LiveGameRegistry, LiveQuestion, live_games
+from leaderboard import LeaderboardRegistry, leaderboards
+from latency_histogram import export_latency
+from question_scheduler import QuestionScheduler, QuestionTimer, question_scheduler
+from message_registry import MessageRegistry, message_registry
+from callback_codec import encode_callback
+from callback_router import CallbackRouter
+from gamer_constants import GAMER
+from keyboard_cache import ANSWERS, GAMES, QUESTIONS, VARIANTS, KeyboardCache, keyboard_cache
+from game_codes import GameCodeAllocator, game_codes
+from admin_sessions import AdminSessionCache, admin_sessions
+from state_machine import StateNode, admin_states
 import asyncio
+import time
 
 logger = get_logger(__name__)
 
-CHANGE_QUESTION = "change_question"
+# сколько лидеров показывать администратору между вопросами
+LIVE_STANDINGS_SIZE = 5
+# кнопок игр, вопросов или вариантов на одной странице
+PAGE_SIZE = 6
+# направление листания в кнопках страниц
+PAGE_BACK = 0
+PAGE_FORWARD = 1
+
+
+def page_window(page: int, direction: int, boundary: str | int | None) -> dict:
+    """
+    Аргументы keyset-запроса страницы. Кнопки страниц хранят ключ сортировки
+    крайней строки текущей страницы (id, у вопросов - position):
+    вперёд - строки после последней, назад - перед первой.
+    У старых кнопок ключа нет, для них страница считается через offset.
+    """
+    if boundary is None:
+        return {"offset": (page - 1) * PAGE_SIZE}
+    if direction == PAGE_BACK:
+        return {"before": boundary}
+    return {"after": boundary}
+
+
+def with_admin_session(handler):
+    """
+    Оборачивает обработчик апдейта администратора: состояние читается один раз
+    и записывается в базу одним UPDATE после обработки (AdminSessionCache.scope).
+    """
+    @wraps(handler)
+    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        async with self.sessions.scope():
+            await handler(self, update, context)
+    return wrapper
+
+admin_callbacks = CallbackRouter(ADMIN)
 
 class AdminFlow:
-    def __init__(self, connector: DatabaseConnector):
+    def __init__(self, connector: AsyncDatabaseConnector, broadcaster: Broadcaster, answer_buffer: AnswerBuffer, live_games: LiveGameRegistry, leaderboards: LeaderboardRegistry, scheduler: QuestionScheduler, messages: MessageRegistry, keyboards: KeyboardCache, game_codes: GameCodeAllocator, sessions: AdminSessionCache):
         self.connector = connector
+        self.broadcaster = broadcaster
+        self.answer_buffer = answer_buffer
+        self.live_games = live_games
+        self.leaderboards = leaderboards
+        self.scheduler = scheduler
+        self.scheduler.on_close = self.close_question
+        self.media_cache = MediaCache(connector)
         self.selected_variants = {}
         self.not_selected_variants = {}
-        self.sent_messages = {}
+        self.messages = messages
+        self.keyboards = keyboards
+        self.game_codes = game_codes
+        self.sessions = sessions
 
+    @with_admin_session
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         admin_id = update.effective_user.id
         logger.debug(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        internal_user = self.connector.get_internal_user_by_telegram_id(ROOT_ID)
+        internal_user = await self.connector.get_internal_user_by_telegram_id(ROOT_ID)
         if internal_user is None:
             logger.info(f"Internal user for ROOT_ID {ROOT_ID} не найден. Создаем нового.")
-            internal_user = self.connector.create_internal_user(telegram_id=ROOT_ID, nickname="Это же я", hashed_password="Он пока не нужен")
+            internal_user = await self.connector.create_internal_user(telegram_id=ROOT_ID, nickname="Это же я", hashed_password="Он пока не нужен")
             logger.info(f"Создан внутренний пользователь: {internal_user}")
         else:
             logger.info(f"Внутренний пользователь для ROOT_ID {ROOT_ID} уже существует: {internal_user}")
 
         new_state = f"{ADMIN}:{ADMIN_OPTIONS}"
-        self.connector.update_internal_user_state(admin_id, new_state)
+        await self.sessions.set_state(admin_id, new_state)
         # await admin_options(update, context)
         reply_markup = await generate_inline_buttons_by_state(state=ADMIN_OPTIONS)
         await context.bot.send_message(
             chat_id=admin_id,
-            text=ADMIN_STATES[ADMIN_OPTIONS][BEGIN_MESSAGE],
+            text=admin_states.node(ADMIN_OPTIONS).begin_message,
             reply_markup=reply_markup,
         )
         logger.info(f"Админ {admin_id} запущен в режиме '{ADMIN_OPTIONS}'.")
 
     # TODO: separate this handler, to make it more readable
+    @with_admin_session
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Обрабатывает inline callback-ы.
+        Обработчик выбирается по действию из callback_data (маршруты admin_callbacks ниже),
+        состояние администратора читается из базы только там, где оно нужно.
         """
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
         query = update.callback_query
-        data = query.data  # ожидается формат "{ADMIN}:<команда>"
+        logger.info(f"{ADMIN} {admin_id} calback_data = {query.data}")
 
-        logger.info(f"{ADMIN} {admin_id} calback_data = {data}")
-
-        if not data.startswith(f"{ADMIN}:"):
+        if not await admin_callbacks.dispatch(self, update, context, lambda: self.sessions.get_state(admin_id)):
             await query.answer("Некорректный callback.")
-            return
-        next_state = data.split(":", 1)[1]
-        logger.debug(f"next_state = {next_state}")
-
-        # state = admin:<action>:<maybe id>
-        current_state = self.connector.get_internal_user_state(admin_id).split(":")[1]
-        logger.info(f"current_state = {current_state}")
-        raw_state = next_state.split(":")[0]
-        logger.debug(f"raw_state = {raw_state}")
-
-        if next_state.startswith(f"{SHOW_RESULTS}:"):
-            await query.edit_message_reply_markup(reply_markup=None)
-            game_session_id = next_state.split(":")[-1]
-            await self.generate_results(update, context, game_session_id)
-            return
 
-        if next_state.startswith(f"{GAME_WORKFLOW}:"):
-            await query.edit_message_reply_markup(reply_markup=None)
-            game_session_id = next_state.split(":")[-1]
-            logger.debug("game is starting")
-            await self.start_game(update, context, game_session_id)
+    @with_admin_session
+    async def handle_stale_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Кнопка ссылается на нагрузку, которой уже нет на сервере (см. is_stale_callback):
+        вместо ошибки заново показывает меню текущего состояния администратора.
+        """
+        admin_id = update.effective_user.id
+        query = update.callback_query
+        logger.warning(f"{ADMIN} {admin_id} нажал устаревшую кнопку '{query.data}'")
+        await query.answer("Кнопка устарела, меню обновлено")
+        current_state = await self.sessions.get_state(admin_id)
+        if current_state is None:
+            # не администратор
             return
-
-        if next_state.startswith(f"{DONE}"):
+        try:
             await query.edit_message_reply_markup(reply_markup=None)
-            question_id = next_state.split(":")[-1]
-            new_state = f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}"
-            self.connector.update_internal_user_state(admin_id, new_state)
-            for variant in self.selected_variants[question_id]:
-                self.connector.update_variant_correctness(variant, True)
-            for variant in self.not_selected_variants[question_id]:
-                self.connector.update_variant_correctness(variant, False)
-            logger.info("Correct varians are saved")
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text="Правильные ответы сохранены",
-            )
-            game_id = self.connector.get_question(question_id).game_id
-
-            await question_options(update, context, question_id, game_id)
+        except Exception as e:
+            logger.error(f"Не удалось убрать устаревшую клавиатуру у {admin_id}: {e}")
+        # state = admin:<action>:<maybe id>
+        state = current_state.split(":", 1)[-1]
+        node = admin_states.get(state.split(":")[0])
+        if node is None:
+            await self.start(update, context)
             return
+        reply_markup = await self.state_keyboard(update, context, node, state)
+        await context.bot.send_message(
+            chat_id=admin_id,
+            text=node.begin_message,
+            reply_markup=reply_markup,
+        )
 
-        if next_state.startswith(f"{SELECT}|"):
-            variant_id = next_state.split("|")[-1]
-            await self.handle_selection(update, context, query, variant_id)
-            return
+    @admin_callbacks.route(SHOW_RESULTS, game_session_id=str)
+    async def on_show_results(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        await self.generate_results(update, context, game_session_id)
 
-        if next_state.startswith(f"{CHANGE_QUESTION}|"):
-            await query.edit_message_reply_markup(reply_markup=None)
-            await self.remove_inline_keyboards(update, context)
-            admin_id = update.effective_user.id
-            game_session_id = self.connector.get_internal_user_by_telegram_id(admin_id).state.split(":")[-1]
-            new_question = next_state.split("|")[-1]
-            await self.send_question_to_everyone(update, context, game_session_id, int(new_question))
-            return
+    @admin_callbacks.route(GAME_WORKFLOW, game_session_id=str)
+    async def on_game_workflow(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        logger.debug("game is starting")
+        await self.start_game(update, context, game_session_id)
 
-        if next_state.startswith(f"{PAGE_GAMES}"):
-            # raw_state = page_games|<number>
-            # if len(ADMIN_STATES[raw_state][FORWARD_STATES]) != 1:
-            #     logger.error(f"should be only one FORWARD_STATES, got: {ADMIN_STATES[raw_state][FORWARD_STATES]}")
-            # action = ADMIN_STATES[raw_state][FORWARD_STATES][0]
-            internal_user_state_in_db = self.connector.get_internal_user_state(admin_id)
-            action = internal_user_state_in_db.split(":")[1]
-            if action == GAME_TO_EDIT:
-                action = GAME_OPTIONS
-            # TODO: resolve it
-            # elif action == GAME_TO_DELETE:
-            #     action = 
-            logger.debug(f"state = {internal_user_state_in_db}")
-            new_page = int(next_state.split("|", 1)[-1])
-            await self.handle_changing_page_games(update, context, admin_id, new_page, action)
-            return
+    @admin_callbacks.route(DONE, question_id=str)
+    async def on_done(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
+        admin_id = update.effective_user.id
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        new_state = f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}"
+        await self.sessions.set_state(admin_id, new_state)
+        for variant in self.selected_variants[question_id]:
+            await self.connector.update_variant_correctness(variant, True)
+        for variant in self.not_selected_variants[question_id]:
+            await self.connector.update_variant_correctness(variant, False)
+        self.invalidate_question_keyboards(question_id)
+        logger.info("Correct varians are saved")
+        await context.bot.send_message(
+            chat_id=admin_id,
+            text="Правильные ответы сохранены",
+        )
+        game_id = (await self.connector.get_question(question_id)).game_id
 
-        if next_state.startswith(f"{PAGE_QUESTIONS}"):
-            # raw_state = page_question|<number>
-            # if len(ADMIN_STATES[raw_state][FORWARD_STATES]) != 1:
-            #     logger.error(f"should be only one FORWARD_STATES, got: {ADMIN_STATES[raw_state][FORWARD_STATES]}")
-            # action = ADMIN_STATES[raw_state][FORWARD_STATES][0]
-            internal_user_state_in_db = self.connector.get_internal_user_state(admin_id)
-            action = internal_user_state_in_db.split(":")[1]
-            if action == QUESTION_TO_EDIT:
-                action = QUESTION_OPTIONS
-            # TODO: write unify handler, using config
-            logger.debug(f"state = {internal_user_state_in_db}")
-            new_page = int(next_state.split("|", 1)[-1])
-            game_id = self.connector.get_internal_user_state(admin_id).split(":")[-1]
-            logger.info(f"next_state.startswith(\"{PAGE_QUESTIONS}\") game_id = {game_id}")
-            await self.handle_changing_page_questions(update, context, game_id, new_page, action)
-            return
+        await question_options(update, context, question_id, game_id)
 
-        if next_state.startswith(f"{PAGE_VARIANTS}"):
-            # if len(ADMIN_STATES[raw_state][FORWARD_STATES]) != 1:
-            #     logger.error(f"should be only one FORWARD_STATES, got: {ADMIN_STATES[raw_state][FORWARD_STATES]}")
-            # action = ADMIN_STATES[raw_state][FORWARD_STATES][0]
-            internal_user_state_in_db = self.connector.get_internal_user_state(admin_id)
-            action = internal_user_state_in_db.split(":")[1]
-            if action == VARIANT_TO_EDIT:
-                action = VARIANT_OPTIONS
-            # TODO: rewrite
-            logger.debug(f"state = {internal_user_state_in_db}")
-            new_page = int(next_state.split("|", 1)[-1])
-            question_id = self.connector.get_internal_user_state(admin_id).split(":")[-1]
-            await self.handle_changing_page_variants(update, context, question_id, new_page, action)
-            return
+    @admin_callbacks.route(SELECT, variant_id=str)
+    async def on_select(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variant_id: str):
+        await self.handle_selection(update, context, update.callback_query, variant_id)
+
+    @admin_callbacks.route(CLOSE_QUESTION, game_session_id=str)
+    async def on_close_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        self.scheduler.close_now(game_session_id)
+
+    @admin_callbacks.route(CHANGE_QUESTION, needs_state=True, question_number=int)
+    async def on_change_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_number: int, current_state: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        game_session_id = current_state.split(":")[-1]
+        await self.remove_inline_keyboards(context.bot, game_session_id)
+        await self.send_question_to_everyone(update, context, game_session_id, question_number)
+
+    @admin_callbacks.route(NEXT_QUESTION, needs_state=True, after_position=int)
+    async def on_next_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, after_position: int, current_state: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        game_session_id = current_state.split(":")[-1]
+        await self.remove_inline_keyboards(context.bot, game_session_id)
+        state = await self.live_games.get_or_build(game_session_id)
+        await self.send_question_to_everyone(update, context, game_session_id, state.next_question_index(after_position))
+
+    @admin_callbacks.route(MOVE_QUESTION_UP, question_id=str)
+    async def on_move_question_up(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
+        await self.move_question(update, context, question_id, -1)
+
+    @admin_callbacks.route(MOVE_QUESTION_DOWN, question_id=str)
+    async def on_move_question_down(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
+        await self.move_question(update, context, question_id, 1)
+
+    @admin_callbacks.route(PAGE_GAMES, needs_state=True, page=int, direction=int, boundary=str)
+    async def on_page_games(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int, current_state: str, direction: int = PAGE_FORWARD, boundary: str | None = None):
+        action = current_state.split(":")[1]
+        if action == GAME_TO_EDIT:
+            action = GAME_OPTIONS
+        # TODO: resolve it
+        # elif action == GAME_TO_DELETE:
+        #     action = 
+        logger.debug(f"state = {current_state}")
+        await self.handle_changing_page_games(update, context, update.effective_user.id, page, action, direction, boundary)
+
+    @admin_callbacks.route(PAGE_QUESTIONS, needs_state=True, page=int, direction=int, boundary=int)
+    async def on_page_questions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int, current_state: str, direction: int = PAGE_FORWARD, boundary: int | None = None):
+        action = current_state.split(":")[1]
+        if action == QUESTION_TO_EDIT:
+            action = QUESTION_OPTIONS
+        # TODO: write unify handler, using config
+        logger.debug(f"state = {current_state}")
+        game_id = current_state.split(":")[-1]
+        logger.info(f"{PAGE_QUESTIONS}: game_id = {game_id}")
+        await self.handle_changing_page_questions(update, context, game_id, page, action, direction, boundary)
+
+    @admin_callbacks.route(PAGE_VARIANTS, needs_state=True, page=int, direction=int, boundary=str)
+    async def on_page_variants(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int, current_state: str, direction: int = PAGE_FORWARD, boundary: str | None = None):
+        action = current_state.split(":")[1]
+        if action == VARIANT_TO_EDIT:
+            action = VARIANT_OPTIONS
+        # TODO: rewrite
+        logger.debug(f"state = {current_state}")
+        question_id = current_state.split(":")[-1]
+        await self.handle_changing_page_variants(update, context, question_id, page, action, direction, boundary)
 
-        if next_state.startswith(f"{CHANGE_CORRECTNESS}"):
-            question_id = next_state.split(":")[-1]
-            await query.edit_message_reply_markup(reply_markup=None)
-            await self.change_correctness(update, context, question_id)
-            return
+    @admin_callbacks.route(CHANGE_CORRECTNESS, question_id=str)
+    async def on_change_correctness(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        await self.change_correctness(update, context, question_id)
 
-        if next_state.startswith(f"{WAITING_START}:"):
-            game_id = next_state.split(":")[-1]
-            await query.edit_message_reply_markup(reply_markup=None)
-            await self.waiting_start(update, context, game_id, "ASDF")
-            return
+    @admin_callbacks.route(WAITING_START, game_id=str)
+    async def on_waiting_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str):
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        await self.waiting_start(update, context, game_id)
 
-        if current_state not in ADMIN_STATES:
+    @admin_callbacks.default(needs_state=True)
+    async def on_state_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE, next_state: str, current_state: str):
+        """
+        Переход по ADMIN_STATES: callback_data = admin:<состояние>[:<id>].
+        """
+        admin_id = update.effective_user.id
+        query = update.callback_query
+        data = f"{ADMIN}:{next_state}"
+        logger.debug(f"next_state = {next_state}")
+        # state = admin:<action>:<maybe id>
+        current_state = current_state.split(":")[1]
+        logger.info(f"current_state = {current_state}")
+        raw_state = next_state.split(":")[0]
+        logger.debug(f"raw_state = {raw_state}")
+        current_node = admin_states.get(current_state)
+        node = admin_states.get(raw_state)
+        if current_node is None or node is None:
             await context.bot.send_message(
                 chat_id=admin_id,
                 text="Неизвестное состояние",
             )
             return
-        if (ADMIN_STATES[current_state][ACTION] != CALLBACK
-            or ADMIN_STATES[current_state][ACTION] != LIST):
+        with admin_states.timer(current_state, raw_state):
+            if current_node.action not in (CALLBACK, LIST):
+                await context.bot.send_message(
+                    chat_id=admin_id,
+                    text="На данном состоянии не ожидается нажатие кнопок",
+                )
+            await query.edit_message_reply_markup(reply_markup=None)
+            logger.debug(f"new_state in db = {data}")
+            await self.sessions.set_state(admin_id, data)
+            reply_markup = await self.state_keyboard(update, context, node, next_state)
+            logger.debug(f"reply_markup = {reply_markup}")
             await context.bot.send_message(
                 chat_id=admin_id,
-                text="На данном состоянии не ожидается нажатие кнопок",
+                text=node.begin_message,
+                reply_markup=reply_markup,
             )
-        await query.edit_message_reply_markup(reply_markup=None)
-        # if ADMIN_STATES[current_state][END_MESSAGE]:
-        #     await context.bot.send_message(
-        #         chat_id=admin_id,
-        #         text=ADMIN_STATES[current_state][END_MESSAGE],
-        #     )
-        # new_state = f"{ADMIN}:{next_state}"
-        logger.debug(f"new_state in db = {data}")
-        self.connector.update_internal_user_state(admin_id, data)
-        reply_markup = None
-        if ADMIN_STATES[raw_state][FORWARD_STATES]:
-            game_id, question_id, variant_id = None, None, None
-            if raw_state == GAME_OPTIONS or raw_state == GAME_TO_START:
-                game_id = next_state.split(":")[-1]
-            elif raw_state == QUESTION_OPTIONS:
-                question_id = next_state.split(":")[-1]
-                game_id = self.connector.get_question(question_id).game_id
-            elif raw_state == VARIANT_OPTIONS:
-                question_id = next_state.split(":")[-1]
-                game_id = self.connector.get_question(question_id).game_id
-            # TODO: add handle deleting
-
-            reply_markup = await generate_inline_buttons_by_state(state=raw_state, game_id=game_id, question_id=question_id)
-        if ADMIN_STATES[raw_state][ACTION] == LIST:
-            reply_markup = await self.handle_listing(update, context, next_state)
-        logger.debug(f"reply_markup = {reply_markup}")
-        await context.bot.send_message(
-            chat_id=admin_id,
-            text=ADMIN_STATES[raw_state][BEGIN_MESSAGE],
-            reply_markup=reply_markup,
-        )
         return
 
         if command.startswith(f"{SELECT}|"):
@@ -254,7 +335,7 @@ class AdminFlow:
         
         if command.startswith(f"{PAGE_QUESTIONS}"):
             new_page = int(command.split("|", 1)[-1])
-            game_id = self.connector.get_internal_user_state(admin_id).split(":")[-1]
+            game_id = (await self.sessions.get_state(admin_id)).split(":")[-1]
             logger.info(f"command.startswith(\"{PAGE_QUESTIONS}\") game_id = {game_id}")
             await self.handle_changing_page_questions(update, context, game_id, new_page)
             return
@@ -267,22 +348,22 @@ class AdminFlow:
             # TODO: rewrite this
             # state = {ADMIN}:{VARIANT_OPTIONS}:
             question_id = command.split(":")[-1]
-            self.connector.update_internal_user_state(admin_id, question_id)
+            await self.sessions.set_state(admin_id, question_id)
             for variant in self.selected_variants[question_id]:
-                self.connector.update_variant_correctness(variant, True)
+                await self.connector.update_variant_correctness(variant, True)
             for variant in self.not_selected_variants[question_id]:
-                self.connector.update_variant_correctness(variant, False)
+                await self.connector.update_variant_correctness(variant, False)
             logger.info("Correct varians are saved")
             await context.bot.send_message(
                 chat_id=admin_id,
                 text="Правильные ответы сохранены",
             )
-            game_id = self.connector.get_question(question_id).game_id
+            game_id = (await self.connector.get_question(question_id)).game_id
 
             await question_options(update, context, question_id, game_id)
         # TODO: unify this
         elif command == f"{CREATE_GAME}":                                       # nothing
-            self.connector.update_internal_user_state(admin_id, f"{ADMIN}:{CREATE_GAME}")
+            await self.sessions.set_state(admin_id, f"{ADMIN}:{CREATE_GAME}")
             await self.create_game(update, context)
         elif command == f"{GAME_TO_EDIT}":
             await self.game_to_edit(update, context, admin_id)
@@ -297,7 +378,7 @@ class AdminFlow:
         ):
             game_id = command.split(":")[-1]
             action = command.split(":")[0]
-            self.connector.update_internal_user_state(admin_id, data)
+            await self.sessions.set_state(admin_id, data)
             if action == GAME_OPTIONS:
                 await self.edit_game_by_game_id(update, context, admin_id, game_id)
             elif action == ADD_QUESTION:
@@ -325,9 +406,9 @@ class AdminFlow:
         ):
             question_id = command.split(":")[-1]
             action = command.split(":")[0]
-            self.connector.update_internal_user_state(admin_id, data)
+            await self.sessions.set_state(admin_id, data)
             if action == QUESTION_OPTIONS:
-                game_id = self.connector.get_question(question_id).game_id
+                game_id = (await self.connector.get_question(question_id)).game_id
                 await question_options(update, context, question_id, game_id)
             elif action == DELETE_QUESTION:
                 await self.delete_question_by_question_id(update, context, question_id)
@@ -365,6 +446,31 @@ class AdminFlow:
         else:
             await query.answer("Неизвестная команда.")
 
+    async def state_keyboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE, node: StateNode, state: str) -> InlineKeyboardMarkup | None:
+        """
+        Клавиатура состояния state = <состояние>[:<id>]: список строк для LIST-состояний,
+        кнопки переходов для остальных.
+        """
+        if node.action == LIST:
+            return await self.handle_listing(update, context, state)
+        if not node.buttons:
+            return None
+        entity_id = state.split(":")[-1] if ":" in state else None
+        ids = await self.state_ids(node, entity_id)
+        return await generate_inline_buttons_by_state(node.name, ids.get(GAME_ID), ids.get(QUESTION_ID), ids.get(VARIANT_ID))
+
+    async def state_ids(self, node: StateNode, entity_id: str | None) -> dict[str, str]:
+        """
+        id для клавиатуры состояния: id из callback и то, что по нему находится
+        (игра вопроса, вопрос варианта), - только если это нужно кнопкам.
+        """
+        ids = {node.dependency: entity_id} if node.dependency is not None else {}
+        if node.dependency == QUESTION_ID and GAME_ID in node.needs:
+            ids[GAME_ID] = (await self.connector.get_question(entity_id)).game_id
+        elif node.dependency == VARIANT_ID and QUESTION_ID in node.needs:
+            ids[QUESTION_ID] = (await self.connector.get_variant(entity_id)).question_id
+        return ids
+
     async def handle_listing(self, update: Update, context: ContextTypes.DEFAULT_TYPE, state: str):
         admin_id = update.effective_user.id
         logger.debug(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
@@ -372,10 +478,10 @@ class AdminFlow:
         logger.debug(f"state = {state}")
         action = state.split(":")[0]
         if action == GAME_TO_EDIT:
-            internal_user_id = self.connector.get_internal_user_by_telegram_id(admin_id).id
+            internal_user_id = await self.sessions.get_internal_user_id(admin_id)
             return await self.game_to_edit(update, context, internal_user_id)
         elif action == GAME_TO_DELETE:
-            internal_user_id = self.connector.get_internal_user_by_telegram_id(admin_id).id
+            internal_user_id = await self.sessions.get_internal_user_id(admin_id)
             return await self.game_to_delete(update, context, internal_user_id)
         elif action == QUESTION_TO_EDIT:
             game_id = state.split(":")[-1]
@@ -390,7 +496,7 @@ class AdminFlow:
             question_id = state.split(":")[-1]
             return await self.variant_to_delete(update, context, question_id)
         elif action == GAME_TO_START:
-            internal_user_id = self.connector.get_internal_user_by_telegram_id(admin_id).id
+            internal_user_id = await self.sessions.get_internal_user_id(admin_id)
             return await self.game_to_start(update, context, internal_user_id)
         else:
             logger.error("incorrect state")
@@ -399,38 +505,39 @@ class AdminFlow:
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
         print(f"variant_id = {variant_id}")
-        self.update_variant_correctness(update, context, variant_id)
+        await self.update_variant_correctness(update, context, variant_id)
         # question_text = self.connector.get_question(question_id).question_text
-        question_id = self.connector.get_variant(variant_id).question_id
-        variants = self.connector.get_variants_by_question(question_id)
+        question_id = (await self.connector.get_variant(variant_id)).question_id
+        variants = await self.connector.get_variants_by_question(question_id)
 
         buttons = [
             InlineKeyboardButton(
                 f"✅ {variant.answer_text}" if variant.id in self.selected_variants[question_id] else variant.answer_text, 
-                callback_data=f"{ADMIN}:{SELECT}|{variant.id}",
+                callback_data=encode_callback(ADMIN, SELECT, variant.id),
             )
             for variant in variants
         ]
         # Разбиваем кнопки на строки по 2 кнопки
         keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
         # Добавляем строку с кнопкой DONE_LABEL
-        keyboard.append([InlineKeyboardButton(DONE_LABEL, callback_data=f"{ADMIN}:{DONE}:{question_id}")])
+        keyboard.append([InlineKeyboardButton(DONE_LABEL, callback_data=encode_callback(ADMIN, DONE, question_id))])
         reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_reply_markup(reply_markup=reply_markup)
 
-    async def waiting_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str, game_code: str, game_session_state = f"{WAITING_START}"):
+    async def waiting_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str, game_session_state = f"{WAITING_START}"):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
 
-        game_session_id = self.connector.create_game_session(game_id, "ASDF", f"{WAITING_START}").id
-        self.connector.update_internal_user_state(admin_id, f"{ADMIN}:{WAITING_START}:{game_session_id}")
+        game_session = await self.game_codes.allocate(game_id, game_session_state)
+        game_session_id = game_session.id
+        await self.sessions.set_state(admin_id, f"{ADMIN}:{WAITING_START}:{game_session_id}")
         keyboard = [
-            [InlineKeyboardButton("Поехали", callback_data=f"{ADMIN}:{GAME_WORKFLOW}:{game_session_id}")] 
+            [InlineKeyboardButton("Поехали", callback_data=encode_callback(ADMIN, GAME_WORKFLOW, game_session_id))] 
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await context.bot.send_message(
             chat_id=admin_id,
-            text="Можешь жмакнуть \"Поехали\"",
+            text=f"Код игры: {game_session.game_code}\nМожешь жмакнуть \"Поехали\"",
             reply_markup=reply_markup,
         )
 
@@ -447,6 +554,7 @@ class AdminFlow:
         await query.edit_message_text("Введите название игры:")
         logger.info(f"Админ {admin_id} переведен в состояние '{ADMIN}:{CREATE_GAME}' (ожидание названия игры).")
 
+    @with_admin_session
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Обрабатывает текстовые сообщения.
@@ -457,64 +565,22 @@ class AdminFlow:
         if not text:
             await update.message.reply_text("Нужно что-то ввести!")
             return
-        current_state = self.connector.get_internal_user_state(admin_id).split(":", 1)[1]
+        current_state = (await self.sessions.get_state(admin_id)).split(":", 1)[1]
         action = current_state.split(":")[0]
-        if ADMIN_STATES[action][ACTION] != TEXT:
-            logger.debug("text was inserted while it does not expected")
+        entity_id = current_state.split(":")[-1]
+        node = admin_states.get(action)
+        if node is None:
+            logger.error("Unknows state")
             await context.bot.send_message(
                 chat_id=admin_id,
-                text="В данном состоянни текст не ожидается",
+                text="Неизвестное состояние, попробуйте ввести /start"
             )
             return
-        if action == CREATE_GAME:
-            internal_user_id = self.connector.get_internal_user_by_telegram_id(admin_id).id
-            game = self.connector.create_game("quiz", text, created_by=internal_user_id)
-
-            game_id = game.id
-            new_state = f"{ADMIN}:{ADMIN_OPTIONS}"
-
-            self.connector.update_internal_user_state(admin_id, new_state)
-            logger.info(f"Game {game_id} created. State updated to {new_state}.")
-            await admin_options(update, context)
-        elif action == ADD_QUESTION:
-            game_id = current_state.split(":")[-1]
-            question = self.connector.create_question(game_id, text)
-            question_id = question.id
-
-            new_state = f"{ADMIN}:{GAME_OPTIONS}:{game_id}"
-            self.connector.update_internal_user_state(admin_id, new_state)
-            logger.info(f"Question {question_id} created. State updated to {new_state}.")
-            await game_options(update, context, game_id)
-            # await question_options(update, context, question_id, game_id)
-        elif action == EDIT_QUESTION_TEXT:
-            question_id = current_state.split(":")[-1]
-            game_id = self.connector.update_question_text(question_id, text).game_id
-
-            new_state = f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}"
-            self.connector.update_internal_user_state(admin_id, new_state)
-            await question_options(update, context, question_id, game_id)
-        elif action == ADD_VARIANT:
-            question_id = current_state.split(":")[-1]
-            self.connector.create_variant(question_id, text)
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=f"Вариант ответа {text} сохранён",
-            )
-            new_state = f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}"
-            self.connector.update_internal_user_state(admin_id, new_state)
-            await variant_options(update, context, question_id)
-        elif action == EDIT_VARIANT_TEXT:
-            variant_id = current_state.split(":")[-1]
-            question_id = self.connector.update_variant_text(variant_id, text).question_id
-
-            new_state = f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}"
-            self.connector.update_internal_user_state(admin_id, new_state)
-            await variant_options(update, context, question_id)
-        else:
-            logger.error("Unknows state")
+        if not await admin_states.dispatch(self, action, TEXT, update, context, text, entity_id):
+            logger.debug("text was inserted while it does not expected")
             await context.bot.send_message(
                 chat_id=admin_id,
-                text="Неизвестное состояние, попробуйте ввести /start"
+                text="В данном состоянни текст не ожидается",
             )
         # if current_state == f"{ADMIN}:{CREATE_GAME}":
         #     internal_user_id = self.connector.get_internal_user_by_telegram_id(admin_id).id
@@ -559,6 +625,67 @@ class AdminFlow:
         # else:
         #     await update.message.reply_text("Неизвестное состояние. Попробуйте ввести /start.")
 
+    @admin_states.on(CREATE_GAME, TEXT)
+    async def on_text_create_game(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, entity_id: str):
+        admin_id = update.effective_user.id
+        internal_user_id = await self.sessions.get_internal_user_id(admin_id)
+        game = await self.connector.create_game("quiz", text, created_by=internal_user_id)
+        self.keyboards.invalidate(GAMES, internal_user_id)
+
+        game_id = game.id
+        new_state = f"{ADMIN}:{ADMIN_OPTIONS}"
+
+        await self.sessions.set_state(admin_id, new_state)
+        logger.info(f"Game {game_id} created. State updated to {new_state}.")
+        await admin_options(update, context)
+
+    @admin_states.on(ADD_QUESTION, TEXT)
+    async def on_text_add_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, game_id: str):
+        admin_id = update.effective_user.id
+        question = await self.connector.create_question(game_id, text)
+        question_id = question.id
+        self.keyboards.invalidate(QUESTIONS, game_id)
+
+        new_state = f"{ADMIN}:{GAME_OPTIONS}:{game_id}"
+        await self.sessions.set_state(admin_id, new_state)
+        logger.info(f"Question {question_id} created. State updated to {new_state}.")
+        await game_options(update, context, game_id)
+        # await question_options(update, context, question_id, game_id)
+
+    @admin_states.on(EDIT_QUESTION_TEXT, TEXT)
+    async def on_text_edit_question_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, question_id: str):
+        admin_id = update.effective_user.id
+        game_id = (await self.connector.update_question_text(question_id, text)).game_id
+        self.keyboards.invalidate(QUESTIONS, game_id)
+        self.invalidate_question_keyboards(question_id)
+
+        new_state = f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}"
+        await self.sessions.set_state(admin_id, new_state)
+        await question_options(update, context, question_id, game_id)
+
+    @admin_states.on(ADD_VARIANT, TEXT)
+    async def on_text_add_variant(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, question_id: str):
+        admin_id = update.effective_user.id
+        await self.connector.create_variant(question_id, text)
+        self.invalidate_question_keyboards(question_id)
+        await context.bot.send_message(
+            chat_id=admin_id,
+            text=f"Вариант ответа {text} сохранён",
+        )
+        new_state = f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}"
+        await self.sessions.set_state(admin_id, new_state)
+        await variant_options(update, context, question_id)
+
+    @admin_states.on(EDIT_VARIANT_TEXT, TEXT)
+    async def on_text_edit_variant_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, variant_id: str):
+        admin_id = update.effective_user.id
+        question_id = (await self.connector.update_variant_text(variant_id, text)).question_id
+        self.invalidate_question_keyboards(question_id)
+
+        new_state = f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}"
+        await self.sessions.set_state(admin_id, new_state)
+        await variant_options(update, context, question_id)
+
     async def change_correctness(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
@@ -569,27 +696,34 @@ class AdminFlow:
         await self.display_question(update, context, question_id)
         return
 
-    def get_question_data_to_send_players(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
-        admin_id = update.effective_chat.id
-        logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        question = self.connector.get_question(question_id)
-        question_text = question.question_text
-        variants = self.connector.get_variants_by_question(question_id)
-
-        raw_variants = self.connector.get_correct_variants_by_question_id(question_id)
-        self.selected_variants[question_id] = set(variant.id for variant in raw_variants)
-
+    def answer_keyboard(self, question: LiveQuestion) -> InlineKeyboardMarkup:
+        """
+        Клавиатура ответов на вопрос, строится один раз и берётся из кэша (см. start_game).
+        """
+        reply_markup = self.keyboards.get(ANSWERS, question.id, None, GAME_WORKFLOW)
+        if reply_markup is not None:
+            return reply_markup
         buttons = [
             InlineKeyboardButton(
-                variant.answer_text, callback_data=f"{GAME_WORKFLOW}:{variant.id}",
+                variant.answer_text, callback_data=encode_callback(GAMER, GAME_WORKFLOW, variant.id),
             )
-            for variant in variants
+            for variant in question.variants
         ]
         # Разбиваем кнопки на строки по 2 кнопки
         keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
         # Добавляем строку с кнопкой DONE_LABEL
-        # keyboard.append([InlineKeyboardButton(DONE_LABEL, callback_data=f"{ADMIN}:{DONE}:{question_id}")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # keyboard.append([InlineKeyboardButton(DONE_LABEL, callback_data=encode_callback(ADMIN, DONE, question_id))])
+        return self.keyboards.put(ANSWERS, question.id, None, GAME_WORKFLOW, InlineKeyboardMarkup(keyboard))
+
+    def get_question_data_to_send_players(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question: LiveQuestion):
+        admin_id = update.effective_chat.id
+        logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
+        question_text = question.question_text
+        variants = question.variants
+
+        self.selected_variants[question.id] = set(variant.id for variant in variants if variant.is_correct)
+
+        reply_markup = self.answer_keyboard(question)
         path_to_media = question.path_to_media
         return question_text, reply_markup, path_to_media
         # if path_to_media is None:
@@ -611,23 +745,23 @@ class AdminFlow:
     async def display_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
         admin_id = update.effective_chat.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        question = self.connector.get_question(question_id)
+        question = await self.connector.get_question(question_id)
         question_text = question.question_text
-        variants = self.connector.get_variants_by_question(question_id)
+        variants = await self.connector.get_variants_by_question(question_id)
 
-        raw_variants = self.connector.get_correct_variants_by_question_id(question_id)
+        raw_variants = await self.connector.get_correct_variants_by_question_id(question_id)
         self.selected_variants[question_id] = set(variant.id for variant in raw_variants)
 
         buttons = [
             InlineKeyboardButton(
-                f"✅ {variant.answer_text}" if variant.id in self.selected_variants[question_id] else variant.answer_text, callback_data=f"{ADMIN}:{SELECT}|{variant.id}",
+                f"✅ {variant.answer_text}" if variant.id in self.selected_variants[question_id] else variant.answer_text, callback_data=encode_callback(ADMIN, SELECT, variant.id),
             )
             for variant in variants
         ]
         # Разбиваем кнопки на строки по 2 кнопки
         keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
         # Добавляем строку с кнопкой DONE_LABEL
-        keyboard.append([InlineKeyboardButton(DONE_LABEL, callback_data=f"{ADMIN}:{DONE}:{question_id}")])
+        keyboard.append([InlineKeyboardButton(DONE_LABEL, callback_data=encode_callback(ADMIN, DONE, question_id))])
         reply_markup = InlineKeyboardMarkup(keyboard)
         path_to_media = question.path_to_media
         if path_to_media is None:
@@ -641,12 +775,12 @@ class AdminFlow:
                 chat_id=admin_id,
                 caption=question_text,
                 reply_markup=reply_markup,
-                photo=path_to_media,
+                photo=await self.media_cache.get(question_id, path_to_media) or path_to_media,
             )
         return
 
-    def update_variant_correctness(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variant_id: str, is_correct: bool = True):
-        variant = self.connector.get_variant(variant_id)
+    async def update_variant_correctness(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variant_id: str, is_correct: bool = True):
+        variant = await self.connector.get_variant(variant_id)
         self.update_variant_correctness_cached(update=update, context=context, variant_id=variant_id, question_id=variant.question_id)
 
     def update_variant_correctness_cached(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variant_id: str, question_id: str):
@@ -675,39 +809,44 @@ class AdminFlow:
             except Exception as e:
                 logger.error(f"Caught exception: {e}")
 
+    @with_admin_session
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Обрабатывает фото, если администратор решил прикрепить изображение к вопросу.
         """
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        current_state = self.connector.get_internal_user_state(admin_id)
-        if not current_state.startswith(f"{ADMIN}:{UPDATE_IMAGE}:"):
-            await update.message.reply_text("Фото не ожидается в текущем состоянии.")
-            return
+        current_state = (await self.sessions.get_state(admin_id)).split(":")
         # {ADMIN}:{UPDATE_IMAGE}:<question_id>
-        question_id = current_state.split(":")[-1]
-        question = self.connector.get_question(question_id)
+        if len(current_state) < 3 or not await admin_states.dispatch(self, current_state[1], IMAGE, update, context, current_state[-1]):
+            await update.message.reply_text("Фото не ожидается в текущем состоянии.")
+
+    @admin_states.on(UPDATE_IMAGE, IMAGE)
+    async def on_image_update_image(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
+        admin_id = update.effective_user.id
+        question = await self.connector.get_question(question_id)
         game_id = question.game_id
         # Предположим, текст вопроса уже введён и сохранён; извлекаем его из базы, если нужно
         # question_text = "текст_из_базы"  # Здесь вы должны получить фактический текст вопроса, если он сохранён в таблице Question
         # question = self.connector.create_question(game_id, question_text, path_to_media=None)
 
-        photo_file = await update.message.photo[-1].get_file()
+        photo = update.message.photo[-1]
+        photo_file = await photo.get_file()
         folder = os.path.join("media", game_id)
         os.makedirs(folder, exist_ok=True)
         file_path = os.path.join(folder, f"{question_id}.jpg")
         await photo_file.download_to_drive(file_path)
-        self.connector.create_media(
+        await self.connector.create_media(
             question_id=question_id,
             media_type="image",
             url=file_path,
             description="",
             display_type="individual",
+            file_id=photo.file_id,
         )
-        question.path_to_media = file_path
-
-        self.connector.commit()
+        # Картинка уже лежит в Telegram, поэтому её file_id сразу можно использовать для рассылки
+        await self.connector.update_question_media(question_id, file_path, photo.file_id)
+        self.media_cache.invalidate(question_id)
     
         await update.message.reply_text("Фото добавлено к вопросу.")
 
@@ -715,15 +854,33 @@ class AdminFlow:
         logger.info("Photo processed for question.")
 
         new_state = f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}"
-        self.connector.update_internal_user_state(admin_id, new_state)
+        await self.sessions.set_state(admin_id, new_state)
 
         await question_options(update, context, question_id, game_id)
 
+    async def move_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str, step: int):
+        admin_id = update.effective_user.id
+        logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
+        await update.callback_query.edit_message_reply_markup(reply_markup=None)
+        game_id = (await self.connector.get_question(question_id)).game_id
+        neighbour = await self.connector.move_question(question_id, step)
+        if neighbour is None:
+            text = "Вопрос уже первый" if step < 0 else "Вопрос уже последний"
+        else:
+            # номера на кнопках списка вопросов устарели
+            self.keyboards.invalidate(QUESTIONS, game_id)
+            text = admin_states.node(MOVE_QUESTION_UP if step < 0 else MOVE_QUESTION_DOWN).end_message
+        await self.sessions.set_state(admin_id, f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}")
+        await context.bot.send_message(
+            chat_id=admin_id,
+            text=f"{text}\n{admin_states.node(QUESTION_OPTIONS).begin_message}",
+            reply_markup=await generate_inline_buttons_by_state(QUESTION_OPTIONS, game_id=game_id, question_id=question_id),
+        )
+
     async def variant_to_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        variants = self.connector.get_variants_by_question(question_id)
-        reply_markup = self.generate_inline_buttons_for_variants(update, context, variants, 1, f"{EDIT_VARIANT_TEXT}")
+        reply_markup = await self.variants_keyboard(update, context, question_id, 1, f"{EDIT_VARIANT_TEXT}")
         return reply_markup
         await context.bot.send_message(
             chat_id=admin_id,
@@ -735,8 +892,7 @@ class AdminFlow:
     async def variant_to_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        variants = self.connector.get_variants_by_question(question_id)
-        reply_markup = self.generate_inline_buttons_for_variants(update, context, variants, 1, f"{DELETE_VARIANT}")
+        reply_markup = await self.variants_keyboard(update, context, question_id, 1, f"{DELETE_VARIANT}")
         return reply_markup
         await context.bot.send_message(
             chat_id=admin_id,
@@ -748,8 +904,7 @@ class AdminFlow:
     async def question_to_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        questions = self.connector.get_questions_by_game(game_id)
-        reply_markup = self.generate_inline_buttons_for_questions(update, context, questions, 1, f"{QUESTION_OPTIONS}")
+        reply_markup = await self.questions_keyboard(update, context, game_id, 1, f"{QUESTION_OPTIONS}")
         return reply_markup
         print(f"**************************************** game_id = {game_id}, reply_markup = {reply_markup}")
         await context.bot.send_message(
@@ -762,8 +917,7 @@ class AdminFlow:
     async def question_to_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        questions = self.connector.get_questions_by_game(game_id)
-        reply_markup = self.generate_inline_buttons_for_questions(update, context, questions, 1, f"{DELETE_QUESTION}")
+        reply_markup = await self.questions_keyboard(update, context, game_id, 1, f"{DELETE_QUESTION}")
         return reply_markup
         print(f"**************************************** game_id = {game_id}, reply_markup = {reply_markup}")
         await context.bot.send_message(
@@ -776,8 +930,7 @@ class AdminFlow:
     async def game_to_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE, internal_user_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        games = self.connector.get_games_by_creator_id(internal_user_id)
-        reply_markup = self.generate_inline_buttons_for_games(update, context, games, 1, f"{GAME_OPTIONS}")
+        reply_markup = await self.games_keyboard(update, context, internal_user_id, 1, f"{GAME_OPTIONS}")
         return reply_markup
         print(f"***************************************** admin_id = {admin_id}, reply_markup = {reply_markup}")
         await context.bot.send_message(
@@ -790,8 +943,7 @@ class AdminFlow:
     async def game_to_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE, internal_user_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        games = self.connector.get_games_by_creator_id(internal_user_id)
-        reply_markup = self.generate_inline_buttons_for_games(update, context, games, 1, f"{DELETE_GAME}")
+        reply_markup = await self.games_keyboard(update, context, internal_user_id, 1, f"{DELETE_GAME}")
         return reply_markup
         print(f"***************************************** admin_id = {admin_id}, reply_markup = {reply_markup}")
         await context.bot.send_message(
@@ -801,43 +953,56 @@ class AdminFlow:
         )
         return
 
-    async def remove_inline_keyboards(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        admin_id = update.effective_user.id
-        logger.debug(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        # Проходим по всем сохранённым сообщениям
-        for chat_id, message_ids in list(self.sent_messages.items()):
-            for message_id in list(message_ids):
-                try:
-                    await context.bot.edit_message_reply_markup(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        reply_markup=None
-                    )
-                except Exception as e:
-                    logger.error(f"Ошибка при редактировании сообщения {message_id} для {chat_id}: {e}")
-                    # Удаляем сообщение из списка, если редактирование не удалось
-                    message_ids.remove(message_id)
-            # Если для chat_id больше нет сообщений, удаляем ключ из словаря
-            if not message_ids:
-                del self.sent_messages[chat_id]
+    async def remove_inline_keyboards(self, bot: Bot, game_session_id: str, question_id: str | None = None):
+        """
+        Снимает клавиатуры вопроса (по умолчанию всех открытых вопросов сессии).
+        Правки идут параллельно через broadcaster с теми же лимитами, что и рассылка.
+        """
+        logger.debug(f"{ADMIN} called {inspect.currentframe().f_code.co_name}")
+        chats = self.messages.pop(game_session_id, question_id)
+        if not chats:
+            return
+
+        async def remove_keyboards(chat_id: int):
+            for message_id in chats[chat_id]:
+                await bot.edit_message_reply_markup(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    reply_markup=None,
+                )
+            return True
+
+        report = await self.broadcaster.broadcast(chats, remove_keyboards)
+        logger.info(f"keyboards removed in {game_session_id}: {report.summary()}")
 
     async def generate_results(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str):
         logger.debug(f"game_session_id: {game_session_id}")
-        results = self.connector.get_results_for_game_session(game_session_id)
+        # результаты должны учитывать ответы, которые ещё лежат в буфере
+        await self.answer_buffer.flush()
+        leaderboard = await self.leaderboards.get_or_load(game_session_id)
+        results = leaderboard.top()
         logger.debug(f"results: {results}")
         message = "Итак, вот результаты:\n"
-        for i, (nickname, score, total_time) in enumerate(results, start=1):
-            message += f"{i}. {nickname}: {score}\n"
-        players = self.connector.get_players_by_game_session_id(game_session_id)
+        for i, entry in enumerate(results, start=1):
+            message += f"{i}. {entry.nickname}: {entry.score}\n"
+        players = await self.connector.get_players_by_game_session_id(game_session_id)
         player_ids = [player.telegram_id for player in players]
         await self.send_message_to_everyone(update, context, player_ids, message, None)
+        self.leaderboards.evict(game_session_id)
 
     async def finish_game(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str):
-        players = self.connector.get_players_by_game_session_id(game_session_id)
-        player_ids = [player.telegram_id for player in players]
+        state = await self.live_games.get_or_build(game_session_id)
+        player_ids = state.player_ids
+        try:
+            await export_latency(game_session_id, state.latency, state.question_latency)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить статистику времени ответов: {e}")
+        self.live_games.evict(game_session_id)
+        self.messages.evict(game_session_id)
+        await self.game_codes.release(game_session_id)
         await self.send_message_to_everyone(update, context, player_ids, "Игра закончена!\nГотовы к реультатам?", None, None)
         reply_markup = InlineKeyboardMarkup([
-            [InlineKeyboardButton("Показать результаты", callback_data=f"{ADMIN}:{SHOW_RESULTS}:{game_session_id}")]
+            [InlineKeyboardButton("Показать результаты", callback_data=encode_callback(ADMIN, SHOW_RESULTS, game_session_id))]
         ])
         admin_id = update.effective_user.id
         await context.bot.send_message(
@@ -846,86 +1011,137 @@ class AdminFlow:
             reply_markup=reply_markup,
         )
 
-    async def send_message_to_everyone(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_ids: list, text: str, reply_markup, path_to_image: str | None = None):
-        for player in user_ids:
-            try:
-                if path_to_image:
-                    sent_message = await context.bot.send_photo(
-                        chat_id=player,
-                        photo=path_to_image,
-                        caption=text,
-                        reply_markup=reply_markup,
-                    )
-                else:
-                    sent_message = await context.bot.send_message(
-                        chat_id=player,
-                        text=text,
-                        reply_markup=reply_markup,
-                    )
-                # Сохраняем message_id в словаре для данного chat_id
-                self.sent_messages.setdefault(player, []).append(sent_message.message_id)
-            except Exception as e:
-                logger.error(f"Ошибка при отправке сообщения для {player}: {e}")
-        logger.debug(f"sent messages = {self.sent_messages}")
+    async def send_message_to_everyone(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user_ids: list, text: str, reply_markup, path_to_image: str | None = None, question_id: str | None = None, on_delivered=None, game_session_id: str | None = None):
+        photo = path_to_image
+        if path_to_image and question_id:
+            photo = await self.media_cache.get(question_id, path_to_image) or path_to_image
+
+        async def send(chat_id: int):
+            if photo:
+                return await context.bot.send_photo(
+                    chat_id=chat_id,
+                    photo=photo,
+                    caption=text,
+                    reply_markup=reply_markup,
+                )
+            return await context.bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                reply_markup=reply_markup,
+            )
+
+        started_at = time.monotonic()
+        uploaded = []
+        pending = list(user_ids)
+        if path_to_image and photo == path_to_image:
+            # Файл загружаем один раз, остальным игрокам отправляем его file_id
+            while pending:
+                result = await self.broadcaster.deliver(pending.pop(0), send, started_at, on_delivered)
+                uploaded.append(result)
+                if result.ok:
+                    photo = result.message.photo[-1].file_id
+                    if question_id:
+                        await self.media_cache.store(question_id, path_to_image, photo)
+                    break
+        report = await self.broadcaster.broadcast(pending, send, started_at, uploaded, on_delivered)
+        if game_session_id and question_id:
+            for result in report.results:
+                if result.ok:
+                    # клавиатура ответов снимается при закрытии вопроса
+                    self.messages.record(game_session_id, question_id, result.chat_id, result.message.message_id)
+        return report
 
     async def send_question_to_everyone(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str, question_number: int):
         admin_id = update.effective_user.id
         logger.debug(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        players = self.connector.get_players_by_game_session_id(game_session_id)
-        game_id = self.connector.get_game_session(game_session_id).game_id
-        questions = self.connector.get_questions_by_game(game_id)
-        logger.debug(f"questions = {questions}")
-        if len(questions) <= question_number:
+        # после перезапуска бота состояние игры восстанавливается из базы
+        state = await self.live_games.get_or_build(game_session_id)
+        logger.debug(f"questions = {[question.id for question in state.questions]}")
+        if len(state.questions) <= question_number:
             await self.finish_game(update, context, game_session_id)
             return
-        current_question_id = questions[question_number].id
+        await self.live_games.set_current_question(state, question_number)
+        current_question_id = state.current_question.id
         logger.debug(f"current_question_id = {current_question_id}")
-        self.connector.update_game_session_state(game_session_id, current_question_id)
-        self.connector.update_game_session_question_id(game_session_id, current_question_id)
-        text, reply_markup, path_to_image = self.get_question_data_to_send_players(update, context, current_question_id)
+        await self.connector.update_game_session_state(game_session_id, current_question_id)
+        text, reply_markup, path_to_image = self.get_question_data_to_send_players(update, context, state.current_question)
         logger.debug(f"text = {text}, reply_markup = {reply_markup}, path_to_image = {path_to_image}")
-        player_ids = [player.telegram_id for player in players]
-        await self.send_message_to_everyone(update, context, player_ids, text, reply_markup, path_to_image)
+        player_ids = state.player_ids
+        await self.send_message_to_everyone(
+            update, context, player_ids, text, reply_markup, path_to_image, current_question_id,
+            on_delivered=lambda result: state.mark_delivered(result.chat_id, result.delivered_at),
+            game_session_id=game_session_id,
+        )
+
+        # вопрос закроется по таймеру, когда ответят все или по кнопке, см. close_question
+        await self.scheduler.schedule(game_session_id, question_number, admin_id)
+        await context.bot.send_message(
+            chat_id=admin_id,
+            text=f"Вопрос {question_number + 1} отправлен",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("⏹ Закончить вопрос", callback_data=encode_callback(ADMIN, CLOSE_QUESTION, game_session_id))]
+            ]),
+        )
+        return
 
-        logger.debug(f"going sleep")
-        await asyncio.sleep(63)
-        await self.remove_inline_keyboards(update, context)
-        logger.debug(f"woke up, removed keyboards")
+    async def close_question(self, bot: Bot, timer: QuestionTimer):
+        await self.remove_inline_keyboards(bot, timer.game_session_id)
+        logger.debug(f"closed {timer}, removed keyboards")
 
+        state = self.live_games.get(timer.game_session_id)
+        if state is not None and timer.question_number < len(state.questions):
+            # следующий вопрос ищется по position, а не по номеру в списке
+            next_question_data = encode_callback(ADMIN, NEXT_QUESTION, state.questions[timer.question_number].position)
+        else:
+            next_question_data = encode_callback(ADMIN, CHANGE_QUESTION, timer.question_number + 1)
         keyboard = [
-            [InlineKeyboardButton("➡️", callback_data=f"{ADMIN}:{CHANGE_QUESTION}|{question_number + 1}")]
+            [InlineKeyboardButton("➡️", callback_data=next_question_data)]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await context.bot.send_message(
-            chat_id=admin_id,
-            text="Можешь переключать вопросы",
+        text = "Можешь переключать вопросы"
+        leaderboard = self.leaderboards.get(timer.game_session_id)
+        if leaderboard is not None and len(leaderboard):
+            standings = "\n".join(
+                f"{i}. {entry.nickname}: {entry.score}"
+                for i, entry in enumerate(leaderboard.top(LIVE_STANDINGS_SIZE), start=1)
+            )
+            text = f"{text}\n\nСейчас лидируют:\n{standings}"
+        await bot.send_message(
+            chat_id=timer.admin_id,
+            text=text,
             reply_markup=reply_markup,
         )
-        return
 
     async def start_game(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_session_id: str):
         admin_id = update.effective_user.id
-        self.connector.update_internal_user_state(admin_id, f"{ADMIN}:{GAME_WORKFLOW}:{game_session_id}")
+        await self.sessions.set_state(admin_id, f"{ADMIN}:{GAME_WORKFLOW}:{game_session_id}")
+        state = await self.live_games.build(game_session_id)
+        await self.leaderboards.get_or_load(game_session_id)
+        # клавиатуры ответов и file_id картинок готовятся заранее,
+        # чтобы рассылка вопросов не читала базу и не собирала клавиатуры
+        for question in state.questions:
+            self.answer_keyboard(question)
+            if question.path_to_media:
+                await self.media_cache.get(question.id, question.path_to_media)
         await self.send_question_to_everyone(update, context, game_session_id, 0)
 
     async def game_to_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE, internal_user_id: str):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        games = self.connector.get_games_by_creator_id(internal_user_id)
-        reply_markup = self.generate_inline_buttons_for_games(update, context, games, 1, f"{WAITING_START}")
+        reply_markup = await self.games_keyboard(update, context, internal_user_id, 1, f"{WAITING_START}")
         return reply_markup
 
     async def edit_game_by_game_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE, admin_id: str, game_id: str):
         new_state = f"{ADMIN}:{GAME_OPTIONS}:{game_id}"
-        self.connector.update_internal_user_state(admin_id, new_state)
+        await self.sessions.set_state(admin_id, new_state)
         await game_options(update, context, game_id)
 
     async def delete_question_by_question_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
-        game_id = self.connector.get_question(question_id).game_id
+        game_id = (await self.connector.get_question(question_id)).game_id
         new_state = f"{ADMIN}:{GAME_OPTIONS}:{game_id}"
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        self.connector.update_internal_user_state(admin_id, new_state)
+        await self.sessions.set_state(admin_id, new_state)
         await context.bot.send_message(
             chat_id=admin_id,
             text="Функционал удаления вопроса, пока что, замокан 🙁",
@@ -936,7 +1152,7 @@ class AdminFlow:
         new_state = f"{ADMIN}:{ADMIN_OPTIONS}"
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        self.connector.update_internal_user_state(admin_id, new_state)
+        await self.sessions.set_state(admin_id, new_state)
         await context.bot.send_message(
             chat_id=admin_id,
             text="Функционал удаления игры, пока что, замокан 🙁",
@@ -945,132 +1161,141 @@ class AdminFlow:
         logger.info(f"Админ {admin_id} запущен в режиме '{ADMIN_OPTIONS}'.")
 
     async def delete_variant_by_variant_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variant_id: str):
-        question_id = self.connector.get_variant(variant_id)
+        question_id = (await self.connector.get_variant(variant_id)).question_id
         new_state = f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}"
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called delete_variant_by_variant_id")
-        self.connector.delete_variant(variant_id)
+        await self.connector.delete_variant(variant_id)
+        self.invalidate_question_keyboards(question_id)
         await variant_options(update, context, question_id)
 
-    def generate_inline_buttons_for_variants(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variants: list[Variant], page = 1, action: str = f"{VARIANT_OPTIONS}"):
+    async def generate_inline_buttons_for_variants(self, update: Update, context: ContextTypes.DEFAULT_TYPE, variants: list[Variant], total: int, page = 1, action: str = f"{VARIANT_OPTIONS}", question_id: str | None = None):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        per_page = 6
-        total_variants = len(variants)
-        total_pages = (total_variants + per_page - 1) // per_page # round up
-
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_variants = variants[start:end]
+        total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE # round up
 
         buttons = []
-        for variant in page_variants:
+        for variant in variants:
             # for question its title, TODO: add unify method for any object
-            button = InlineKeyboardButton(variant.answer_text, callback_data=f"{ADMIN}:{action}:{variant.id}")
+            button = InlineKeyboardButton(variant.answer_text, callback_data=encode_callback(ADMIN, action, variant.id))
             buttons.append(button)
 
         keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
 
         navigation_buttons = []
-        if page > 1:
-            navigation_buttons.append(InlineKeyboardButton("⬅️", callback_data=f"{ADMIN}:{PAGE_VARIANTS}|{page - 1}"))
-        if page < total_pages:
-            navigation_buttons.append(InlineKeyboardButton("➡️", callback_data=f"{ADMIN}:{PAGE_VARIANTS}|{page + 1}"))
+        if page > 1 and variants:
+            navigation_buttons.append(InlineKeyboardButton("⬅️", callback_data=encode_callback(ADMIN, PAGE_VARIANTS, page - 1, PAGE_BACK, variants[0].id)))
+        if page < total_pages and variants:
+            navigation_buttons.append(InlineKeyboardButton("➡️", callback_data=encode_callback(ADMIN, PAGE_VARIANTS, page + 1, PAGE_FORWARD, variants[-1].id)))
         if navigation_buttons:
             keyboard.append(navigation_buttons)
-        question_id = self.connector.get_internal_user_state(admin_id).split(":")[-1]
-        keyboard.append([InlineKeyboardButton(CANCEL_LABEL, callback_data=f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}")])
+        if question_id is None:
+            question_id = (await self.sessions.get_state(admin_id)).split(":")[-1]
+        keyboard.append([InlineKeyboardButton(CANCEL_LABEL, callback_data=encode_callback(ADMIN, VARIANT_OPTIONS, question_id))])
         logger.debug(f"generated keyboard = {keyboard}")
         return InlineKeyboardMarkup(keyboard)
 
-    def generate_inline_buttons_for_questions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, questions: list[Question], page = 1, action: str = f"{QUESTION_OPTIONS}"):
+    async def generate_inline_buttons_for_questions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, questions: list[Question], total: int, page = 1, action: str = f"{QUESTION_OPTIONS}", game_id: str | None = None):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        per_page = 6
-        total_questions = len(questions)
-        total_pages = (total_questions + per_page - 1) // per_page # round up
-
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_questions = questions[start:end]
+        total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE # round up
 
         buttons = []
-        for question in page_questions:
+        for question in questions:
             # for question its title, TODO: add unify method for any object
-            button = InlineKeyboardButton(question.question_text, callback_data=f"{ADMIN}:{action}:{question.id}")
+            button = InlineKeyboardButton(question.question_text, callback_data=encode_callback(ADMIN, action, question.id))
             buttons.append(button)
 
         keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
 
         navigation_buttons = []
-        if page > 1:
-            navigation_buttons.append(InlineKeyboardButton("⬅️", callback_data=f"{ADMIN}:{PAGE_QUESTIONS}|{page - 1}"))
-        if page < total_pages:
-            navigation_buttons.append(InlineKeyboardButton("➡️", callback_data=f"{ADMIN}:{PAGE_QUESTIONS}|{page + 1}"))
+        if page > 1 and questions:
+            navigation_buttons.append(InlineKeyboardButton("⬅️", callback_data=encode_callback(ADMIN, PAGE_QUESTIONS, page - 1, PAGE_BACK, questions[0].position)))
+        if page < total_pages and questions:
+            navigation_buttons.append(InlineKeyboardButton("➡️", callback_data=encode_callback(ADMIN, PAGE_QUESTIONS, page + 1, PAGE_FORWARD, questions[-1].position)))
         if navigation_buttons:
             keyboard.append(navigation_buttons)
-        game_id = self.connector.get_internal_user_state(admin_id).split(":")[-1]
-        keyboard.append([InlineKeyboardButton(CANCEL_LABEL, callback_data=f"{ADMIN}:{GAME_OPTIONS}:{game_id}")])
+        if game_id is None:
+            game_id = (await self.sessions.get_state(admin_id)).split(":")[-1]
+        keyboard.append([InlineKeyboardButton(CANCEL_LABEL, callback_data=encode_callback(ADMIN, GAME_OPTIONS, game_id))])
         logger.debug(f"generated keyboard = {keyboard}")
         return InlineKeyboardMarkup(keyboard)
 
-    def generate_inline_buttons_for_games(self, update: Update, context: ContextTypes.DEFAULT_TYPE, games: list[Game], page = 1, action: str = f"{GAME_OPTIONS}"):
+    def generate_inline_buttons_for_games(self, update: Update, context: ContextTypes.DEFAULT_TYPE, games: list[Game], total: int, page = 1, action: str = f"{GAME_OPTIONS}"):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        per_page = 6
-        total_games = len(games)
-        total_pages = (total_games + per_page - 1) // per_page # round up
-
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_games = games[start:end]
+        total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE # round up
 
         buttons = []
-        for game in page_games:
+        for game in games:
             # for game its title, TODO: add unify method for any object
-            button = InlineKeyboardButton(game.title, callback_data=f"{ADMIN}:{action}:{game.id}")
+            button = InlineKeyboardButton(game.title, callback_data=encode_callback(ADMIN, action, game.id))
             buttons.append(button)
 
         keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
 
         navigation_buttons = []
-        if page > 1:
-            navigation_buttons.append(InlineKeyboardButton("⬅️", callback_data=f"{ADMIN}:{PAGE_GAMES}|{page - 1}"))
-        if page < total_pages:
-            navigation_buttons.append(InlineKeyboardButton("➡️", callback_data=f"{ADMIN}:{PAGE_GAMES}|{page + 1}"))
+        if page > 1 and games:
+            navigation_buttons.append(InlineKeyboardButton("⬅️", callback_data=encode_callback(ADMIN, PAGE_GAMES, page - 1, PAGE_BACK, games[0].id)))
+        if page < total_pages and games:
+            navigation_buttons.append(InlineKeyboardButton("➡️", callback_data=encode_callback(ADMIN, PAGE_GAMES, page + 1, PAGE_FORWARD, games[-1].id)))
         if navigation_buttons:
             keyboard.append(navigation_buttons)
-        keyboard.append([InlineKeyboardButton(CANCEL_LABEL, callback_data=f"{ADMIN}:{ADMIN_OPTIONS}")])
+        keyboard.append([InlineKeyboardButton(CANCEL_LABEL, callback_data=encode_callback(ADMIN, ADMIN_OPTIONS))])
         logger.debug(f"generated keyboard = {keyboard}")
         return InlineKeyboardMarkup(keyboard)
 
-    async def handle_changing_page_games(self, update: Update, context: ContextTypes.DEFAULT_TYPE, admin_id: int, new_page: int, action: str):
+    async def games_keyboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE, internal_user_id: str, page: int, action: str, direction: int = PAGE_FORWARD, boundary: str | None = None):
+        async def build():
+            games = await self.connector.get_games_page(internal_user_id, PAGE_SIZE, **page_window(page, direction, boundary))
+            total = await self.connector.count_games_by_creator_id(internal_user_id)
+            return self.generate_inline_buttons_for_games(update, context, games, total, page, action)
+        return await self.keyboards.get_or_build(GAMES, internal_user_id, page, action, build)
+
+    async def questions_keyboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str, page: int, action: str, direction: int = PAGE_FORWARD, boundary: int | None = None):
+        async def build():
+            questions = await self.connector.get_questions_page(game_id, PAGE_SIZE, **page_window(page, direction, boundary))
+            total = await self.connector.count_questions_by_game(game_id)
+            return await self.generate_inline_buttons_for_questions(update, context, questions, total, page, action, game_id)
+        return await self.keyboards.get_or_build(QUESTIONS, game_id, page, action, build)
+
+    async def variants_keyboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str, page: int, action: str, direction: int = PAGE_FORWARD, boundary: str | None = None):
+        async def build():
+            variants = await self.connector.get_variants_page(question_id, PAGE_SIZE, **page_window(page, direction, boundary))
+            total = await self.connector.count_variants_by_question(question_id)
+            return await self.generate_inline_buttons_for_variants(update, context, variants, total, page, action, question_id)
+        return await self.keyboards.get_or_build(VARIANTS, question_id, page, action, build)
+
+    def invalidate_question_keyboards(self, question_id: str):
+        """
+        Сбрасывает клавиатуры, построенные из вариантов вопроса.
+        """
+        self.keyboards.invalidate(VARIANTS, question_id)
+        self.keyboards.invalidate(ANSWERS, question_id)
+
+    async def handle_changing_page_games(self, update: Update, context: ContextTypes.DEFAULT_TYPE, admin_id: int, new_page: int, action: str, direction: int = PAGE_FORWARD, boundary: str | None = None):
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        internal_user_id = self.connector.get_internal_user_by_telegram_id(admin_id).id
-        games = self.connector.get_games_by_creator_id(internal_user_id)
-        reply_markup = self.generate_inline_buttons_for_games(update, context, games, new_page, action)
+        internal_user_id = await self.sessions.get_internal_user_id(admin_id)
+        reply_markup = await self.games_keyboard(update, context, internal_user_id, new_page, action, direction, boundary)
         logger.debug(f"new reply_markup = {reply_markup}")
         query = update.callback_query
         await query.edit_message_reply_markup(reply_markup=reply_markup)
         await query.answer()  # Обязательно вызываем query.answer(), чтобы убрать "часики" у кнопки
 
-    async def handle_changing_page_questions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str, new_page: int, action: str):
+    async def handle_changing_page_questions(self, update: Update, context: ContextTypes.DEFAULT_TYPE, game_id: str, new_page: int, action: str, direction: int = PAGE_FORWARD, boundary: int | None = None):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        questions = self.connector.get_questions_by_game(game_id)
         print(f"********************** (from handle_changing_page_questions): game_id = {game_id}")
-        print(f"********************** (from handle_changing_page_questions): questions = {questions}")
-        reply_markup = self.generate_inline_buttons_for_questions(update, context, questions, new_page, action)
+        reply_markup = await self.questions_keyboard(update, context, game_id, new_page, action, direction, boundary)
         logger.debug(f"new reply_markup = {reply_markup}")
         query = update.callback_query
         await query.edit_message_reply_markup(reply_markup=reply_markup)
         await query.answer()  # Обязательно вызываем query.answer(), чтобы убрать "часики" у кнопки
 
-    async def handle_changing_page_variants(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str, new_page: int, action: str):
+    async def handle_changing_page_variants(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str, new_page: int, action: str, direction: int = PAGE_FORWARD, boundary: str | None = None):
         admin_id = update.effective_user.id
         logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
-        variants = self.connector.get_variants_by_question(question_id)
-        reply_markup = self.generate_inline_buttons_for_variants(update, context, variants, new_page, action)
+        reply_markup = await self.variants_keyboard(update, context, question_id, new_page, action, direction, boundary)
         logger.debug(f"new reply_markup = {reply_markup}")
         query = update.callback_query
         await query.edit_message_reply_markup(reply_markup=reply_markup)
@@ -1079,4 +1304,6 @@ class AdminFlow:
 # Глобальный объект AdminFlow; если у вас может быть несколько администраторов, лучше создавать его при /start для каждого.
 # Здесь мы инициализируем его с использованием сессии из db_connector.
 from queries import db_connector
-admin_flow = AdminFlow(db_connector)
+# таблица ADMIN_STATES проверяется при запуске, после регистрации обработчиков AdminFlow
+admin_states.compile()
+admin_flow = AdminFlow(db_connector, broadcaster, answer_buffer, live_games, leaderboards, question_scheduler, message_registry, keyboard_cache, game_codes, admin_sessions)
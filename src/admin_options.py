@@ -10,6 +10,7 @@ from telegram.ext import (
 import inspect
 from logger import get_logger
 from admin_constants import *
+from callback_codec import encode_callback
 
 logger = get_logger(__name__)
 
@@ -17,10 +18,10 @@ async def admin_options(update: Update, context: ContextTypes.DEFAULT_TYPE):
     admin_id = update.effective_user.id
     logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
     keyboard = [
-        [InlineKeyboardButton("Создать новую игру",     callback_data=f"{ADMIN}:{CREATE_GAME}")],
-        [InlineKeyboardButton("Редактировать игру",     callback_data=f"{ADMIN}:{GAME_TO_EDIT}")],
-        [InlineKeyboardButton("Удалить игру",           callback_data=f"{ADMIN}:{GAME_TO_DELETE}")],
-        [InlineKeyboardButton("Другие команды",         callback_data=f"{ADMIN}:{START_GAME}")],
+        [InlineKeyboardButton("Создать новую игру",     callback_data=encode_callback(ADMIN, CREATE_GAME))],
+        [InlineKeyboardButton("Редактировать игру",     callback_data=encode_callback(ADMIN, GAME_TO_EDIT))],
+        [InlineKeyboardButton("Удалить игру",           callback_data=encode_callback(ADMIN, GAME_TO_DELETE))],
+        [InlineKeyboardButton("Другие команды",         callback_data=encode_callback(ADMIN, START_GAME))],
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await context.bot.send_message(
@@ -33,10 +34,10 @@ async def game_options(update: Update, context: ContextTypes.DEFAULT_TYPE, game_
     admin_id = update.effective_user.id
     logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
     keyboard = [
-        [InlineKeyboardButton(ADD_QUESTION_LABEL,           callback_data=f"{ADMIN}:{ADD_QUESTION}:{game_id}")],
-        [InlineKeyboardButton(QUESTION_TO_EDIT_LABEL,       callback_data=f"{ADMIN}:{QUESTION_TO_EDIT}:{game_id}")],
-        [InlineKeyboardButton(QUESTION_TO_DELETE_LABEL,     callback_data=f"{ADMIN}:{QUESTION_TO_DELETE}:{game_id}")],
-        [InlineKeyboardButton(CANCEL_LABEL,                 callback_data=f"{ADMIN}:{ADMIN_OPTIONS}")]
+        [InlineKeyboardButton(ADD_QUESTION_LABEL,           callback_data=encode_callback(ADMIN, ADD_QUESTION, game_id))],
+        [InlineKeyboardButton(QUESTION_TO_EDIT_LABEL,       callback_data=encode_callback(ADMIN, QUESTION_TO_EDIT, game_id))],
+        [InlineKeyboardButton(QUESTION_TO_DELETE_LABEL,     callback_data=encode_callback(ADMIN, QUESTION_TO_DELETE, game_id))],
+        [InlineKeyboardButton(CANCEL_LABEL,                 callback_data=encode_callback(ADMIN, ADMIN_OPTIONS))]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await context.bot.send_message(
@@ -49,11 +50,15 @@ async def question_options(update: Update, context: ContextTypes.DEFAULT_TYPE, q
     admin_id = update.effective_user.id
     logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
     keyboard = [
-        [InlineKeyboardButton(EDIT_QUESTION_TEXT_LABEL,         callback_data=f"{ADMIN}:{EDIT_QUESTION_TEXT}:{question_id}")],
-        [InlineKeyboardButton(VARIANT_OPTIONS_LABEL,            callback_data=f"{ADMIN}:{VARIANT_OPTIONS}:{question_id}")],
-        [InlineKeyboardButton(UPDATE_IMAGE_LABEL,               callback_data=f"{ADMIN}:{UPDATE_IMAGE}:{question_id}")],
-        [InlineKeyboardButton(CHANGE_CORRECTNESS_LABEL,         callback_data=f"{ADMIN}:{CHANGE_CORRECTNESS}:{question_id}")],
-        [InlineKeyboardButton(CANCEL_LABEL,                     callback_data=f"{ADMIN}:{GAME_OPTIONS}:{game_id}")],
+        [InlineKeyboardButton(EDIT_QUESTION_TEXT_LABEL,         callback_data=encode_callback(ADMIN, EDIT_QUESTION_TEXT, question_id))],
+        [InlineKeyboardButton(VARIANT_OPTIONS_LABEL,            callback_data=encode_callback(ADMIN, VARIANT_OPTIONS, question_id))],
+        [InlineKeyboardButton(UPDATE_IMAGE_LABEL,               callback_data=encode_callback(ADMIN, UPDATE_IMAGE, question_id))],
+        [InlineKeyboardButton(CHANGE_CORRECTNESS_LABEL,         callback_data=encode_callback(ADMIN, CHANGE_CORRECTNESS, question_id))],
+        [
+            InlineKeyboardButton(MOVE_QUESTION_UP_LABEL,        callback_data=encode_callback(ADMIN, MOVE_QUESTION_UP, question_id)),
+            InlineKeyboardButton(MOVE_QUESTION_DOWN_LABEL,      callback_data=encode_callback(ADMIN, MOVE_QUESTION_DOWN, question_id)),
+        ],
+        [InlineKeyboardButton(CANCEL_LABEL,                     callback_data=encode_callback(ADMIN, GAME_OPTIONS, game_id))],
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await context.bot.send_message(
@@ -66,10 +71,10 @@ async def variant_options(update: Update, context: ContextTypes.DEFAULT_TYPE, qu
     admin_id = update.effective_user.id
     logger.info(f"{ADMIN} {admin_id} called {inspect.currentframe().f_code.co_name}")
     keyboard = [
-        [InlineKeyboardButton(ADD_VARIANT_LABEL,                callback_data=f"{ADMIN}:{ADD_VARIANT}:{question_id}")],
-        [InlineKeyboardButton(EDIT_VARIANT_LABEL,               callback_data=f"{ADMIN}:{VARIANT_TO_EDIT}:{question_id}")],
-        [InlineKeyboardButton(VARIANT_TO_DELETE_LABEL,          callback_data=f"{ADMIN}:{VARIANT_TO_DELETE}:{question_id}")],
-        [InlineKeyboardButton(CANCEL_LABEL,                     callback_data=f"{ADMIN}:{QUESTION_OPTIONS}:{question_id}")]
+        [InlineKeyboardButton(ADD_VARIANT_LABEL,                callback_data=encode_callback(ADMIN, ADD_VARIANT, question_id))],
+        [InlineKeyboardButton(EDIT_VARIANT_LABEL,               callback_data=encode_callback(ADMIN, VARIANT_TO_EDIT, question_id))],
+        [InlineKeyboardButton(VARIANT_TO_DELETE_LABEL,          callback_data=encode_callback(ADMIN, VARIANT_TO_DELETE, question_id))],
+        [InlineKeyboardButton(CANCEL_LABEL,                     callback_data=encode_callback(ADMIN, QUESTION_OPTIONS, question_id))]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await context.bot.send_message(
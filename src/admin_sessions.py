@@ -0,0 +1,139 @@
+# admin_sessions.py
+"""
+Состояние администраторов (InternalUser.state) в памяти.
+Раньше каждый переход по меню читал строку internal_users и записывал её
+с отдельным commit, часто по нескольку раз за одно нажатие.
+Теперь AdminFlow открывает scope() на время апдейта: строка читается
+не больше одного раза (а при попадании в кэш - ни разу), изменения состояния
+копятся в AdminSession и записываются одним UPDATE в конце обработки,
+в той же сессии базы данных, что и остальные изменения апдейта.
+Вне scope() состояние записывается сразу.
+Если обработчик упал, изменения в базу не попадают, а запись удаляется из кэша.
+"""
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from cachetools import LRUCache
+
+from queries import AsyncDatabaseConnector, db_connector
+from logger import get_logger
+from settings import ADMIN_SESSION_CACHE_SIZE
+
+logger = get_logger(__name__)
+
+
+class AdminSession:
+    __slots__ = ("telegram_id", "internal_user_id", "state", "dirty")
+
+    def __init__(self, telegram_id: int, internal_user_id: str | None, state: str | None):
+        self.telegram_id = telegram_id
+        self.internal_user_id = internal_user_id
+        self.state = state
+        # состояние изменено и ещё не записано в базу
+        self.dirty = False
+
+    def __repr__(self):
+        return f"<AdminSession(telegram_id={self.telegram_id}, state='{self.state}', dirty={self.dirty})>"
+
+
+# Сессии администраторов, загруженные в текущем апдейте (None - вне scope()).
+# Каждый апдейт обрабатывается в своей asyncio-задаче, как и unit of work в queries.py.
+current_admin_sessions: ContextVar[dict[int, AdminSession] | None] = ContextVar("current_admin_sessions", default=None)
+
+
+class AdminSessionCache:
+    def __init__(self, connector: AsyncDatabaseConnector, max_size: int = ADMIN_SESSION_CACHE_SIZE):
+        self.connector = connector
+        self.sessions: LRUCache[int, AdminSession] = LRUCache(maxsize=max_size)
+        # метрики
+        self.hits = 0
+        self.misses = 0
+        self.deferred = 0
+        self.writes = 0
+
+    async def load(self, telegram_id: int) -> AdminSession:
+        session = self.sessions.get(telegram_id)
+        if session is not None:
+            self.hits += 1
+            return session
+        self.misses += 1
+        user = await self.connector.get_internal_user_by_telegram_id(telegram_id)
+        if user is None:
+            # не кэшируем: пользователь может быть создан позже (см. AdminFlow.start)
+            return AdminSession(telegram_id, None, None)
+        session = AdminSession(telegram_id, user.id, user.state)
+        self.sessions[telegram_id] = session
+        return session
+
+    async def get(self, telegram_id: int) -> AdminSession:
+        touched = current_admin_sessions.get()
+        if touched is not None and telegram_id in touched:
+            return touched[telegram_id]
+        session = await self.load(telegram_id)
+        if touched is not None:
+            touched[telegram_id] = session
+        return session
+
+    async def get_state(self, telegram_id: int) -> str | None:
+        return (await self.get(telegram_id)).state
+
+    async def get_internal_user_id(self, telegram_id: int) -> str | None:
+        return (await self.get(telegram_id)).internal_user_id
+
+    async def set_state(self, telegram_id: int, new_state: str):
+        logger.debug(f"admin {telegram_id} change state to {new_state}")
+        session = await self.get(telegram_id)
+        session.state = new_state
+        if current_admin_sessions.get() is None:
+            await self.write(session)
+            return
+        session.dirty = True
+        self.deferred += 1
+
+    async def write(self, session: AdminSession):
+        # пользователя могли создать уже после загрузки сессии (AdminFlow.start),
+        # поэтому UPDATE выполняется и при internal_user_id = None
+        await self.connector.set_internal_user_state(session.telegram_id, session.state)
+        session.dirty = False
+        self.writes += 1
+
+    def invalidate(self, telegram_id: int):
+        self.sessions.pop(telegram_id, None)
+
+    @asynccontextmanager
+    async def scope(self):
+        """
+        Откладывает запись состояния до конца апдейта. Вложенный scope()
+        (например, start() из handle_callback) работает в рамках внешнего.
+        """
+        if current_admin_sessions.get() is not None:
+            yield
+            return
+        touched: dict[int, AdminSession] = {}
+        token = current_admin_sessions.set(touched)
+        try:
+            yield
+            for session in touched.values():
+                if session.dirty:
+                    await self.write(session)
+        except BaseException:
+            for telegram_id in touched:
+                self.invalidate(telegram_id)
+            raise
+        finally:
+            current_admin_sessions.reset(token)
+
+    def metrics(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self.sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0,
+            "deferred_writes": self.deferred,
+            "writes": self.writes,
+        }
+
+
+admin_sessions = AdminSessionCache(db_connector)
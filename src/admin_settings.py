@@ -7,6 +7,15 @@ GAME_ID             = "game_id"
 QUESTION_ID         = "question_id"
 VARIANT_ID          = "variant_id"
 
+# Какие id известны в состоянии с данной зависимостью (DEPENDENCIES):
+# по вопросу находится его игра, по варианту - его вопрос
+DEPENDENCY_IDS = {
+    None:           (),
+    GAME_ID:        (GAME_ID,),
+    QUESTION_ID:    (QUESTION_ID, GAME_ID),
+    VARIANT_ID:     (VARIANT_ID, QUESTION_ID),
+}
+
 GAME_WORKFLOW = "game_workflow"
 
 ADMIN_STATES = {
@@ -51,7 +60,7 @@ ADMIN_STATES = {
         DEPENDENCIES:       GAME_ID,
         BEGIN_MESSAGE:      None,
         ACTION:             CALLBACK,
-        FORWARD_STATES:     ADMIN_OPTIONS,
+        FORWARD_STATES:     [ADMIN_OPTIONS],
         BACKWARD_STATES:    None,
         END_MESSAGE:        "Игра удалена",
     },
@@ -105,7 +114,7 @@ ADMIN_STATES = {
         DEPENDENCIES:       QUESTION_ID,
         BEGIN_MESSAGE:      "Что вы хотите сделать с вопросом?",
         ACTION:             CALLBACK,
-        FORWARD_STATES:     [EDIT_QUESTION_TEXT, VARIANT_OPTIONS, UPDATE_IMAGE, CHANGE_CORRECTNESS, ],
+        FORWARD_STATES:     [EDIT_QUESTION_TEXT, VARIANT_OPTIONS, UPDATE_IMAGE, CHANGE_CORRECTNESS, MOVE_QUESTION_UP, MOVE_QUESTION_DOWN, ],
         BACKWARD_STATES:    [GAME_OPTIONS],
         END_MESSAGE:        "Хорошо",
     },
@@ -118,6 +127,24 @@ ADMIN_STATES = {
         BACKWARD_STATES:    None, # TODO: add functionality to add QUESTION_OPTIONS here
         END_MESSAGE:        "Текст вопроса обновлён",
     },
+    MOVE_QUESTION_UP: {
+        LABEL:              MOVE_QUESTION_UP_LABEL,
+        DEPENDENCIES:       QUESTION_ID,
+        BEGIN_MESSAGE:      None,
+        ACTION:             CALLBACK,
+        FORWARD_STATES:     [QUESTION_OPTIONS],
+        BACKWARD_STATES:    None,
+        END_MESSAGE:        "Вопрос перемещён",
+    },
+    MOVE_QUESTION_DOWN: {
+        LABEL:              MOVE_QUESTION_DOWN_LABEL,
+        DEPENDENCIES:       QUESTION_ID,
+        BEGIN_MESSAGE:      None,
+        ACTION:             CALLBACK,
+        FORWARD_STATES:     [QUESTION_OPTIONS],
+        BACKWARD_STATES:    None,
+        END_MESSAGE:        "Вопрос перемещён",
+    },
     VARIANT_OPTIONS: {
         LABEL:              "Редактировть вариант",
         DEPENDENCIES:       QUESTION_ID,
@@ -0,0 +1,175 @@
+# answer_buffer.py
+"""
+Буфер ответов игроков.
+Нажатие кнопки подтверждается сразу, а ответ попадает в очередь в памяти.
+Фоновая задача раз в ANSWER_FLUSH_INTERVAL секунд или при накоплении
+ANSWER_FLUSH_SIZE ответов записывает все Answer и приращения Result
+одной транзакцией. Неудачная запись повторяется при следующих сбросах,
+но не больше ANSWER_FLUSH_RETRIES раз для каждого ответа: после этого ответы
+сохраняются в JSON-файл в UNSAVED_ANSWERS_DIR и убираются из очереди.
+При остановке бота оставшиеся ответы дописываются с теми же повторами,
+поэтому ни один ответ не пропадает молча.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from queries import AsyncDatabaseConnector, db_connector
+from broadcaster import percentile
+from latency_histogram import write_json
+from logger import get_logger
+from settings import ANSWER_FLUSH_INTERVAL, ANSWER_FLUSH_SIZE, ANSWER_FLUSH_RETRIES, UNSAVED_ANSWERS_DIR
+
+logger = get_logger(__name__)
+
+# сколько последних замеров длительности записи хранить для перцентилей
+FLUSH_LATENCY_WINDOW = 256
+
+
+class PendingAnswer:
+    __slots__ = ("variant_id", "telegram_id", "game_session_id", "answer_text", "answered_at", "score", "response_time_ms", "attempts")
+
+    def __init__(self, variant_id: str, telegram_id: int, game_session_id: str, answer_text: str, answered_at: int, score: int, response_time_ms: int = 0):
+        self.variant_id = variant_id
+        self.telegram_id = telegram_id
+        self.game_session_id = game_session_id
+        self.answer_text = answer_text
+        self.answered_at = answered_at
+        self.score = score
+        self.response_time_ms = response_time_ms
+        # неудачных попыток записи
+        self.attempts = 0
+
+    def to_dict(self) -> dict:
+        # answered_at - секунды epoch (int), все поля сериализуются в JSON как есть
+        return {name: getattr(self, name) for name in self.__slots__ if name != "attempts"}
+
+
+class AnswerBuffer:
+    def __init__(self, connector: AsyncDatabaseConnector, flush_interval: float = ANSWER_FLUSH_INTERVAL, flush_size: int = ANSWER_FLUSH_SIZE, max_attempts: int = ANSWER_FLUSH_RETRIES, dump_dir: str = UNSAVED_ANSWERS_DIR):
+        self.connector = connector
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_attempts = max_attempts
+        self.dump_dir = dump_dir
+        self.queue: deque[PendingAnswer] = deque()
+        self.flush_requested = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.task: asyncio.Task | None = None
+        # метрики
+        self.max_queue_depth = 0
+        self.flushed_answers = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dumped_answers = 0
+        self.flush_latencies: deque[float] = deque(maxlen=FLUSH_LATENCY_WINDOW)
+
+    def put(self, answer: PendingAnswer):
+        self.queue.append(answer)
+        self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+        if len(self.queue) >= self.flush_size:
+            self.flush_requested.set()
+
+    async def flush(self) -> bool:
+        """
+        Записывает всё, что накопилось в очереди. Возвращает False, если запись не удалась:
+        тогда ответы возвращаются в начало очереди, а исчерпавшие попытки - сохраняются в файл.
+        """
+        async with self.flush_lock:
+            if not self.queue:
+                return True
+            batch = list(self.queue)
+            self.queue.clear()
+            started_at = time.monotonic()
+            save = asyncio.ensure_future(self.connector.save_answers(batch))
+            try:
+                await asyncio.shield(save)
+            except asyncio.CancelledError:
+                # запись в потоке базы отменой не прерывается: дожидаемся её итога,
+                # чтобы не потерять пачку и не записать её дважды
+                await asyncio.wait({save})
+                if save.exception() is not None:
+                    self.queue.extendleft(reversed(batch))
+                    logger.error(f"Запись {len(batch)} ответов прервана, ответы возвращены в очередь: {save.exception()}")
+                raise
+            except Exception as e:
+                self.failed_flushes += 1
+                await self.requeue_failed(batch, e)
+                return False
+            latency = time.monotonic() - started_at
+            self.flush_latencies.append(latency)
+            self.flushes += 1
+            self.flushed_answers += len(batch)
+            logger.debug(f"flushed {len(batch)} answers in {latency * 1000:.1f} ms, queue depth = {len(self.queue)}")
+            return True
+
+    async def requeue_failed(self, batch: list[PendingAnswer], error: Exception):
+        retry, exhausted = [], []
+        for answer in batch:
+            answer.attempts += 1
+            (exhausted if answer.attempts >= self.max_attempts else retry).append(answer)
+        self.queue.extendleft(reversed(retry))
+        logger.error(f"Не удалось записать {len(batch)} ответов, {len(retry)} будут записаны повторно: {error}")
+        if exhausted:
+            await self.dump(exhausted)
+
+    async def dump(self, answers: list[PendingAnswer]):
+        """
+        Сохраняет ответы, которые не удалось записать в базу, в JSON-файл.
+        """
+        path = os.path.join(self.dump_dir, f"answers_{time.time_ns()}.json")
+        try:
+            await asyncio.to_thread(write_json, path, [answer.to_dict() for answer in answers])
+        except Exception as e:
+            logger.critical(f"ПОТЕРЯНЫ {len(answers)} ответов: не записаны ни в базу, ни в файл {path}: {e}")
+            return
+        self.dumped_answers += len(answers)
+        logger.critical(f"{len(answers)} ответов не записаны в базу после {self.max_attempts} попыток и сохранены в {path}")
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            await self.flush()
+
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+            logger.info("Буфер ответов запущен.")
+
+    async def stop(self):
+        if self.task is not None:
+            # отменяем фоновую задачу только между записями, а не посреди save_answers
+            async with self.flush_lock:
+                self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # каждая неудача увеличивает attempts, поэтому цикл конечен:
+        # ответы либо записываются, либо сохраняются в файл
+        while self.queue:
+            if not await self.flush():
+                await asyncio.sleep(self.flush_interval)
+        logger.info(f"Буфер ответов остановлен: {self.metrics()}")
+
+    def metrics(self) -> dict:
+        latencies = list(self.flush_latencies)
+        return {
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_queue_depth,
+            "flushed_answers": self.flushed_answers,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dumped_answers": self.dumped_answers,
+            "flush_latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "flush_latency_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        }
+
+answer_buffer = AnswerBuffer(db_connector)
@@ -0,0 +1,17 @@
+# bot_context.py
+"""
+Контекст обработчиков бота.
+Через context.db обработчики получают коннектор к базе данных, привязанный
+к сессии текущего апдейта (см. AsyncDatabaseConnector.unit_of_work).
+"""
+
+from telegram.ext import CallbackContext, ExtBot
+from queries import AsyncDatabaseConnector
+
+DB = "db"
+
+
+class BotContext(CallbackContext[ExtBot, dict, dict, dict]):
+    @property
+    def db(self) -> AsyncDatabaseConnector:
+        return self.application.bot_data[DB]
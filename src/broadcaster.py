@@ -0,0 +1,250 @@
+# broadcaster.py
+"""
+Модуль массовой рассылки сообщений игрокам.
+Рассылка идёт параллельно через ограниченный пул asyncio-воркеров,
+с соблюдением глобального лимита Telegram и лимита на один чат.
+RetryAfter и сетевые ошибки повторяются с экспоненциальной задержкой,
+для каждого получателя возвращается результат доставки и тайминги.
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Iterable
+
+from telegram import Message
+from telegram.error import (
+    BadRequest,
+    NetworkError,
+    RetryAfter,
+)
+
+from logger import get_logger
+from settings import (
+    BROADCAST_WORKERS,
+    BROADCAST_GLOBAL_RATE,
+    BROADCAST_PER_CHAT_INTERVAL,
+    BROADCAST_MAX_RETRIES,
+    BROADCAST_BACKOFF_BASE,
+)
+
+logger = get_logger(__name__)
+
+# сколько последних отчётов о рассылках хранить для метрик
+REPORT_HISTORY = 100
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Возвращает перцентиль q (0..100) методом ближайшего ранга.
+    Для пустого списка возвращает 0.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RateLimiter:
+    """
+    Token bucket: не больше rate операций в секунду, с возможностью
+    полностью приостановить выдачу (например, после RetryAfter от Telegram).
+    """
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DeliveryResult:
+    """
+    Результат доставки одному получателю.
+    latency считается от начала рассылки до успешной отправки (в секундах).
+    """
+    __slots__ = ("chat_id", "ok", "message", "attempts", "latency", "delivered_at", "error")
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.ok = False
+        self.message: Message | None = None
+        self.attempts = 0
+        self.latency = 0.0
+        self.delivered_at: float | None = None
+        self.error: Exception | None = None
+
+    def __repr__(self):
+        return f"<DeliveryResult(chat_id={self.chat_id}, ok={self.ok}, attempts={self.attempts}, latency={self.latency:.3f})>"
+
+
+class BroadcastReport:
+    """
+    Итоги одной рассылки: результаты по получателям и тайминги.
+    """
+    def __init__(self, results: list[DeliveryResult], fan_out_duration: float):
+        self.results = results
+        self.fan_out_duration = fan_out_duration
+        latencies = [result.latency for result in results if result.ok]
+        self.delivered = len(latencies)
+        self.failed = len(results) - self.delivered
+        self.p50 = percentile(latencies, 50)
+        self.p99 = percentile(latencies, 99)
+
+    def summary(self) -> str:
+        return (
+            f"delivered={self.delivered} failed={self.failed} "
+            f"fan_out={self.fan_out_duration:.3f}s p50={self.p50:.3f}s p99={self.p99:.3f}s"
+        )
+
+
+class Broadcaster:
+    """
+    Рассылает одно и то же действие (send_message, send_photo, ...) списку чатов.
+    Глобальный лимитер общий для всех рассылок бота, поэтому параллельные
+    рассылки разных игр вместе не превышают лимит Telegram.
+    """
+    def __init__(
+            self,
+            workers: int = BROADCAST_WORKERS,
+            global_rate: float = BROADCAST_GLOBAL_RATE,
+            per_chat_interval: float = BROADCAST_PER_CHAT_INTERVAL,
+            max_retries: int = BROADCAST_MAX_RETRIES,
+            backoff_base: float = BROADCAST_BACKOFF_BASE,
+            ):
+        self.workers = workers
+        self.limiter = RateLimiter(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        # chat_id -> момент (monotonic), раньше которого в чат писать нельзя
+        self.chat_available_at: dict[int, float] = {}
+        self.reports: deque[BroadcastReport] = deque(maxlen=REPORT_HISTORY)
+
+    async def wait_for_chat(self, chat_id: int):
+        now = time.monotonic()
+        available_at = self.chat_available_at.get(chat_id, 0.0)
+        self.chat_available_at[chat_id] = max(now, available_at) + self.per_chat_interval
+        if available_at > now:
+            await asyncio.sleep(available_at - now)
+
+    def prune_chats(self):
+        """
+        Убирает чаты, в которые уже снова можно писать: без этого словарь
+        рос бы на каждого игрока, которому бот когда-либо что-то отправил.
+        """
+        now = time.monotonic()
+        self.chat_available_at = {chat_id: available_at for chat_id, available_at in self.chat_available_at.items() if available_at > now}
+
+    async def deliver(
+            self,
+            chat_id: int,
+            send: Callable[[int], Awaitable[Message]],
+            started_at: float,
+            on_delivered: Callable[[DeliveryResult], None] | None = None,
+            ) -> DeliveryResult:
+        """
+        on_delivered вызывается сразу после успешной отправки, не дожидаясь
+        остальных получателей: игрок может ответить раньше, чем закончится рассылка.
+        """
+        result = DeliveryResult(chat_id)
+        while result.attempts <= self.max_retries:
+            result.attempts += 1
+            await self.wait_for_chat(chat_id)
+            await self.limiter.acquire()
+            try:
+                result.message = await send(chat_id)
+                result.ok = True
+                result.delivered_at = time.monotonic()
+                result.latency = result.delivered_at - started_at
+                break
+            except RetryAfter as e:
+                result.error = e
+                retry_after = float(e.retry_after)
+                logger.warning(f"Flood control for {chat_id}, retry in {retry_after}s")
+                self.limiter.pause(retry_after)
+                await asyncio.sleep(retry_after)
+            except BadRequest as e:
+                # BadRequest наследуется от NetworkError, но повторять его бессмысленно
+                result.error = e
+                break
+            except NetworkError as e:
+                result.error = e
+                delay = self.backoff_base * 2 ** (result.attempts - 1)
+                logger.warning(f"Network error for {chat_id}: {e}, retry in {delay:.2f}s")
+                await asyncio.sleep(delay + random.uniform(0, delay))
+            except Exception as e:
+                result.error = e
+                break
+        if not result.ok:
+            logger.error(f"Ошибка при отправке сообщения для {chat_id}: {result.error}")
+            return result
+        if on_delivered is not None:
+            # ошибка в обработчике не должна превращать доставленное сообщение
+            # в недоставленное и тем более отправлять его повторно
+            try:
+                on_delivered(result)
+            except Exception as e:
+                logger.error(f"Ошибка в on_delivered для {chat_id}: {e}")
+        return result
+
+    async def broadcast(
+            self,
+            chat_ids: Iterable[int],
+            send: Callable[[int], Awaitable[Message]],
+            started_at: float | None = None,
+            completed: list[DeliveryResult] | None = None,
+            on_delivered: Callable[[DeliveryResult], None] | None = None,
+            ) -> BroadcastReport:
+        """
+        Выполняет send(chat_id) для всех чатов через пул воркеров.
+        Порядок результатов совпадает с порядком chat_ids.
+        completed - уже выполненные доставки этой же рассылки (например, загрузка
+        файла первому получателю), они попадают в начало отчёта.
+        on_delivered - см. deliver.
+        """
+        chat_ids = list(chat_ids)
+        results: list[DeliveryResult | None] = [None] * len(chat_ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, chat_id in enumerate(chat_ids):
+            queue.put_nowait((index, chat_id))
+        if started_at is None:
+            started_at = time.monotonic()
+
+        async def worker():
+            while True:
+                try:
+                    index, chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results[index] = await self.deliver(chat_id, send, started_at, on_delivered)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(chat_ids)))))
+        self.prune_chats()
+        results = (completed or []) + results
+        report = BroadcastReport(results, time.monotonic() - started_at)
+        self.reports.append(report)
+        logger.info(f"broadcast to {len(results)} chats: {report.summary()}")
+        return report
+
+broadcaster = Broadcaster()
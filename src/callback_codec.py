@@ -0,0 +1,216 @@
+# callback_codec.py
+"""
+Компактная упаковка callback_data inline-кнопок.
+Telegram ограничивает callback_data 64 байтами, а строка вида
+admin:question_edit_text:<uuid из 36 символов> занимает почти всё.
+Полезная нагрузка упаковывается в байты: область (admin/gamer) и действие -
+номерами из SCOPES и ACTIONS, UUID - 16 байтами, небольшие числа - 1-4 байтами,
+и записывается в base64url после маркера "~". Так в кнопку помещаются
+два UUID и ещё несколько чисел.
+Если упакованная строка всё равно длиннее 64 байт, нагрузка хранится на сервере
+(CallbackLookup), а в кнопку пишется короткая ссылка "!<токен>".
+Строки старого формата ("admin:<действие>:<id>") по-прежнему разбираются,
+чтобы работали кнопки, отправленные до обновления.
+"""
+
+import base64
+import binascii
+import secrets
+import struct
+import uuid
+from collections import OrderedDict
+
+from admin_constants import *
+from admin_settings import GAME_WORKFLOW
+from gamer_constants import GAMER
+from settings import CALLBACK_LOOKUP_SIZE
+
+MAX_CALLBACK_DATA = 64
+PACKED_MARKER = "~"
+LOOKUP_MARKER = "!"
+
+# Номера областей и действий хранятся в уже отправленных кнопках:
+# новые значения добавляются только в конец, порядок не меняется
+SCOPES = (ADMIN, GAMER)
+ACTIONS = (
+    ADMIN_OPTIONS, CREATE_GAME, GAME_TO_EDIT, GAME_TO_DELETE, DELETE_GAME, START_GAME,
+    GAME_OPTIONS, ADD_QUESTION, QUESTION_TO_EDIT, QUESTION_TO_DELETE,
+    QUESTION_OPTIONS, EDIT_QUESTION_TEXT, DELETE_QUESTION,
+    VARIANT_OPTIONS, ADD_VARIANT, VARIANT_TO_EDIT, VARIANT_TO_DELETE, EDIT_VARIANT_TEXT, DELETE_VARIANT,
+    UPDATE_IMAGE, CHANGE_CORRECTNESS, PAGE_GAMES, PAGE_QUESTIONS, PAGE_VARIANTS, DONE, SELECT,
+    GAME_TO_START, WAITING_START, SHOW_RESULTS, CHANGE_QUESTION, CLOSE_QUESTION, GAME_WORKFLOW,
+    MOVE_QUESTION_UP, MOVE_QUESTION_DOWN, NEXT_QUESTION,
+)
+SCOPE_IDS = {scope: index for index, scope in enumerate(SCOPES)}
+ACTION_IDS = {action: index for index, action in enumerate(ACTIONS)}
+
+# Типы аргументов в упакованной нагрузке
+TAG_UUID = 0
+TAG_UINT8 = 1
+TAG_INT32 = 2
+TAG_STR = 3
+
+
+class CallbackPayload:
+    __slots__ = ("scope", "action", "args")
+
+    def __init__(self, scope: str, action: str, args: tuple):
+        self.scope = scope
+        self.action = action
+        self.args = args
+
+    @property
+    def next_state(self) -> str:
+        """
+        Нагрузка в старом текстовом виде без области: <действие>:<аргумент>:...
+        """
+        return ":".join((self.action, *map(str, self.args)))
+
+    def __repr__(self):
+        return f"CallbackPayload({self.scope}, {self.action}, {self.args})"
+
+
+class CallbackLookup:
+    """
+    Нагрузки, которые не поместились в 64 байта. Хранятся в памяти (LRU):
+    после CALLBACK_LOOKUP_SIZE записей вытесняются те, что дольше всего не нажимали.
+    """
+    def __init__(self, max_size: int = CALLBACK_LOOKUP_SIZE):
+        self.max_size = max_size
+        self.payloads: OrderedDict[str, CallbackPayload] = OrderedDict()
+
+    def put(self, payload: CallbackPayload) -> str:
+        token = secrets.token_urlsafe(8)
+        self.payloads[token] = payload
+        if len(self.payloads) > self.max_size:
+            self.payloads.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> CallbackPayload | None:
+        payload = self.payloads.get(token)
+        if payload is not None:
+            self.payloads.move_to_end(token)
+        return payload
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.payloads
+
+    def __len__(self):
+        return len(self.payloads)
+
+
+callback_lookup = CallbackLookup()
+
+
+def pack_arg(value) -> bytes:
+    if isinstance(value, int):
+        if 0 <= value < 256:
+            return bytes((TAG_UINT8, value))
+        return struct.pack(">Bi", TAG_INT32, value)
+    value = str(value)
+    if len(value) == 36:
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            parsed = None
+        # упаковываем только канонический вид, чтобы при разборе получить ту же строку
+        if parsed is not None and str(parsed) == value:
+            return bytes((TAG_UUID,)) + parsed.bytes
+    raw = value.encode()
+    if len(raw) > 255:
+        raise ValueError("Слишком длинный аргумент callback")
+    return bytes((TAG_STR, len(raw))) + raw
+
+
+def encode_callback(scope: str, action: str, *args) -> str:
+    """
+    Упаковывает действие и аргументы (UUID-строки, числа, короткие строки) в callback_data.
+    """
+    if scope not in SCOPE_IDS or action not in ACTION_IDS:
+        raise ValueError(f"Неизвестное действие callback: {scope}:{action}")
+    packed = bytes((SCOPE_IDS[scope], ACTION_IDS[action])) + b"".join(pack_arg(arg) for arg in args)
+    data = PACKED_MARKER + base64.urlsafe_b64encode(packed).rstrip(b"=").decode()
+    if len(data) <= MAX_CALLBACK_DATA:
+        return data
+    return LOOKUP_MARKER + callback_lookup.put(CallbackPayload(scope, action, tuple(args)))
+
+
+def decode_packed(data: str) -> CallbackPayload:
+    text = data[1:]
+    packed = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    scope, action = SCOPES[packed[0]], ACTIONS[packed[1]]
+    args = []
+    position = 2
+    while position < len(packed):
+        tag = packed[position]
+        if tag == TAG_UUID:
+            # то же, что str(uuid.UUID(bytes=...)), но в несколько раз быстрее
+            h = packed[position + 1:position + 17].hex()
+            args.append(f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}")
+            position += 17
+        elif tag == TAG_UINT8:
+            args.append(packed[position + 1])
+            position += 2
+        elif tag == TAG_INT32:
+            args.append(struct.unpack_from(">i", packed, position + 1)[0])
+            position += 5
+        elif tag == TAG_STR:
+            length = packed[position + 1]
+            args.append(packed[position + 2:position + 2 + length].decode())
+            position += 2 + length
+        else:
+            raise ValueError(f"Неизвестный тип аргумента callback: {tag}")
+    return CallbackPayload(scope, action, tuple(args))
+
+
+def decode_legacy(data: str) -> CallbackPayload:
+    segments = data.replace("|", ":").split(":")
+    if segments[0] == ADMIN:
+        if len(segments) < 2:
+            raise ValueError("В callback нет действия")
+        return CallbackPayload(ADMIN, segments[1], tuple(segments[2:]))
+    # кнопки ответов игроков: <действие>:<variant_id>
+    return CallbackPayload(GAMER, segments[0], tuple(segments[1:]))
+
+
+def decode_callback(data: str) -> CallbackPayload:
+    """
+    Разбирает callback_data любого формата. ValueError - если разобрать нельзя
+    (в том числе ссылка на нагрузку, которой уже нет на сервере).
+    """
+    if data.startswith(PACKED_MARKER):
+        try:
+            return decode_packed(data)
+        except (IndexError, struct.error, UnicodeDecodeError, binascii.Error) as e:
+            raise ValueError(f"Повреждённый callback: {e}")
+    if data.startswith(LOOKUP_MARKER):
+        payload = callback_lookup.get(data[1:])
+        if payload is None:
+            raise ValueError("Callback устарел")
+        return payload
+    return decode_legacy(data)
+
+
+def is_stale_callback(data: str) -> bool:
+    """
+    Ссылка "!<токен>" на нагрузку, которой уже нет на сервере:
+    бот перезапускался или нагрузка вытеснена из CallbackLookup.
+    """
+    return data.startswith(LOOKUP_MARKER) and data[1:] not in callback_lookup
+
+
+def callback_scope(data: str) -> str | None:
+    """
+    Область callback (admin/gamer) без полного разбора: для упакованных данных
+    достаточно первых четырёх символов base64.
+    """
+    try:
+        if data.startswith(PACKED_MARKER):
+            head = data[1:5]
+            return SCOPES[base64.urlsafe_b64decode(head + "=" * (-len(head) % 4))[0]]
+        if data.startswith(LOOKUP_MARKER):
+            payload = callback_lookup.get(data[1:])
+            return payload.scope if payload is not None else None
+    except (IndexError, binascii.Error):
+        return None
+    return ADMIN if data.startswith(ADMIN) else GAMER
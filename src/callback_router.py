@@ -0,0 +1,111 @@
+# callback_router.py
+"""
+Декларативная маршрутизация callback-ов inline-кнопок.
+Обработчики регистрируются один раз декоратором route() с именем действия
+и типами аргументов, а callback_data разбирается один раз (decode_callback из
+callback_codec.py, упакованный или старый текстовый формат) и действие ищется
+в словаре вместо цепочки startswith.
+Аргументы берутся с конца, как раньше делал split(...)[-1]. Если последние
+аргументы обработчика имеют значения по умолчанию, кнопки без них (например,
+старые) тоже разбираются: тогда аргументы заполняются с начала.
+Состояние пользователя из базы загружается только для маршрутов с needs_state=True.
+"""
+
+import inspect
+from typing import Any, Awaitable, Callable
+
+from callback_codec import decode_callback
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Route:
+    __slots__ = ("action", "handler", "params", "required", "needs_state")
+
+    def __init__(self, action: str | None, handler: Callable[..., Awaitable[Any]], params: dict[str, type], needs_state: bool):
+        self.action = action
+        self.handler = handler
+        self.params = tuple(params.items())
+        signature = inspect.signature(handler).parameters
+        self.required = sum(1 for name in params if signature[name].default is inspect.Parameter.empty)
+        self.needs_state = needs_state
+
+    def extract(self, segments: tuple) -> dict[str, Any]:
+        """
+        Достаёт типизированные аргументы из последних аргументов callback_data.
+        ValueError - если аргументов не хватает или значение не приводится к типу.
+        """
+        if not self.params:
+            return {}
+        if len(segments) < self.required:
+            raise ValueError(f"{self.action}: ожидается аргументов {len(self.params)}, получено {len(segments)}")
+        if len(segments) < len(self.params):
+            # остальные аргументы обработчик возьмёт по умолчанию
+            return {name: convert(value) for (name, convert), value in zip(self.params, segments)}
+        tail = segments[len(segments) - len(self.params):]
+        return {name: convert(value) for (name, convert), value in zip(self.params, tail)}
+
+
+class CallbackRouter:
+    def __init__(self, scope: str):
+        self.scope = scope
+        self.routes: dict[str, Route] = {}
+        self.fallback: Route | None = None
+
+    def route(self, action: str, needs_state: bool = False, **params: type):
+        """
+        Регистрирует обработчик действия. params - имена и типы аргументов
+        в порядке их следования в callback_data, например game_id=str, page=int.
+        """
+        def decorator(handler):
+            if action in self.routes:
+                raise ValueError(f"Маршрут '{action}' уже зарегистрирован")
+            self.routes[action] = Route(action, handler, params, needs_state)
+            return handler
+        return decorator
+
+    def default(self, needs_state: bool = False):
+        """
+        Регистрирует обработчик для действий без своего маршрута,
+        он получает действие и аргументы в текстовом виде как next_state.
+        """
+        def decorator(handler):
+            self.fallback = Route(None, handler, {}, needs_state)
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> tuple[Route, dict[str, Any]] | None:
+        """
+        Находит маршрут и аргументы для callback_data, None - если маршрута нет.
+        ValueError - если callback_data не разбирается.
+        """
+        payload = decode_callback(data)
+        if payload.scope != self.scope:
+            return None
+        route = self.routes.get(payload.action)
+        if route is None:
+            if self.fallback is None:
+                return None
+            return self.fallback, {"next_state": payload.next_state}
+        return route, route.extract(payload.args)
+
+    async def dispatch(self, owner: object, update, context, load_state: Callable[[], Awaitable[str]]) -> bool:
+        """
+        Вызывает обработчик маршрута как метод owner. Для маршрутов с needs_state
+        состояние передаётся аргументом current_state.
+        Возвращает False, если callback_data не разобрана.
+        """
+        data = update.callback_query.data
+        try:
+            resolved = self.resolve(data)
+        except ValueError as e:
+            logger.warning(f"Некорректный callback '{data}': {e}")
+            return False
+        if resolved is None:
+            return False
+        route, args = resolved
+        if route.needs_state:
+            args["current_state"] = await load_state()
+        await route.handler(owner, update, context, **args)
+        return True
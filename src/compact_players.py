@@ -0,0 +1,57 @@
+# compact_players.py
+"""
+Разовое сжатие таблицы players в существующей базе.
+До появления уникального индекса ux_players_telegram_id каждый /start добавлял
+игроку новую строку. Скрипт сливает дубликаты (migrations.merge_duplicate_players),
+создаёт недостающие таблицы и индексы, для SQLite освобождает место (VACUUM)
+и печатает число строк до и после.
+Бот при запуске делает то же самое сам, кроме VACUUM, поэтому скрипт нужен,
+чтобы сжать большую базу заранее, пока бот остановлен.
+
+Запуск: python src/compact_players.py [DATABASE_URL]
+"""
+
+import sys
+
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import merge_duplicate_players, upgrade
+from logger import get_logger
+from settings import DATABASE_URL
+
+logger = get_logger(__name__)
+
+
+def count_players(engine) -> tuple[int, int]:
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*), COUNT(DISTINCT telegram_id) FROM players")).one()
+
+
+def compact_players(database_url: str = DATABASE_URL) -> dict:
+    engine = create_engine(database_url)
+    if inspect(engine).has_table("players"):
+        rows_before, players = count_players(engine)
+        with engine.begin() as connection:
+            removed = merge_duplicate_players(connection)
+    else:
+        # новая база: сливать нечего, upgrade создаст таблицы
+        rows_before = players = removed = 0
+    upgrade(engine)
+    if engine.dialect.name == "sqlite":
+        # VACUUM нельзя выполнять внутри транзакции
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+    rows_after, _ = count_players(engine)
+    engine.dispose()
+    report = {
+        "rows_before": rows_before,
+        "rows_after": rows_after,
+        "players": players,
+        "removed": removed,
+    }
+    logger.info(f"Таблица players сжата: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    print(compact_players(*sys.argv[1:2]))
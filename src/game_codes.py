@@ -0,0 +1,99 @@
+# game_codes.py
+"""
+Коды для входа в игру.
+Каждая идущая игра получает свой короткий код из букв и цифр без похожих
+символов (нет 0/O, 1/I/L), поэтому одновременно может идти много игр.
+Соответствие код -> game_session_id хранится в памяти: игрок, вводящий код,
+находит сессию одним обращением к словарю, без запроса к базе.
+Уникальность среди идущих игр дополнительно гарантирует частичный уникальный
+индекс в game_sessions. После окончания игры код освобождается и может быть
+выдан снова.
+"""
+
+import secrets
+
+from models import GameSession
+from queries import AsyncDatabaseConnector, db_connector
+from logger import get_logger
+from settings import GAME_CODE_LENGTH
+
+logger = get_logger(__name__)
+
+GAME_CODE_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+# сколько случайных кодов пробовать, прежде чем сдаться
+ALLOCATE_ATTEMPTS = 32
+
+
+class GameCodeAllocator:
+    def __init__(self, connector: AsyncDatabaseConnector, length: int = GAME_CODE_LENGTH):
+        self.connector = connector
+        self.length = length
+        # код -> game_session_id и обратно
+        self.active: dict[str, str] = {}
+        self.codes: dict[str, str] = {}
+        # метрики
+        self.allocated = 0
+        self.collisions = 0
+        self.released = 0
+
+    def generate(self) -> str:
+        return "".join(secrets.choice(GAME_CODE_ALPHABET) for _ in range(self.length))
+
+    def register(self, code: str, game_session_id: str):
+        self.active[code] = game_session_id
+        self.codes[game_session_id] = code
+
+    async def load(self):
+        """
+        Восстанавливает коды идущих игр после перезапуска бота.
+        """
+        for game_session in await self.connector.get_active_game_sessions():
+            self.register(game_session.game_code, game_session.id)
+        logger.info(f"Загружены коды идущих игр: {len(self.active)}")
+
+    async def allocate(self, game_id: str, status: str) -> GameSession:
+        """
+        Создаёт сессию игры со свободным кодом.
+        """
+        for _ in range(ALLOCATE_ATTEMPTS):
+            code = self.generate()
+            if code in self.active:
+                self.collisions += 1
+                continue
+            game_session = await self.connector.create_active_game_session(game_id, code, status)
+            if game_session is None:
+                # код занят сессией, о которой этот процесс не знает
+                self.collisions += 1
+                continue
+            self.register(code, game_session.id)
+            self.allocated += 1
+            logger.info(f"game session {game_session.id} got code {code}")
+            return game_session
+        raise RuntimeError("Не удалось подобрать свободный код игры")
+
+    def resolve(self, code: str) -> str | None:
+        """
+        game_session_id идущей игры по введённому коду, None - если такой игры нет.
+        """
+        return self.active.get(code.strip().upper())
+
+    async def release(self, game_session_id: str):
+        """
+        Отмечает игру законченной и освобождает её код.
+        """
+        code = self.codes.pop(game_session_id, None)
+        if code is not None:
+            del self.active[code]
+            self.released += 1
+        await self.connector.finish_game_session(game_session_id)
+
+    def metrics(self) -> dict:
+        return {
+            "active": len(self.active),
+            "allocated": self.allocated,
+            "collisions": self.collisions,
+            "released": self.released,
+        }
+
+
+game_codes = GameCodeAllocator(db_connector)
@@ -13,7 +13,16 @@ from telegram import (
 from telegram.ext import (
     ContextTypes,
 )
-from queries import DatabaseConnector
+from queries import AsyncDatabaseConnector
+from answer_buffer import AnswerBuffer, PendingAnswer
+from live_game_state import LiveGameRegistry
+from leaderboard import LeaderboardRegistry
+from question_scheduler import QuestionScheduler
+from message_registry import MessageRegistry
+from game_codes import GameCodeAllocator
+from player_cache import PlayerCache
+from state_machine import gamer_states
+from callback_codec import decode_callback
 from logger import get_logger
 from gamer_constants import *
 from constants import *
@@ -24,15 +33,23 @@ logger = get_logger(__name__)
 
 
 class GamerFlow:
-    def __init__(self, connector: DatabaseConnector):
+    def __init__(self, connector: AsyncDatabaseConnector, answer_buffer: AnswerBuffer, live_games: LiveGameRegistry, leaderboards: LeaderboardRegistry, scheduler: QuestionScheduler, messages: MessageRegistry, game_codes: GameCodeAllocator, players: PlayerCache):
         self.connector = connector
+        self.answer_buffer = answer_buffer
+        self.live_games = live_games
+        self.leaderboards = leaderboards
+        self.scheduler = scheduler
+        self.messages = messages
+        self.game_codes = game_codes
+        self.players = players
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         gamer_id = update.effective_user.id
         logger.info(f"{GAMER} {gamer_id} called {inspect.currentframe().f_code.co_name}")
-        await update.message.reply_text("Добро пожаловать, игрок!\nПрисоединитесь к игре, введя код \"ASDF\"")
+        await update.message.reply_text("Добро пожаловать, игрок!\nПрисоединитесь к игре, введя код, который покажет ведущий")
         username = update.effective_user.username
-        self.connector.create_player(gamer_id, username, f"{CODE_TO_GAME}", None, None)
+        # повторный /start сбрасывает игрока к вводу кода, а не создаёт ещё одну строку
+        await self.players.upsert_player(gamer_id, username, f"{CODE_TO_GAME}", None, None)
         logger.info("Режим игрока запущен.")
 
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -44,58 +61,131 @@ class GamerFlow:
         text = update.message.text.strip()
         logger.info(f"Сообщение от игрока получено. text = {text}")
 
-        state = self.connector.get_player_by_telegram_id(gamer_id).state
-        if state == f"{CODE_TO_GAME}":
-            try:
-                game_session_id = self.connector.get_game_session_by_code(text).id
-            except Exception as e:
-                logger.error("User entered incorrect game code")
-                await context.bot.send_message(
-                    chat_id=gamer_id,
-                    text="Такой игры нет, попробуй другой код",
-                )
-                return
-            # self.connector.update_player_state_by_telegram_id(gamer_id, f"{NICKNAME_TO_USER}")
-            # self.connector.update_player_game_session_by_telegram_id(gamer_id, game_session_id)
-            # replase two database queries to one
-            player = self.connector.get_player_by_telegram_id(gamer_id)
-            player.state = f"{NICKNAME_TO_USER}"
-            player.game_session_id = game_session_id
-            self.connector.commit()
+        state = (await self.players.get_player_by_telegram_id(gamer_id)).state
+        # в остальных состояниях текст игрока не ожидается
+        await gamer_states.dispatch(self, state, TEXT, update, context, text)
+
+    @gamer_states.on(CODE_TO_GAME, TEXT)
+    async def on_text_code_to_game(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+        gamer_id = update.effective_user.id
+        game_session_id = self.game_codes.resolve(text)
+        if game_session_id is None:
+            logger.error("User entered incorrect game code")
             await context.bot.send_message(
                 chat_id=gamer_id,
-                text="Отлично, теперь нужно ввести свой никнейм",
+                text="Такой игры нет, попробуй другой код",
             )
             return
-        elif state == f"{NICKNAME_TO_USER}":
-            player = self.connector.get_player_by_telegram_id(gamer_id)
-            player.nickname = text
-            player.state = f"{WAITING_START}"
-            game_session_id = player.game_session_id
-            self.connector.commit()
-            await context.bot.send_message(
-                chat_id=gamer_id,
-                text="Теперь ждём всех",
-            )
-            self.connector.create_or_update_result(gamer_id, game_session_id, 0)
+        # self.connector.update_player_state_by_telegram_id(gamer_id, f"{NICKNAME_TO_USER}")
+        # self.connector.update_player_game_session_by_telegram_id(gamer_id, game_session_id)
+        # replase two database queries to one
+        await self.players.update_player_fields_by_telegram_id(
+            gamer_id,
+            state=f"{NICKNAME_TO_USER}",
+            game_session_id=game_session_id,
+        )
+        await context.bot.send_message(
+            chat_id=gamer_id,
+            text="Отлично, теперь нужно ввести свой никнейм",
+        )
+
+    @gamer_states.on(NICKNAME_TO_USER, TEXT)
+    async def on_text_nickname(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+        gamer_id = update.effective_user.id
+        player = await self.players.update_player_fields_by_telegram_id(
+            gamer_id,
+            nickname=text,
+            state=f"{WAITING_START}",
+        )
+        game_session_id = player.game_session_id
+        self.live_games.add_player(game_session_id, gamer_id, text)
+        leaderboard = self.leaderboards.get(game_session_id)
+        if leaderboard is not None:
+            leaderboard.add_player(gamer_id, text)
+        await context.bot.send_message(
+            chat_id=gamer_id,
+            text="Теперь ждём всех",
+        )
+        await self.connector.create_or_update_result(gamer_id, game_session_id, 0)
 
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         gamer_id = update.effective_user.id
         logger.info(f"{GAMER} {gamer_id} called {inspect.currentframe().f_code.co_name}")
         query = update.callback_query
+        keyboard_hidden = False
         try:
             await query.answer("Ок")
             await query.edit_message_reply_markup(reply_markup=None)
+            keyboard_hidden = True
         except Exception as e:
             logger.error(f"Something went wrong, while hiding old keyboard in gamer callback")
-        data = query.data
-        logger.debug(f"got {data} callback from {gamer_id} user")
-        variant_id = data.split(":")[-1]
-        variant = self.connector.get_variant(variant_id)
+        logger.debug(f"got {query.data} callback from {gamer_id} user")
+        try:
+            payload = decode_callback(query.data)
+        except ValueError as e:
+            logger.error(f"Некорректный callback от {gamer_id}: {e}")
+            return
+        if not payload.args:
+            logger.error(f"В callback от {gamer_id} нет варианта ответа")
+            return
+        # в Answer.answer_text по-прежнему пишется текстовый вид: game_workflow:<variant_id>
+        data = payload.next_state
+        variant_id = str(payload.args[-1])
+        answered_at = time.monotonic()
+        state = self.live_games.get_by_player(gamer_id)
+        if state is None:
+            # после перезапуска бота или вытеснения состояние игры загружается из базы
+            player = await self.players.get_player_by_telegram_id(gamer_id)
+            if player is None or player.game_session_id is None:
+                logger.warning(f"{GAMER} {gamer_id} ответил вне игры")
+                return
+            state = await self.live_games.get_or_restore(player.game_session_id)
+            if state is None:
+                logger.warning(f"{GAMER} {gamer_id} ответил в уже законченной игре {player.game_session_id}")
+                return
+        variant = state.variants.get(variant_id)
+        if variant is None:
+            logger.error(f"{GAMER} {gamer_id} прислал неизвестный вариант {variant_id}")
+            return
+        game_session_id = state.game_session_id
+        if keyboard_hidden:
+            # клавиатура уже снята, при закрытии вопроса её не трогаем
+            self.messages.forget(game_session_id, variant.question_id, gamer_id)
+        if state.current_question is None or variant.question_id != state.current_question.id:
+            # запоздалое нажатие на кнопку прошлого вопроса: время доставки
+            # в состоянии уже относится к другому вопросу, ответ не засчитывается
+            logger.warning(f"{GAMER} {gamer_id} ответил на уже сменившийся вопрос {variant.question_id}")
+            return
+        if state.question_started_at is None:
+            # состояние загружено из базы после закрытия вопроса: времени ответа не посчитать,
+            # а нулевое время поставило бы игрока первым среди равных по очкам
+            logger.warning(f"{GAMER} {gamer_id} ответил на уже закрытый вопрос {variant.question_id}")
+            return
+        if gamer_id in state.answered:
+            # двойное нажатие или нажатие до того, как клавиатура снята
+            logger.warning(f"{GAMER} {gamer_id} повторно ответил на вопрос {variant.question_id}")
+            return
+        state.answered.add(gamer_id)
+        response_time_ms = state.response_time_ms(gamer_id, answered_at)
+        state.record_latency(variant.question_id, response_time_ms)
+        if gamer_id in state.answering:
+            self.scheduler.record_answer(game_session_id, gamer_id, len(state.answering))
         logger.debug(f"variant = {variant}")
-        self.connector.create_answer(variant_id, gamer_id, data, time.time())
-        game_session_id = self.connector.get_player_by_telegram_id(gamer_id).game_session_id
-        self.connector.increase_result_score(gamer_id, game_session_id, int(variant.is_correct))
+        score = int(variant.is_correct)
+        # Ответ и счёт записываются в базу пачкой, см. AnswerBuffer,
+        # а таблица лидеров обновляется сразу
+        self.answer_buffer.put(PendingAnswer(variant_id, gamer_id, game_session_id, data, int(time.time()), score, response_time_ms))
+        leaderboard = await self.leaderboards.get_or_load(game_session_id)
+        leaderboard.add_answer(gamer_id, score, response_time_ms)
 
 from queries import db_connector
-gamer_flow = GamerFlow(db_connector)
+from answer_buffer import answer_buffer
+from live_game_state import live_games
+from leaderboard import leaderboards
+from question_scheduler import question_scheduler
+from message_registry import message_registry
+from game_codes import game_codes
+from player_cache import player_cache
+# таблица GAMER_STATES проверяется при запуске, после регистрации обработчиков GamerFlow
+gamer_states.compile()
+gamer_flow = GamerFlow(db_connector, answer_buffer, live_games, leaderboards, question_scheduler, message_registry, game_codes, player_cache)
@@ -6,13 +6,13 @@ GAMER_STATES = {
     CODE_TO_GAME: {
         LABEL:              "Ожидание ввода кода",
         DEPENDENCIES:       None,
-        BEGIN_MESSAGE:      "Введи код игры \"ASDF\"",
+        BEGIN_MESSAGE:      "Введи код игры",
         ACTION:             TEXT,
-        FORWARD_STATES:     [GAMER_NICKNAME],
+        FORWARD_STATES:     [NICKNAME_TO_USER],
         BACKWARD_STATES:    None,
         END_MESSAGE:        None,
     },
-    GAMER_NICKNAME: {
+    NICKNAME_TO_USER: {
         LABEL:              "Ввод никнейма",
         DEPENDENCIES:       None,
         BEGIN_MESSAGE:      "Введи никнейм",
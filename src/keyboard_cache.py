@@ -0,0 +1,94 @@
+# keyboard_cache.py
+"""
+Кэш готовых inline-клавиатур.
+Клавиатуры списков (игры, вопросы, варианты), кнопки состояний администратора
+и клавиатуры ответов на вопросы строятся один раз и переиспользуются:
+InlineKeyboardMarkup неизменяемый, поэтому один объект можно отправлять многим.
+Ключ - (сущность, id сущности, страница, действие, версия содержимого).
+При изменении вопроса или вариантов AdminFlow вызывает invalidate():
+версия сущности увеличивается, и старые клавиатуры больше не находятся.
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from telegram import InlineKeyboardMarkup
+
+from logger import get_logger
+from settings import KEYBOARD_CACHE_SIZE
+
+logger = get_logger(__name__)
+
+# Сущности, для которых кэшируются клавиатуры
+ANSWERS = "answers"         # клавиатура ответов на вопрос, id - question_id
+GAMES = "games"             # список игр администратора, id - internal_user_id
+QUESTIONS = "questions"     # список вопросов игры, id - game_id
+VARIANTS = "variants"       # список вариантов вопроса, id - question_id
+STATES = "states"           # кнопки состояния из ADMIN_STATES, id - состояние
+
+
+class KeyboardCache:
+    def __init__(self, max_size: int = KEYBOARD_CACHE_SIZE):
+        self.max_size = max_size
+        self.keyboards: OrderedDict[tuple, InlineKeyboardMarkup] = OrderedDict()
+        self.versions: dict[tuple[str, str], int] = {}
+        # метрики
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version(self, entity: str, entity_id) -> int:
+        return self.versions.get((entity, entity_id), 0)
+
+    def key(self, entity: str, entity_id, page, action) -> tuple:
+        return entity, entity_id, page, action, self.version(entity, entity_id)
+
+    def get(self, entity: str, entity_id, page=None, action=None) -> InlineKeyboardMarkup | None:
+        key = self.key(entity, entity_id, page, action)
+        markup = self.keyboards.get(key)
+        if markup is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.keyboards.move_to_end(key)
+        return markup
+
+    def put(self, entity: str, entity_id, page, action, markup: InlineKeyboardMarkup, version: int | None = None) -> InlineKeyboardMarkup:
+        """
+        Сохраняет клавиатуру. version - версия, с которой начиналось построение:
+        если сущность за это время изменилась, устаревшая клавиатура не сохраняется.
+        """
+        if markup is None or (version is not None and version != self.version(entity, entity_id)):
+            return markup
+        self.keyboards[self.key(entity, entity_id, page, action)] = markup
+        if len(self.keyboards) > self.max_size:
+            self.keyboards.popitem(last=False)
+        return markup
+
+    async def get_or_build(self, entity: str, entity_id, page, action, build: Callable[[], Awaitable[InlineKeyboardMarkup | None]]) -> InlineKeyboardMarkup | None:
+        markup = self.get(entity, entity_id, page, action)
+        if markup is not None:
+            return markup
+        version = self.version(entity, entity_id)
+        return self.put(entity, entity_id, page, action, await build(), version)
+
+    def invalidate(self, entity: str, entity_id):
+        self.invalidations += 1
+        self.versions[(entity, entity_id)] = self.version(entity, entity_id) + 1
+        # старые версии уже не найдутся, освобождаем место сразу
+        for key in [key for key in self.keyboards if key[0] == entity and key[1] == entity_id]:
+            del self.keyboards[key]
+        logger.debug(f"keyboards of {entity} {entity_id} invalidated")
+
+    def metrics(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self.keyboards),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0,
+            "invalidations": self.invalidations,
+        }
+
+
+keyboard_cache = KeyboardCache()
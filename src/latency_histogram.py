@@ -0,0 +1,86 @@
+# latency_histogram.py
+"""
+Компактная гистограмма времени реакции игроков.
+Хранит только счётчики по фиксированным интервалам (в миллисекундах),
+поэтому размер не зависит от числа ответов. После игры гистограммы сессии
+выгружаются в JSON в каталог STATS_DIR.
+"""
+
+import asyncio
+import json
+import os
+from bisect import bisect_left
+
+from logger import get_logger
+from settings import STATS_DIR
+
+logger = get_logger(__name__)
+
+# Верхние границы интервалов, мс. Последний интервал - всё, что дольше минуты.
+BUCKET_BOUNDS_MS = (250, 500, 750, 1000, 1500, 2000, 3000, 4000, 5000, 7500, 10000, 15000, 20000, 30000, 45000, 60000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0
+        self.max_ms = 0
+
+    def record(self, latency_ms: int):
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, latency_ms)] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, q: float) -> int:
+        """
+        Оценка перцентиля сверху: верхняя граница интервала, в который он попал.
+        """
+        if not self.total:
+            return 0
+        rank = q / 100 * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKET_BOUNDS_MS[index], self.max_ms) if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_ms / self.total) if self.total else 0,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ms,
+            # только непустые интервалы: {"<=1000": 12, ">60000": 1}
+            "buckets": {
+                (f"<={BUCKET_BOUNDS_MS[index]}" if index < len(BUCKET_BOUNDS_MS) else f">{BUCKET_BOUNDS_MS[-1]}"): count
+                for index, count in enumerate(self.counts)
+                if count
+            },
+        }
+
+
+def write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+
+
+async def export_latency(game_session_id: str, total: LatencyHistogram, by_question: dict[str, LatencyHistogram], directory: str = STATS_DIR) -> str:
+    """
+    Сохраняет гистограммы сессии в {directory}/latency_{game_session_id}.json и возвращает путь.
+    """
+    path = os.path.join(directory, f"latency_{game_session_id}.json")
+    data = {
+        "game_session_id": game_session_id,
+        "bucket_bounds_ms": list(BUCKET_BOUNDS_MS),
+        "total": total.to_dict(),
+        "questions": {question_id: histogram.to_dict() for question_id, histogram in by_question.items()},
+    }
+    await asyncio.to_thread(write_json, path, data)
+    logger.info(f"latency of {game_session_id} exported to {path}: {data['total']}")
+    return path
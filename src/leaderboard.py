@@ -0,0 +1,109 @@
+# leaderboard.py
+"""
+Таблица лидеров игровой сессии, которая обновляется по мере поступления ответов.
+Игроки хранятся в списке, отсортированном по ключу (-очки, суммарное время, telegram_id):
+больше очков - выше, при равенстве выше тот, кто отвечал быстрее.
+Место игрока ищется бинарным поиском за O(log n), первые K мест - срез списка.
+При обновлении ключ игрока переставляется: поиск позиции тоже O(log n),
+сдвиг элементов списка - memmove, который для сотен игроков ничего не стоит.
+"""
+
+import asyncio
+from bisect import bisect_left, insort
+
+from queries import AsyncDatabaseConnector, db_connector
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LeaderboardEntry:
+    __slots__ = ("telegram_id", "nickname", "score", "total_time_ms")
+
+    def __init__(self, telegram_id: int, nickname: str | None, score: int = 0, total_time_ms: int = 0):
+        self.telegram_id = telegram_id
+        self.nickname = nickname
+        self.score = score
+        self.total_time_ms = total_time_ms
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        return (-self.score, self.total_time_ms, self.telegram_id)
+
+    def __repr__(self):
+        return f"<LeaderboardEntry(nickname='{self.nickname}', score={self.score}, total_time_ms={self.total_time_ms})>"
+
+
+class Leaderboard:
+    def __init__(self, game_session_id: str):
+        self.game_session_id = game_session_id
+        self.entries: dict[int, LeaderboardEntry] = {}
+        self.order: list[tuple[int, int, int]] = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add_player(self, telegram_id: int, nickname: str | None, score: int = 0, total_time_ms: int = 0) -> LeaderboardEntry:
+        entry = self.entries.get(telegram_id)
+        if entry is not None:
+            entry.nickname = nickname
+            return entry
+        entry = LeaderboardEntry(telegram_id, nickname, score, total_time_ms)
+        self.entries[telegram_id] = entry
+        insort(self.order, entry.key)
+        return entry
+
+    def add_answer(self, telegram_id: int, score: int, response_time_ms: int):
+        entry = self.entries.get(telegram_id) or self.add_player(telegram_id, None)
+        del self.order[bisect_left(self.order, entry.key)]
+        entry.score += score
+        entry.total_time_ms += response_time_ms
+        insort(self.order, entry.key)
+
+    def rank(self, telegram_id: int) -> int | None:
+        """
+        Место игрока, начиная с 1, или None, если игрока нет в таблице.
+        """
+        entry = self.entries.get(telegram_id)
+        if entry is None:
+            return None
+        return bisect_left(self.order, entry.key) + 1
+
+    def top(self, k: int | None = None) -> list[LeaderboardEntry]:
+        keys = self.order if k is None else self.order[:k]
+        return [self.entries[telegram_id] for _, _, telegram_id in keys]
+
+
+class LeaderboardRegistry:
+    def __init__(self, connector: AsyncDatabaseConnector):
+        self.connector = connector
+        self.leaderboards: dict[str, Leaderboard] = {}
+        self.load_lock = asyncio.Lock()
+
+    async def load(self, game_session_id: str) -> Leaderboard:
+        """
+        Собирает таблицу из строк results сессии (например, после перезапуска бота).
+        """
+        leaderboard = Leaderboard(game_session_id)
+        for telegram_id, nickname, score, total_time_ms in await self.connector.get_results_for_game_session(game_session_id):
+            leaderboard.add_player(telegram_id, nickname, score, total_time_ms or 0)
+        logger.info(f"loaded leaderboard of {game_session_id}: {len(leaderboard)} players")
+        return leaderboard
+
+    async def get_or_load(self, game_session_id: str) -> Leaderboard:
+        leaderboard = self.leaderboards.get(game_session_id)
+        if leaderboard is not None:
+            return leaderboard
+        # параллельные апдейты не должны загрузить таблицу дважды и потерять приращения
+        async with self.load_lock:
+            if game_session_id not in self.leaderboards:
+                self.leaderboards[game_session_id] = await self.load(game_session_id)
+            return self.leaderboards[game_session_id]
+
+    def get(self, game_session_id: str) -> Leaderboard | None:
+        return self.leaderboards.get(game_session_id)
+
+    def evict(self, game_session_id: str):
+        self.leaderboards.pop(game_session_id, None)
+
+leaderboards = LeaderboardRegistry(db_connector)
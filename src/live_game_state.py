@@ -0,0 +1,227 @@
+# live_game_state.py
+"""
+Состояние запущенных игр в памяти.
+Игроки, вопросы и варианты ответов не меняются, пока идёт игра, поэтому
+они загружаются из базы один раз при start_game, а горячие обработчики
+(ответы игроков, рассылка вопросов) читают их отсюда.
+Изменения (текущий вопрос, новые игроки) записываются и сюда, и в базу.
+После перезапуска бота или вытеснения состояние идущей игры заново
+загружается из базы (get_or_restore), вместе с открытым вопросом.
+"""
+
+import asyncio
+import time
+from bisect import bisect_right
+
+from queries import AsyncDatabaseConnector, db_connector
+from latency_histogram import LatencyHistogram
+from logger import get_logger
+from settings import QUESTION_DURATION
+
+logger = get_logger(__name__)
+
+
+class LivePlayer:
+    __slots__ = ("telegram_id", "nickname")
+
+    def __init__(self, telegram_id: int, nickname: str | None):
+        self.telegram_id = telegram_id
+        self.nickname = nickname
+
+
+class LiveVariant:
+    __slots__ = ("id", "question_id", "answer_text", "is_correct")
+
+    def __init__(self, id: str, question_id: str, answer_text: str, is_correct: bool):
+        self.id = id
+        self.question_id = question_id
+        self.answer_text = answer_text
+        self.is_correct = bool(is_correct)
+
+
+class LiveQuestion:
+    __slots__ = ("id", "position", "question_text", "path_to_media", "variants")
+
+    def __init__(self, id: str, position: int, question_text: str, path_to_media: str | None):
+        self.id = id
+        self.position = position
+        self.question_text = question_text
+        self.path_to_media = path_to_media
+        self.variants: list[LiveVariant] = []
+
+
+class LiveGameState:
+    def __init__(self, game_session_id: str, game_id: str):
+        self.game_session_id = game_session_id
+        self.game_id = game_id
+        self.players: dict[int, LivePlayer] = {}
+        self.questions: list[LiveQuestion] = []
+        self.variants: dict[str, LiveVariant] = {}
+        self.current_question_index: int | None = None
+        # time.monotonic() начала рассылки текущего вопроса и доставки каждому игроку,
+        # время ответа игрока считается от доставки ему вопроса
+        self.question_started_at: float | None = None
+        self.delivered_at: dict[int, float] = {}
+        # игроки с никнеймом, которым доставлен текущий вопрос:
+        # вопрос закрывается досрочно, когда ответили все они
+        self.answering: set[int] = set()
+        # игроки, чей ответ на текущий вопрос уже засчитан
+        self.answered: set[int] = set()
+        self.latency = LatencyHistogram()
+        self.question_latency: dict[str, LatencyHistogram] = {}
+
+    @property
+    def current_question(self) -> LiveQuestion | None:
+        if self.current_question_index is None or self.current_question_index >= len(self.questions):
+            return None
+        return self.questions[self.current_question_index]
+
+    def next_question_index(self, after_position: int) -> int:
+        """
+        Индекс первого вопроса с position больше after_position
+        (len(questions), если вопросов больше нет). Вопросы отсортированы по position.
+        """
+        return bisect_right(self.questions, after_position, key=lambda question: question.position)
+
+    @property
+    def player_ids(self) -> list[int]:
+        return list(self.players)
+
+    def mark_delivered(self, telegram_id: int, delivered_at: float):
+        self.delivered_at[telegram_id] = delivered_at
+        player = self.players.get(telegram_id)
+        if player is not None and player.nickname is not None:
+            self.answering.add(telegram_id)
+
+    def response_time_ms(self, telegram_id: int, answered_at: float) -> int:
+        """
+        Миллисекунды от доставки текущего вопроса игроку до answered_at (time.monotonic()).
+        Если доставка не отмечена, время считается от начала рассылки.
+        """
+        delivered_at = self.delivered_at.get(telegram_id, self.question_started_at)
+        if delivered_at is None:
+            return 0
+        return max(0, int((answered_at - delivered_at) * 1000))
+
+    def record_latency(self, question_id: str, latency_ms: int):
+        self.latency.record(latency_ms)
+        self.question_latency.setdefault(question_id, LatencyHistogram()).record(latency_ms)
+
+    def __repr__(self):
+        return f"<LiveGameState(game_session_id='{self.game_session_id}', players={len(self.players)}, questions={len(self.questions)})>"
+
+
+class LiveGameRegistry:
+    def __init__(self, connector: AsyncDatabaseConnector):
+        # game_session_id -> задача загрузки: параллельные ответы игроков
+        # после перезапуска ждут одну загрузку, а не строят состояние каждый свою
+        self.restoring: dict[str, asyncio.Task] = {}
+        self.connector = connector
+        self.games: dict[str, LiveGameState] = {}
+        # telegram_id игрока -> game_session_id
+        self.player_sessions: dict[int, str] = {}
+
+    async def build(self, game_session_id: str, game_session=None) -> LiveGameState:
+        """
+        Загружает сессию из базы: игроков, вопросы по position и все варианты ответов.
+        """
+        if game_session is None:
+            game_session = await self.connector.get_game_session(game_session_id)
+        state = LiveGameState(game_session_id, game_session.game_id)
+        for player in await self.connector.get_players_by_game_session_id(game_session_id):
+            state.players[player.telegram_id] = LivePlayer(player.telegram_id, player.nickname)
+            self.player_sessions[player.telegram_id] = game_session_id
+        questions = {}
+        for question in await self.connector.get_questions_by_game(game_session.game_id):
+            questions[question.id] = LiveQuestion(question.id, question.position, question.question_text, question.path_to_media)
+            state.questions.append(questions[question.id])
+        for variant in await self.connector.get_variants_by_game(game_session.game_id):
+            live_variant = LiveVariant(variant.id, variant.question_id, variant.answer_text, variant.is_correct)
+            questions[variant.question_id].variants.append(live_variant)
+            state.variants[variant.id] = live_variant
+        self.restore_open_question(state, game_session)
+        self.games[game_session_id] = state
+        logger.info(f"built {state}")
+        return state
+
+    @staticmethod
+    def restore_open_question(state: LiveGameState, game_session):
+        """
+        Текущий вопрос из сессии. Если он ещё открыт (есть дедлайн), время начала
+        рассылки восстанавливается по дедлайну, а ответов ждут от всех игроков с никнеймом:
+        время доставки каждому игроку после перезапуска неизвестно.
+        """
+        for index, question in enumerate(state.questions):
+            if question.id == game_session.current_question_id:
+                state.current_question_index = index
+                break
+        else:
+            return
+        if game_session.question_deadline is None:
+            return
+        elapsed = max(0.0, time.time() - (game_session.question_deadline - QUESTION_DURATION))
+        state.question_started_at = time.monotonic() - elapsed
+        state.answering = {telegram_id for telegram_id, player in state.players.items() if player.nickname is not None}
+
+    async def get_or_build(self, game_session_id: str) -> LiveGameState:
+        state = self.games.get(game_session_id)
+        if state is None:
+            state = await self.build(game_session_id)
+        return state
+
+    async def get_or_restore(self, game_session_id: str) -> LiveGameState | None:
+        """
+        Состояние идущей игры, при необходимости загруженное из базы.
+        None - если игра уже закончена.
+        """
+        state = self.games.get(game_session_id)
+        if state is not None:
+            return state
+        task = self.restoring.get(game_session_id)
+        if task is None:
+            task = self.restoring[game_session_id] = asyncio.create_task(self.restore(game_session_id))
+            task.add_done_callback(lambda _: self.restoring.pop(game_session_id, None))
+        return await asyncio.shield(task)
+
+    async def restore(self, game_session_id: str) -> LiveGameState | None:
+        game_session = await self.connector.get_game_session(game_session_id)
+        if game_session is None or game_session.finished_at is not None:
+            return None
+        return await self.build(game_session_id, game_session)
+
+    def get(self, game_session_id: str) -> LiveGameState | None:
+        return self.games.get(game_session_id)
+
+    def get_by_player(self, telegram_id: int) -> LiveGameState | None:
+        game_session_id = self.player_sessions.get(telegram_id)
+        if game_session_id is None:
+            return None
+        return self.games.get(game_session_id)
+
+    def add_player(self, game_session_id: str, telegram_id: int, nickname: str | None):
+        state = self.games.get(game_session_id)
+        if state is None:
+            return
+        state.players[telegram_id] = LivePlayer(telegram_id, nickname)
+        self.player_sessions[telegram_id] = game_session_id
+
+    async def set_current_question(self, state: LiveGameState, question_index: int):
+        state.current_question_index = question_index
+        state.question_started_at = time.monotonic()
+        state.delivered_at = {}
+        state.answering = set()
+        state.answered = set()
+        question = state.current_question
+        if question is not None:
+            await self.connector.update_game_session_question_id(state.game_session_id, question.id)
+
+    def evict(self, game_session_id: str):
+        state = self.games.pop(game_session_id, None)
+        if state is None:
+            return
+        for telegram_id in state.players:
+            if self.player_sessions.get(telegram_id) == game_session_id:
+                del self.player_sessions[telegram_id]
+        logger.info(f"evicted {state}")
+
+live_games = LiveGameRegistry(db_connector)
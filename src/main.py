@@ -1,30 +1,60 @@
 # main.py
 """
 Основной файл приложения.
-База данных инициализируется до запуска бота, затем в bot_data сохраняется SQLAlchemy-сессия.
+База данных инициализируется до запуска бота, затем в bot_data сохраняется коннектор к базе.
+Каждый апдейт обрабатывается в своей сессии SQLAlchemy (unit of work), поэтому апдейты
+можно обрабатывать параллельно: апдейты разных чатов идут одновременно,
+а апдейты одного чата - по порядку (PerChatUpdateProcessor из update_processor.py).
+Апдейты приходят через long polling или webhook (BOT_MODE=webhook, см. webhook_server.py).
 При вызове команды /start происходит разделение логики: если пользователь администратор,
 вызывается admin_start() из модуля admin_flow.py, иначе – gamer_start() из модуля gamer_flow.py.
 """
 
+import asyncio
 import logging
+from functools import wraps
 from telegram import (
-    Update
+    Bot,
+    Update,
 )
 from telegram.ext import (
     Application,
     CommandHandler,
+    ContextTypes,
     MessageHandler,
     CallbackQueryHandler,
     filters,
 )
 from logger import get_logger
-from settings import BOT_TOKEN, ADMIN_IDS
+from settings import BOT_TOKEN, BOT_API_BASE_URL, BOT_MODE, ADMIN_IDS
 from admin_flow import admin_flow
 from gamer_flow import gamer_flow
+from bot_context import BotContext, DB
+from admin_constants import ADMIN
+from callback_codec import callback_scope, is_stale_callback
+from queries import db_connector
+from answer_buffer import answer_buffer
+from question_scheduler import question_scheduler
+from game_codes import game_codes
+from update_processor import PerChatUpdateProcessor
+from webhook_server import run_webhook
 
 logger = get_logger(__name__)
 
-async def routing_start_command(update: Update, context):
+
+def with_unit_of_work(handler):
+    """
+    Оборачивает обработчик в отдельную сессию базы данных на время апдейта.
+    """
+    @wraps(handler)
+    async def wrapper(update: Update, context: BotContext):
+        async with context.db.unit_of_work():
+            await handler(update, context)
+    return wrapper
+
+
+@with_unit_of_work
+async def routing_start_command(update: Update, context: BotContext):
     """
     Обрабатывает команду /start.
     Если пользователь администратор – вызывается admin_start() из модуля admin_flow.py,
@@ -39,7 +69,8 @@ async def routing_start_command(update: Update, context):
         await gamer_flow.start(update, context)
 
 
-async def routing_message_handler(update: Update, context):
+@with_unit_of_work
+async def routing_message_handler(update: Update, context: BotContext):
     """Маршрутизатор для текстовых сообщений.
     Направляет сообщение в админский или геймерский обработчик в зависимости от Telegram ID.
     """
@@ -52,7 +83,8 @@ async def routing_message_handler(update: Update, context):
         await gamer_flow.handle_text(update, context)
 
 
-async def routing_photo_handler(update: Update, context):
+@with_unit_of_work
+async def routing_photo_handler(update: Update, context: BotContext):
     """Маршрутизатор для картинок.
     Направляет сообщение в админский или геймерский обработчик в зависимости от Telegram ID.
     """
@@ -64,12 +96,16 @@ async def routing_photo_handler(update: Update, context):
     # else:
     #     await gamer_flow.handle_photo(update, context)
 
-async def routing_callback_handler(update: Update, context):
+@with_unit_of_work
+async def routing_callback_handler(update: Update, context: BotContext):
     """Маршрутизатор для inline-обработчиков (callback_query).
     Вызывает соответствующий обработчик в зависимости от типа пользователя.
     """
     user_id = update.effective_user.id
-    if update.callback_query.data.startswith("admin"):
+    if is_stale_callback(update.callback_query.data):
+        # длинные нагрузки бывают только у кнопок меню администратора
+        await admin_flow.handle_stale_callback(update, context)
+    elif callback_scope(update.callback_query.data) == ADMIN:
         await admin_flow.handle_callback(update, context)
     else:
         await gamer_flow.handle_callback(update, context)
@@ -78,14 +114,56 @@ async def routing_callback_handler(update: Update, context):
     # else:
     #     await gamer_flow.handle_callback(update, context)
 
-def main():
-    application = Application.builder().token(BOT_TOKEN).build()
+async def on_startup(application: Application):
+    await answer_buffer.start()
+    # коды игр, которые шли до перезапуска
+    await game_codes.load()
+    # восстанавливает таймеры вопросов, открытых до перезапуска
+    await question_scheduler.start(application.bot)
+
+
+async def on_shutdown(application: Application):
+    await question_scheduler.stop()
+    # дописываем в базу ответы, которые не успели сброситься
+    await answer_buffer.stop()
+
+
+def build_application(bot: Bot | None = None) -> Application:
+    """
+    Собирает Application со всеми обработчиками.
+    bot - готовый объект бота (например, заглушка в нагрузочных тестах),
+    иначе бот создаётся по BOT_TOKEN и BOT_API_BASE_URL.
+    """
+    builder = Application.builder()
+    if bot is not None:
+        builder = builder.bot(bot)
+    else:
+        builder = builder.token(BOT_TOKEN)
+        if BOT_API_BASE_URL:
+            builder = builder.base_url(BOT_API_BASE_URL)
+    application = (
+        builder
+        .context_types(ContextTypes(context=BotContext))
+        .concurrent_updates(PerChatUpdateProcessor())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    application.bot_data[DB] = db_connector
 
     # Регистрируем обработчики
     application.add_handler(CommandHandler("start", routing_start_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, routing_message_handler))  # Для игроков
     application.add_handler(CallbackQueryHandler(routing_callback_handler))  # Можно заменить на нужный обработчик
     application.add_handler(MessageHandler(filters.PHOTO, routing_photo_handler))  # Можно заменить на нужный обработчик
+    return application
+
+
+def main():
+    application = build_application()
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(application))
+        return
 
     logger.info("Bot started successfully!")
     application.run_polling()
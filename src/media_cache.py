@@ -0,0 +1,40 @@
+# media_cache.py
+"""
+Кэш file_id картинок вопросов.
+Картинка загружается в Telegram один раз, полученный file_id сохраняется
+в Question.file_id, и все последующие отправки используют его вместо файла.
+"""
+
+from queries import AsyncDatabaseConnector
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MediaCache:
+    def __init__(self, connector: AsyncDatabaseConnector):
+        self.connector = connector
+        # question_id -> (path_to_media, file_id)
+        self.file_ids: dict[str, tuple[str, str]] = {}
+
+    async def get(self, question_id: str, path_to_media: str) -> str | None:
+        """
+        Возвращает file_id для картинки вопроса, если она уже загружалась.
+        Если путь к файлу изменился, старый file_id не используется.
+        """
+        cached = self.file_ids.get(question_id)
+        if cached is not None and cached[0] == path_to_media:
+            return cached[1]
+        question = await self.connector.get_question(question_id)
+        if question is None or question.file_id is None or question.path_to_media != path_to_media:
+            return None
+        self.file_ids[question_id] = (path_to_media, question.file_id)
+        return question.file_id
+
+    async def store(self, question_id: str, path_to_media: str, file_id: str):
+        logger.debug(f"question {question_id}: cached file_id {file_id}")
+        self.file_ids[question_id] = (path_to_media, file_id)
+        await self.connector.update_question_file_id(question_id, file_id)
+
+    def invalidate(self, question_id: str):
+        self.file_ids.pop(question_id, None)
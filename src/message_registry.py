@@ -0,0 +1,57 @@
+# message_registry.py
+"""
+Реестр сообщений с клавиатурами ответов, разосланных игрокам.
+Сообщения хранятся по сессии и вопросу, поэтому при закрытии вопроса
+снимаются клавиатуры только этого вопроса этой сессии, а записи сразу удаляются.
+Игрок, который уже ответил, сам убрал клавиатуру, и его сообщение
+из реестра вычёркивается, чтобы не тратить на него запрос к Telegram.
+"""
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MessageRegistry:
+    def __init__(self):
+        # game_session_id -> question_id -> chat_id -> [message_id]
+        self.messages: dict[str, dict[str, dict[int, list[int]]]] = {}
+
+    def record(self, game_session_id: str, question_id: str, chat_id: int, message_id: int):
+        questions = self.messages.setdefault(game_session_id, {})
+        questions.setdefault(question_id, {}).setdefault(chat_id, []).append(message_id)
+
+    def forget(self, game_session_id: str, question_id: str, chat_id: int):
+        self.messages.get(game_session_id, {}).get(question_id, {}).pop(chat_id, None)
+
+    def pop(self, game_session_id: str, question_id: str | None = None) -> dict[int, list[int]]:
+        """
+        Забирает сообщения вопроса (или всех открытых вопросов сессии) для снятия клавиатур.
+        """
+        questions = self.messages.get(game_session_id)
+        if not questions:
+            return {}
+        if question_id is not None:
+            chats = questions.pop(question_id, {})
+        else:
+            chats = {}
+            for question_chats in questions.values():
+                for chat_id, message_ids in question_chats.items():
+                    chats.setdefault(chat_id, []).extend(message_ids)
+            questions.clear()
+        if not questions:
+            del self.messages[game_session_id]
+        return chats
+
+    def evict(self, game_session_id: str):
+        self.messages.pop(game_session_id, None)
+
+    def __len__(self):
+        return sum(
+            len(message_ids)
+            for questions in self.messages.values()
+            for chats in questions.values()
+            for message_ids in chats.values()
+        )
+
+message_registry = MessageRegistry()
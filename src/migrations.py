@@ -0,0 +1,228 @@
+# migrations.py
+"""
+Миграции схемы для уже существующих файлов базы данных.
+Base.metadata.create_all создаёт только отсутствующие таблицы,
+поэтому новые колонки моделей добавляются здесь через ALTER TABLE,
+а новые индексы - через CREATE INDEX. Перед созданием уникального
+индекса дубликаты, накопившиеся в старой базе, сливаются в одну строку.
+Индексы, заменённые новыми, удаляются.
+Новые колонки, которые нельзя оставить пустыми, заполняются после добавления.
+"""
+
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from models import Base
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def add_missing_columns(engine: Engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+                logger.info(f"Добавлена колонка {table.name}.{column.name}")
+
+
+def insertion_order(connection: Connection) -> str:
+    """
+    Выражение для порядка добавления строк: rowid в SQLite. В других базах
+    (DATABASE_URL может указывать на PostgreSQL) rowid нет, и порядок
+    берётся по первичному ключу id - у всех таблиц он есть.
+    """
+    return "rowid" if connection.dialect.name == "sqlite" else "id"
+
+
+def kept_row_id(connection: Connection, table: str, where: str, parameters: dict, newest: bool = False) -> str:
+    """
+    id строки, которая остаётся из группы дубликатов: первой добавленной (или последней, newest).
+    """
+    direction = "DESC" if newest else "ASC"
+    return connection.execute(
+        text(f"SELECT id FROM {table} WHERE {where} ORDER BY {insertion_order(connection)} {direction} LIMIT 1"),
+        parameters,
+    ).scalar_one()
+
+
+def merge_duplicate_results(connection: Connection):
+    """
+    Оставляет по одной строке results на (game_session_id, user_id) с суммой очков.
+    """
+    duplicates = connection.execute(text(
+        "SELECT game_session_id, user_id, SUM(score) FROM results "
+        "GROUP BY game_session_id, user_id HAVING COUNT(*) > 1"
+    )).all()
+    for game_session_id, user_id, score in duplicates:
+        parameters = {"game_session_id": game_session_id, "user_id": user_id}
+        kept_id = kept_row_id(connection, "results", "game_session_id = :game_session_id AND user_id = :user_id", parameters)
+        connection.execute(
+            text("UPDATE results SET score = :score WHERE id = :id"),
+            {"score": score, "id": kept_id},
+        )
+        connection.execute(
+            text("DELETE FROM results WHERE game_session_id = :game_session_id AND user_id = :user_id AND id != :id"),
+            {**parameters, "id": kept_id},
+        )
+    if duplicates:
+        logger.warning(f"Слиты дубликаты результатов: {len(duplicates)}")
+
+
+def merge_duplicate_internal_users(connection: Connection):
+    """
+    Оставляет самого первого пользователя с данным telegram_id, игры остальных переходят к нему.
+    """
+    duplicates = connection.execute(text(
+        "SELECT telegram_id FROM internal_users "
+        "GROUP BY telegram_id HAVING COUNT(*) > 1"
+    )).scalars().all()
+    for telegram_id in duplicates:
+        kept_id = kept_row_id(connection, "internal_users", "telegram_id = :telegram_id", {"telegram_id": telegram_id})
+        parameters = {"telegram_id": telegram_id, "kept_id": kept_id}
+        connection.execute(text(
+            "UPDATE games SET created_by = :kept_id WHERE created_by IN "
+            "(SELECT id FROM internal_users WHERE telegram_id = :telegram_id AND id != :kept_id)"
+        ), parameters)
+        connection.execute(
+            text("DELETE FROM internal_users WHERE telegram_id = :telegram_id AND id != :kept_id"),
+            parameters,
+        )
+    if duplicates:
+        logger.warning(f"Слиты дубликаты внутренних пользователей: {len(duplicates)}")
+
+
+def merge_duplicate_players(connection: Connection) -> int:
+    """
+    Оставляет одну строку players на telegram_id - самую первую: именно её
+    находил get_player_by_telegram_id, остальные строки создавались повторным /start
+    и не читались. Ответы и результаты ссылаются на telegram_id, поэтому не теряются.
+    Возвращает число удалённых строк.
+    """
+    duplicates = connection.execute(text(
+        "SELECT telegram_id FROM players "
+        "GROUP BY telegram_id HAVING COUNT(*) > 1"
+    )).scalars().all()
+    removed = 0
+    for telegram_id in duplicates:
+        kept_id = kept_row_id(connection, "players", "telegram_id = :telegram_id", {"telegram_id": telegram_id})
+        removed += connection.execute(
+            text("DELETE FROM players WHERE telegram_id = :telegram_id AND id != :kept_id"),
+            {"telegram_id": telegram_id, "kept_id": kept_id},
+        ).rowcount
+    if duplicates:
+        logger.warning(f"Слиты дубликаты игроков: {len(duplicates)}, удалено строк: {removed}")
+    return removed
+
+
+def finish_duplicate_game_sessions(connection: Connection):
+    """
+    Из незаконченных сессий с одинаковым кодом идущей остаётся самая новая,
+    остальные отмечаются законченными.
+    """
+    duplicates = connection.execute(text(
+        "SELECT game_code FROM game_sessions WHERE finished_at IS NULL "
+        "GROUP BY game_code HAVING COUNT(*) > 1"
+    )).scalars().all()
+    for game_code in duplicates:
+        kept_id = kept_row_id(connection, "game_sessions", "game_code = :game_code AND finished_at IS NULL", {"game_code": game_code}, newest=True)
+        connection.execute(text(
+            "UPDATE game_sessions SET finished_at = :finished_at "
+            "WHERE game_code = :game_code AND finished_at IS NULL AND id != :kept_id"
+        ), {"finished_at": time.time(), "game_code": game_code, "kept_id": kept_id})
+    if duplicates:
+        logger.warning(f"Закрыты старые сессии с повторяющимися кодами: {len(duplicates)}")
+
+
+# Таблица -> функция, убирающая дубликаты перед созданием уникального индекса
+DEDUPLICATORS = {
+    "results": merge_duplicate_results,
+    "internal_users": merge_duplicate_internal_users,
+    "game_sessions": finish_duplicate_game_sessions,
+    "players": merge_duplicate_players,
+}
+
+# Индексы старых версий схемы, которые заменены новыми и только замедляют запись
+SUPERSEDED_INDEXES = {
+    # заменён уникальным ux_players_telegram_id
+    "players": ("ix_players_telegram_id",),
+    # заменён составным ix_questions_game_id_position
+    "questions": ("ix_questions_game_id",),
+}
+
+
+def backfill_question_positions(engine: Engine):
+    """
+    Нумерует вопросы без position в том порядке, в котором они добавлялись в игру,
+    после уже пронумерованных вопросов этой игры.
+    """
+    with engine.begin() as connection:
+        rows = connection.execute(text(
+            f"SELECT game_id, id FROM questions WHERE position IS NULL ORDER BY game_id, {insertion_order(connection)}"
+        )).all()
+        next_positions = {}
+        for game_id, question_id in rows:
+            if game_id not in next_positions:
+                # "IS :game_id" для сравнения с NULL понимает только SQLite
+                if game_id is None:
+                    last_position = connection.execute(
+                        text("SELECT MAX(position) FROM questions WHERE game_id IS NULL")
+                    ).scalar()
+                else:
+                    last_position = connection.execute(
+                        text("SELECT MAX(position) FROM questions WHERE game_id = :game_id"), {"game_id": game_id}
+                    ).scalar()
+                next_positions[game_id] = 0 if last_position is None else last_position + 1
+            connection.execute(
+                text("UPDATE questions SET position = :position WHERE id = :id"),
+                {"position": next_positions[game_id], "id": question_id},
+            )
+            next_positions[game_id] += 1
+    if rows:
+        logger.info(f"Пронумерованы вопросы: {len(rows)}")
+
+
+def create_missing_indexes(engine: Engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                if index.unique and table.name in DEDUPLICATORS:
+                    DEDUPLICATORS[table.name](connection)
+                index.create(connection)
+                logger.info(f"Создан индекс {index.name}")
+
+
+def drop_superseded_indexes(engine: Engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table_name, index_names in SUPERSEDED_INDEXES.items():
+            if not inspector.has_table(table_name):
+                continue
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+            for index_name in index_names:
+                if index_name in existing_indexes:
+                    connection.execute(text(f"DROP INDEX {index_name}"))
+                    logger.info(f"Удалён индекс {index_name}")
+
+
+def upgrade(engine: Engine):
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    backfill_question_positions(engine)
+    create_missing_indexes(engine)
+    drop_superseded_indexes(engine)
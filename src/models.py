@@ -1,7 +1,7 @@
 # models.py
 import uuid
 from sqlalchemy import (
-    Column, String, Text, Boolean, Integer, ForeignKey
+    Column, String, Text, Boolean, Integer, Float, ForeignKey, Index, text
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -13,13 +13,17 @@ def generate_uuid():
 # Таблица игроков
 class Player(Base):
     __tablename__ = 'players'
+    # один игрок на telegram_id: /start обновляет строку, а не добавляет новую
+    __table_args__ = (
+        Index("ux_players_telegram_id", "telegram_id", unique=True),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     telegram_id = Column(Integer, nullable=False)
     telegram_name = Column(String, nullable=True)
     state = Column(String, nullable=True)
     nickname = Column(String, nullable=True)
-    game_session_id = Column(String, ForeignKey('game_sessions.id'), nullable=True)
+    game_session_id = Column(String, ForeignKey('game_sessions.id'), nullable=True, index=True)
 
     # Отношения
     game = relationship("GameSession", back_populates="players")
@@ -34,7 +38,7 @@ class InternalUser(Base):
     __tablename__ = 'internal_users'
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    telegram_id = Column(Integer, nullable=False)
+    telegram_id = Column(Integer, nullable=False, unique=True, index=True)
     nickname = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     state = Column(String, nullable=False, default="start")
@@ -48,6 +52,10 @@ class InternalUser(Base):
 # Таблица игр
 class Game(Base):
     __tablename__ = 'games'
+    # списки игр администратора листаются по id (keyset), см. DatabaseConnector.get_games_page
+    __table_args__ = (
+        Index("ix_games_created_by_id", "created_by", "id"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     type = Column(String, nullable=False)
@@ -67,11 +75,19 @@ class Game(Base):
 # Таблица вопросов
 class Question(Base):
     __tablename__ = 'questions'
+    # вопросы игры идут по position; индекс с game_id первым заменяет индекс по одному game_id
+    __table_args__ = (
+        Index("ix_questions_game_id_position", "game_id", "position"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     game_id = Column(String, ForeignKey('games.id'), nullable=True)
+    # порядковый номер вопроса в игре, между номерами могут быть пропуски
+    position = Column(Integer, nullable=True)
     question_text = Column(Text, nullable=True)
     path_to_media = Column(String, default=None)
+    # file_id картинки в Telegram, чтобы не загружать файл повторно при каждой рассылке
+    file_id = Column(String, nullable=True)
 
     # Отношения
     game = relationship("Game", back_populates="questions")
@@ -81,13 +97,13 @@ class Question(Base):
     media = relationship("Media", back_populates="question", cascade="all, delete-orphan")
 
     def __repr__(self):
-        return f"<Question(id='{self.id}', text='{self.question_text}')>"
+        return f"<Question(id='{self.id}', position={self.position}, text='{self.question_text}')>"
 
 # Таблица вариантов ответа
 class Variant(Base):
     __tablename__ = 'variant'
     id = Column(String, primary_key=True, default=generate_uuid)
-    question_id = Column(String, ForeignKey('questions.id'), nullable=False)
+    question_id = Column(String, ForeignKey('questions.id'), nullable=False, index=True)
     answer_text = Column(Text, nullable=False)
     is_correct = Column(Boolean, default=False)
     
@@ -103,9 +119,11 @@ class Answer(Base):
 
     id = Column(String, primary_key=True, default=generate_uuid)
     variant_id = Column(String, ForeignKey('variant.id'), nullable=False)
-    user_id = Column(String, ForeignKey('players.id'), nullable=False)
+    user_id = Column(String, ForeignKey('players.id'), nullable=False, index=True)
     answer_text = Column(Text, nullable=False)
     answered_at = Column(Integer, default=0)  # Можно хранить timestamp в секундах
+    # время от доставки вопроса игроку до ответа, мс
+    response_time_ms = Column(Integer, nullable=True)
 
     # Отношения
     variant = relationship("Variant", back_populates="answer")
@@ -119,11 +137,12 @@ class Media(Base):
     __tablename__ = 'media'
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    question_id = Column(String, ForeignKey('questions.id'), nullable=False)
+    question_id = Column(String, ForeignKey('questions.id'), nullable=False, index=True)
     media_type = Column(String, nullable=False)
     url = Column(Text, nullable=False)
     description = Column(Text, nullable=True)
     display_type = Column(String, nullable=False)  # Options: individual, shared, both
+    file_id = Column(String, nullable=True)
 
     # Отношения
     question = relationship("Question", back_populates="media")
@@ -134,11 +153,18 @@ class Media(Base):
 # Таблица результатов
 class Result(Base):
     __tablename__ = 'results'
+    # У игрока одна строка результата на сессию. Индекс начинается с game_session_id,
+    # чтобы им пользовались и выборка результатов сессии, и поиск строки игрока.
+    __table_args__ = (
+        Index("ix_results_game_session_id_user_id", "game_session_id", "user_id", unique=True),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     game_session_id = Column(String, ForeignKey('game_sessions.id'), nullable=False)
     user_id = Column(String, ForeignKey('players.id'), nullable=False)
     score = Column(Integer, nullable=False)
+    # суммарное время ответов игрока в сессии, мс: при равенстве очков выше тот, кто быстрее
+    total_time_ms = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Отношения
     game_session = relationship("GameSession", back_populates="results")
@@ -150,12 +176,26 @@ class Result(Base):
 # Таблица сессий игры
 class GameSession(Base):
     __tablename__ = 'game_sessions'
+    # код уникален только среди идущих игр: после окончания игры его можно выдать снова
+    __table_args__ = (
+        Index(
+            "ux_game_sessions_active_code", "game_code", unique=True,
+            sqlite_where=text("finished_at IS NULL"), postgresql_where=text("finished_at IS NULL"),
+        ),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     game_id = Column(String, ForeignKey('games.id'), nullable=True)
     game_code = Column(String, nullable=False)
     status = Column(String, nullable=False)
+    # time.time() окончания игры, NULL - игра ещё идёт
+    finished_at = Column(Float, nullable=True)
     current_question_id = Column(String, ForeignKey('questions.id'), nullable=True)
+    # открытый вопрос: номер, дедлайн (time.time()) и администратор, которому
+    # после закрытия придёт кнопка следующего вопроса; переживает перезапуск бота
+    question_number = Column(Integer, nullable=True)
+    question_deadline = Column(Float, nullable=True)
+    admin_telegram_id = Column(Integer, nullable=True)
 
     # Отношения
     game = relationship("Game", back_populates="sessions")
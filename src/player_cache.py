@@ -0,0 +1,120 @@
+# player_cache.py
+"""
+Кэш состояния игроков (state, game_session_id, nickname) по telegram_id.
+GamerFlow читает игрока на каждое сообщение, а меняет его только через
+методы этого класса, поэтому кэш сквозной (write-through): изменения сразу
+пишутся в базу и в кэш. Изменения пишутся одним UPDATE без чтения строки,
+так что при попадании в кэш ввод кода и никнейма не читает базу вовсе.
+Размер ограничен, записи живут не дольше PLAYER_CACHE_TTL секунд:
+изменения игрока в обход кэша (например, вручную в базе) со временем подхватываются.
+"""
+
+from cachetools import TTLCache
+
+from models import Player
+from queries import AsyncDatabaseConnector, db_connector
+from logger import get_logger
+from settings import PLAYER_CACHE_SIZE, PLAYER_CACHE_TTL
+
+logger = get_logger(__name__)
+
+
+class CachedPlayer:
+    """
+    Снимок полей игрока, не привязанный к сессии SQLAlchemy.
+    """
+    __slots__ = ("telegram_id", "state", "game_session_id", "nickname")
+
+    def __init__(self, telegram_id: int, state: str | None, game_session_id: str | None, nickname: str | None):
+        self.telegram_id = telegram_id
+        self.state = state
+        self.game_session_id = game_session_id
+        self.nickname = nickname
+
+    @classmethod
+    def from_player(cls, player: Player) -> "CachedPlayer":
+        return cls(player.telegram_id, player.state, player.game_session_id, player.nickname)
+
+    def __repr__(self):
+        return f"<CachedPlayer(telegram_id={self.telegram_id}, state='{self.state}', game_session_id='{self.game_session_id}')>"
+
+
+class PlayerCache:
+    def __init__(self, connector: AsyncDatabaseConnector, max_size: int = PLAYER_CACHE_SIZE, ttl: float = PLAYER_CACHE_TTL):
+        self.connector = connector
+        self.players: TTLCache[int, CachedPlayer] = TTLCache(maxsize=max_size, ttl=ttl)
+        # метрики
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def put(self, player: Player | None) -> CachedPlayer | None:
+        if player is None:
+            return None
+        cached = CachedPlayer.from_player(player)
+        self.players[cached.telegram_id] = cached
+        return cached
+
+    def invalidate(self, telegram_id: int):
+        self.invalidations += 1
+        self.players.pop(telegram_id, None)
+
+    async def get_player_by_telegram_id(self, telegram_id: int) -> CachedPlayer | None:
+        cached = self.players.get(telegram_id)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        return self.put(await self.connector.get_player_by_telegram_id(telegram_id))
+
+    async def upsert_player(self, telegram_id: int, telegram_name: str | None, state: str, nickname: str | None, game_session_id: str | None = None) -> CachedPlayer:
+        try:
+            player = await self.connector.upsert_player(telegram_id, telegram_name, state, nickname, game_session_id)
+        except Exception:
+            self.invalidate(telegram_id)
+            raise
+        return self.put(player)
+
+    async def update_player_fields_by_telegram_id(self, telegram_id: int, **fields) -> CachedPlayer:
+        """
+        Обновляет поля игрока в базе и в кэше.
+
+        :raises ValueError: Если игрок с указанным Telegram ID не найден.
+        """
+        cached = self.players.get(telegram_id)
+        try:
+            await self.connector.set_player_fields_by_telegram_id(telegram_id, **fields)
+        except Exception:
+            # не знаем, что успело записаться
+            self.invalidate(telegram_id)
+            raise
+        if cached is None:
+            return await self.get_player_by_telegram_id(telegram_id)
+        for name, value in fields.items():
+            if name in CachedPlayer.__slots__:
+                setattr(cached, name, value)
+        # снимок в кэше меняется на месте, запись продлевается
+        self.players[telegram_id] = cached
+        return cached
+
+    async def update_player_state_by_telegram_id(self, telegram_id: int, new_state: str) -> CachedPlayer:
+        return await self.update_player_fields_by_telegram_id(telegram_id, state=new_state)
+
+    async def update_player_game_session_by_telegram_id(self, telegram_id: int, new_game_session_id: str) -> CachedPlayer:
+        return await self.update_player_fields_by_telegram_id(telegram_id, game_session_id=new_game_session_id)
+
+    async def update_player_nickname(self, player_id: str, new_nickname: str) -> CachedPlayer | None:
+        return self.put(await self.connector.update_player_nickname(player_id, new_nickname))
+
+    def metrics(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self.players),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0,
+            "invalidations": self.invalidations,
+        }
+
+
+player_cache = PlayerCache(db_connector)
@@ -1,8 +1,15 @@
 # queries.py
-from sqlalchemy import create_engine
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import partial
+from sqlalchemy import create_engine, event, func, make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.sql import func
-from sqlalchemy.sql.functions import coalesce
 from models import (
     Base,
     Player,
@@ -17,9 +24,24 @@ from models import (
 )
 from uuid import uuid4
 from logger import get_logger
+from migrations import upgrade
+from settings import (
+    DATABASE_URL,
+    DATABASE_ECHO,
+    DATABASE_POOL_SIZE,
+    DATABASE_THREADS,
+)
 
 logger = get_logger(__name__)
 
+# insert с поддержкой ON CONFLICT для диалектов, где он есть
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+# строк в одной команде INSERT: у SQLite ограничено число параметров запроса
+UPSERT_CHUNK_SIZE = 200
+
 class DatabaseConnector:
     def __init__(self, session: Session):
         self.session = session
@@ -39,6 +61,28 @@ class DatabaseConnector:
         self.session.commit()
         return new_player
 
+    def upsert_player(self, telegram_id: int, telegram_name: str | None, state: str, nickname: str | None, game_session_id: str | None = None) -> Player:
+        """
+        Создаёт игрока или, если игрок с таким telegram_id уже есть, перезаписывает
+        его поля - одной командой INSERT ... ON CONFLICT DO UPDATE.
+        Повторный /start не добавляет строк в players.
+        """
+        fields = {
+            "telegram_name": telegram_name,
+            "state": state,
+            "nickname": nickname,
+            "game_session_id": game_session_id,
+        }
+        insert = UPSERT_INSERTS[self.session.get_bind().dialect.name]
+        statement = insert(Player).values(id=str(uuid4()), telegram_id=telegram_id, **fields)
+        statement = statement.on_conflict_do_update(index_elements=[Player.telegram_id], set_=fields)
+        player = self.session.scalars(
+            statement.returning(Player),
+            execution_options={"populate_existing": True},
+        ).one()
+        self.session.commit()
+        return player
+
     def get_player_by_telegram_id(self, telegram_id: int) -> Player:
         return self.session.query(Player).filter(Player.telegram_id == telegram_id).first()
 
@@ -56,6 +100,36 @@ class DatabaseConnector:
             self.session.commit()
         return player
 
+    def update_player_fields_by_telegram_id(self, telegram_id: int, **fields) -> Player:
+        """
+        Обновляет несколько полей игрока (state, nickname, game_session_id, ...) одним commit.
+
+        :raises ValueError: Если игрок с указанным Telegram ID не найден.
+        """
+        player = self.get_player_by_telegram_id(telegram_id)
+        if player is None:
+            raise ValueError(f"Player with telegram_id {telegram_id} not found.")
+        for name, value in fields.items():
+            setattr(player, name, value)
+        self.session.commit()
+        return player
+
+    def set_player_fields_by_telegram_id(self, telegram_id: int, **fields) -> int:
+        """
+        Обновляет поля игрока одним UPDATE, не читая строку. Возвращает число обновлённых строк.
+
+        :raises ValueError: Если игрок с указанным Telegram ID не найден.
+        """
+        updated = (
+            self.session.query(Player)
+            .filter(Player.telegram_id == telegram_id)
+            .update(fields, synchronize_session=False)
+        )
+        if not updated:
+            raise ValueError(f"Player with telegram_id {telegram_id} not found.")
+        self.session.commit()
+        return updated
+
     def update_player_game_session_by_telegram_id(self, telegram_id: int, new_game_session_id: str) -> Player:
         """
         Обновляет поле game_session_id у игрока (Player) по его telegram_id.
@@ -95,41 +169,60 @@ class DatabaseConnector:
         return result
 
     def increase_result_score(self, player_id: str, game_session_id: str, increment: int = 1) -> Result:
-        result = self.session.query(Result).filter(
+        self.add_result_scores({(player_id, game_session_id): increment})
+        return self.session.query(Result).filter(
             Result.user_id == player_id,
             Result.game_session_id == game_session_id,
-        ).first()
-        if result:
-            result.score += increment
-        else:
-            result = Result(
-                id=str(uuid4()),
-                user_id=player_id,
-                game_session_id=game_session_id,
-                score=increment,
-            )
-            self.session.add(result)
+        ).populate_existing().first()
+
+    def add_result_scores(self, increments: dict[tuple[int | str, str], int], response_times: dict[tuple[int | str, str], int] | None = None) -> None:
+        """
+        Атомарно прибавляет очки игрокам: score = score + increment считается в базе,
+        поэтому параллельные ответы одного игрока не теряют приращения.
+
+        :param increments: {(player_id, game_session_id): increment}.
+        :param response_times: {(player_id, game_session_id): время ответов в мс}, прибавляется к total_time_ms.
+        """
+        self._upsert_result_scores(increments, response_times or {})
         self.session.commit()
-        return result
 
-    def get_results_for_game_session(self, game_session_id: str):
-        time_subq = (
-            self.session.query(
-                Answer.user_id.label("player_id"),
-                coalesce(func.sum(Answer.answered_at), 0).label("total_time")
+    def _upsert_result_scores(self, increments: dict[tuple[int | str, str], int], response_times: dict[tuple[int | str, str], int]) -> None:
+        rows = [
+            {
+                "id": str(uuid4()),
+                "user_id": player_id,
+                "game_session_id": game_session_id,
+                "score": increment,
+                "total_time_ms": response_times.get((player_id, game_session_id), 0),
+            }
+            for (player_id, game_session_id), increment in increments.items()
+        ]
+        insert = UPSERT_INSERTS[self.session.get_bind().dialect.name]
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            statement = insert(Result).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            statement = statement.on_conflict_do_update(
+                index_elements=[Result.game_session_id, Result.user_id],
+                set_={
+                    "score": Result.score + statement.excluded.score,
+                    "total_time_ms": Result.total_time_ms + statement.excluded.total_time_ms,
+                },
             )
-            .group_by(Answer.user_id)
-            .subquery()
-        )
+            self.session.execute(statement)
 
+    def get_results_for_game_session(self, game_session_id: str):
+        """
+        Строки таблицы лидеров сессии: (telegram_id, nickname, score, total_time_ms).
+        Время ответов накапливается в results по мере записи ответов,
+        поэтому таблица answer здесь не читается.
+        """
         results = (
             self.session.query(
+                Player.telegram_id,
                 Player.nickname,
                 Result.score,
-                time_subq.c.total_time
+                Result.total_time_ms,
             )
             .join(Result, Player.telegram_id == Result.user_id)
-            .outerjoin(time_subq, Player.telegram_id == time_subq.c.player_id)
             .filter(Result.game_session_id == game_session_id)
             .all()
         )
@@ -139,8 +232,10 @@ class DatabaseConnector:
     # Работа с вопросами (Question)
     # ---------------------------
     def create_question(self, game_id: str, question_text: str, path_to_media: str | None = None) -> Question:
+        last_position = self.session.query(func.max(Question.position)).filter(Question.game_id == game_id).scalar()
         new_question = Question(
             game_id=game_id,
+            position=0 if last_position is None else last_position + 1,
             question_text=question_text,
             path_to_media=path_to_media,
         )
@@ -152,7 +247,66 @@ class DatabaseConnector:
         return self.session.query(Question).filter(Question.id == question_id).first()
 
     def get_questions_by_game(self, game_id: str) -> list[Question]:
-        return self.session.query(Question).filter(Question.game_id == game_id).all()
+        return self.session.query(Question).filter(Question.game_id == game_id).order_by(Question.position).all()
+
+    def get_questions_page(self, game_id: str, limit: int, after: int | None = None, before: int | None = None, offset: int = 0) -> list[Question]:
+        return self._keyset_page(Question, Question.game_id == game_id, Question.position, limit, after, before, offset)
+
+    def get_next_question(self, game_id: str, after_position: int | None = None) -> Question | None:
+        """
+        Первый вопрос игры после after_position (None - самый первый вопрос).
+        """
+        query = self.session.query(Question).filter(Question.game_id == game_id)
+        if after_position is not None:
+            query = query.filter(Question.position > after_position)
+        return query.order_by(Question.position).first()
+
+    def get_previous_question(self, game_id: str, before_position: int) -> Question | None:
+        return (
+            self.session.query(Question)
+            .filter(Question.game_id == game_id, Question.position < before_position)
+            .order_by(Question.position.desc())
+            .first()
+        )
+
+    def move_question(self, question_id: str, step: int) -> Question | None:
+        """
+        Меняет вопрос местами с соседним: step < 0 - с предыдущим, step > 0 - со следующим.
+        Меняются только два значения position. Возвращает соседа или None,
+        если вопрос уже первый (последний).
+        """
+        question = self.get_question(question_id)
+        if question is None:
+            raise ValueError(f"Question with id {question_id} not found.")
+        if step < 0:
+            neighbour = self.get_previous_question(question.game_id, question.position)
+        else:
+            neighbour = self.get_next_question(question.game_id, question.position)
+        if neighbour is None:
+            return None
+        question.position, neighbour.position = neighbour.position, question.position
+        self.session.commit()
+        return neighbour
+
+    def count_questions_by_game(self, game_id: str) -> int:
+        return self.session.query(func.count(Question.id)).filter(Question.game_id == game_id).scalar()
+
+    def update_question_file_id(self, question_id: str, file_id: str | None) -> Question:
+        question = self.get_question(question_id)
+        if question is None:
+            raise ValueError(f"Question with id {question_id} not found.")
+        question.file_id = file_id
+        self.session.commit()
+        return question
+
+    def update_question_media(self, question_id: str, path_to_media: str, file_id: str | None = None) -> Question:
+        question = self.get_question(question_id)
+        if question is None:
+            raise ValueError(f"Question with id {question_id} not found.")
+        question.path_to_media = path_to_media
+        question.file_id = file_id
+        self.session.commit()
+        return question
 
     def update_question_text(self, question_id: str, new_text: str) -> Question:
         question = self.get_question(question_id)
@@ -204,6 +358,20 @@ class DatabaseConnector:
     def get_variants_by_question(self, question_id: str) -> list[Variant]:
         return self.session.query(Variant).filter(Variant.question_id == question_id).all()
 
+    def get_variants_page(self, question_id: str, limit: int, after: str | None = None, before: str | None = None, offset: int = 0) -> list[Variant]:
+        return self._keyset_page(Variant, Variant.question_id == question_id, Variant.id, limit, after, before, offset)
+
+    def count_variants_by_question(self, question_id: str) -> int:
+        return self.session.query(func.count(Variant.id)).filter(Variant.question_id == question_id).scalar()
+
+    def get_variants_by_game(self, game_id: str) -> list[Variant]:
+        return (
+            self.session.query(Variant)
+            .join(Question, Variant.question_id == Question.id)
+            .filter(Question.game_id == game_id)
+            .all()
+        )
+
     def delete_variant(self, variant_id: str) -> None:
         variant = self.get_variant(variant_id)
         if variant is None:
@@ -233,19 +401,42 @@ class DatabaseConnector:
         self.session.commit()
         return new_answer
 
+    def save_answers(self, answers: list) -> None:
+        """
+        Записывает пачку ответов и приращения счёта одной транзакцией.
+        Элементы answers - объекты с полями variant_id, telegram_id, game_session_id,
+        answer_text, answered_at, score и response_time_ms (см. answer_buffer.PendingAnswer).
+        """
+        increments = {}
+        response_times = {}
+        for answer in answers:
+            self.session.add(Answer(
+                variant_id=answer.variant_id,
+                user_id=answer.telegram_id,
+                answer_text=answer.answer_text,
+                answered_at=answer.answered_at,
+                response_time_ms=answer.response_time_ms,
+            ))
+            key = (answer.telegram_id, answer.game_session_id)
+            increments[key] = increments.get(key, 0) + answer.score
+            response_times[key] = response_times.get(key, 0) + answer.response_time_ms
+        self._upsert_result_scores(increments, response_times)
+        self.session.commit()
+
     def get_answers_by_question(self, question_id: str):
         return self.session.query(Answer).filter(Answer.question_id == question_id).all()
 
     # ---------------------------
     # Работа с медиа (Media)
     # ---------------------------
-    def create_media(self, question_id: str, media_type: str, url: str, description: str, display_type: str) -> Media:
+    def create_media(self, question_id: str, media_type: str, url: str, description: str, display_type: str, file_id: str | None = None) -> Media:
         new_media = Media(
             question_id=question_id,
             media_type=media_type,
             url=url,
             description=description,
             display_type=display_type,
+            file_id=file_id,
         )
         self.session.add(new_media)
         self.session.commit()
@@ -268,6 +459,26 @@ class DatabaseConnector:
         self.session.commit()
         return new_session
 
+    def create_active_game_session(self, game_id: str, game_code: str, status: str) -> GameSession | None:
+        """
+        Создаёт сессию с кодом, если он не занят другой идущей игрой, иначе None.
+        """
+        try:
+            return self.create_game_session(game_id, game_code, status)
+        except IntegrityError:
+            self.session.rollback()
+            return None
+
+    def finish_game_session(self, game_session_id: str) -> GameSession:
+        game_session = self.get_game_session(game_session_id)
+        if game_session and game_session.finished_at is None:
+            game_session.finished_at = time.time()
+            self.session.commit()
+        return game_session
+
+    def get_active_game_sessions(self) -> list[GameSession]:
+        return self.session.query(GameSession).filter(GameSession.finished_at.is_(None)).all()
+
     def update_game_session_state(self, game_session_id: str, new_status: str) -> GameSession:
         game_session = self.get_game_session(game_session_id)
         if game_session:
@@ -282,11 +493,37 @@ class DatabaseConnector:
             self.session.commit()
         return game_session
 
+    def update_game_session_deadline(self, game_session_id: str, question_number: int, deadline: float, admin_telegram_id: int) -> GameSession:
+        game_session = self.get_game_session(game_session_id)
+        if game_session:
+            game_session.question_number = question_number
+            game_session.question_deadline = deadline
+            game_session.admin_telegram_id = admin_telegram_id
+            self.session.commit()
+        return game_session
+
+    def clear_game_session_deadline(self, game_session_id: str) -> GameSession:
+        game_session = self.get_game_session(game_session_id)
+        if game_session:
+            game_session.question_deadline = None
+            self.session.commit()
+        return game_session
+
+    def get_game_sessions_with_deadline(self) -> list[GameSession]:
+        return self.session.query(GameSession).filter(GameSession.question_deadline.isnot(None)).all()
+
     def get_players_by_game_session_id(self, game_session_id: str) -> list[Player]:
         return self.session.query(Player).filter(Player.game_session_id == game_session_id).all()
 
     def get_game_session_by_code(self, code: str) -> GameSession:
-        return self.session.query(GameSession).filter(GameSession.game_code == code).first()
+        """
+        Идущая игра с кодом code.
+        """
+        return (
+            self.session.query(GameSession)
+            .filter(GameSession.game_code == code, GameSession.finished_at.is_(None))
+            .first()
+        )
 
     def get_game_session(self, game_session_id: str) -> GameSession:
         return self.session.query(GameSession).filter(GameSession.id == game_session_id).first()
@@ -307,6 +544,27 @@ class DatabaseConnector:
     def get_games_by_creator_id(self, admin_id: str) -> list[Game]:
         return self.session.query(Game).filter(Game.created_by == admin_id).all()
 
+    def get_games_page(self, admin_id: str, limit: int, after: str | None = None, before: str | None = None, offset: int = 0) -> list[Game]:
+        return self._keyset_page(Game, Game.created_by == admin_id, Game.id, limit, after, before, offset)
+
+    def count_games_by_creator_id(self, admin_id: str) -> int:
+        return self.session.query(func.count(Game.id)).filter(Game.created_by == admin_id).scalar()
+
+    def _keyset_page(self, model, criterion, order_column, limit: int, after, before, offset: int) -> list:
+        """
+        Страница строк, упорядоченных по order_column (keyset): следующие после
+        значения after или предыдущие перед before. Если есть составной индекс
+        (<фильтр>, order_column), читается ровно limit строк.
+        offset - только для кнопок без курсора.
+        """
+        query = self.session.query(model).filter(criterion)
+        if before is not None:
+            rows = query.filter(order_column < before).order_by(order_column.desc()).limit(limit).all()
+            return rows[::-1]
+        if after is not None:
+            query = query.filter(order_column > after)
+        return query.order_by(order_column).offset(offset).limit(limit).all()
+
     def get_game(self, game_id: str) -> Game:
         return self.session.query(Game).filter(Game.id == game_id).first()
 
@@ -335,6 +593,19 @@ class DatabaseConnector:
             self.session.commit()
         return user
 
+    def set_internal_user_state(self, telegram_id: int, new_state: str) -> int:
+        """
+        Записывает состояние администратора одним UPDATE, не читая строку.
+        Возвращает число обновлённых строк (0 - если пользователя нет).
+        """
+        updated = (
+            self.session.query(InternalUser)
+            .filter(InternalUser.telegram_id == telegram_id)
+            .update({"state": new_state}, synchronize_session=False)
+        )
+        self.session.commit()
+        return updated
+
     def get_internal_user_state(self, telegram_id: int) -> str:
         user = self.get_internal_user_by_telegram_id(telegram_id)
         return user.state if user else None
@@ -342,13 +613,106 @@ class DatabaseConnector:
     def commit(self):
         self.session.commit()
 
-def init_db_connector():
-    engine = create_engine('sqlite:///your_database.db', echo=True)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
+# Сессия текущего апдейта (unit of work). Каждый апдейт обрабатывается в своей
+# asyncio-задаче, поэтому значение не пересекается между параллельными апдейтами.
+current_session: ContextVar[Session | None] = ContextVar("current_session", default=None)
+
+
+class AsyncDatabaseConnector:
+    """
+    Асинхронный DatabaseConnector с тем же набором методов.
+    Вызовы выполняются в пуле потоков базы данных, поэтому блокирующие запросы
+    SQLAlchemy и fsync SQLite при commit не останавливают event loop бота.
+    Внутри unit_of_work() все вызовы используют сессию текущего апдейта,
+    вне его каждый вызов получает собственную короткую сессию.
+    Каждый изменяющий вызов коммитится сам, независимо от unit_of_work().
+    """
+    def __init__(self, session_factory: sessionmaker, executor: ThreadPoolExecutor | None = None):
+        self.session_factory = session_factory
+        self.executor = executor or ThreadPoolExecutor(max_workers=DATABASE_THREADS, thread_name_prefix="database")
+
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """
+        Открывает сессию на время обработки одного апдейта, чтобы параллельные
+        апдейты не делили одну сессию и ошибка одного не ломала сессии остальных.
+        Атомарности апдейта это не даёт: методы DatabaseConnector, изменяющие данные,
+        сами делают commit, а call_in_session завершает транзакцию после чтения.
+        При исключении откатывается только то, что ещё не было закоммичено.
+        """
+        session = self.session_factory()
+        token = current_session.set(session)
+        try:
+            yield self
+            await self.run(session.commit)
+        except Exception:
+            await self.run(session.rollback)
+            raise
+        finally:
+            current_session.reset(token)
+            await self.run(session.close)
+
+    @staticmethod
+    def call_in_session(session: Session, name: str, *args, **kwargs):
+        result = getattr(DatabaseConnector(session), name)(*args, **kwargs)
+        if not (session.new or session.dirty or session.deleted):
+            # Завершаем транзакцию чтения, чтобы соединение вернулось в пул между вызовами,
+            # иначе параллельные апдейты разбирают весь пул и ждут друг друга
+            session.commit()
+        return result
+
+    def call_in_own_session(self, name: str, *args, **kwargs):
+        with self.session_factory() as session:
+            return self.call_in_session(session, name, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not callable(getattr(DatabaseConnector, name, None)):
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            session = current_session.get()
+            if session is None:
+                return await self.run(self.call_in_own_session, name, *args, **kwargs)
+            return await self.run(self.call_in_session, session, name, *args, **kwargs)
+
+        method.__name__ = name
+        return method
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL позволяет читать параллельно с записью, synchronous=NORMAL убирает fsync на каждый commit
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def init_db_connector(database_url: str = DATABASE_URL) -> AsyncDatabaseConnector:
+    url = make_url(database_url)
+    engine_options = {"echo": DATABASE_ECHO}
+    if url.get_backend_name() == "sqlite":
+        # соединения используются из потоков базы данных, а не из потока, где были созданы
+        engine_options["connect_args"] = {"check_same_thread": False, "timeout": 30}
+        if url.database in (None, "", ":memory:"):
+            # у каждого соединения была бы своя пустая in-memory база
+            engine_options["poolclass"] = StaticPool
+        else:
+            engine_options["pool_size"] = DATABASE_POOL_SIZE
+    else:
+        engine_options["pool_size"] = DATABASE_POOL_SIZE
+    engine = create_engine(url, **engine_options)
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    upgrade(engine)
+    # expire_on_commit=False: атрибуты объектов остаются загруженными после commit,
+    # и обращение к ним из event loop не вызывает запроса к базе
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
     logger.info("База данных успешно инициализирована.")
-    db_connector = DatabaseConnector(session)
+    db_connector = AsyncDatabaseConnector(Session)
     return db_connector
 
 db_connector = init_db_connector()
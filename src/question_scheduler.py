@@ -0,0 +1,179 @@
+# question_scheduler.py
+"""
+Таймеры вопросов.
+Вместо asyncio.sleep внутри обработчика администратора каждый разосланный вопрос
+регистрирует дедлайн в колесе таймеров, и обработчик сразу завершается.
+Вопрос закрывается, когда наступил дедлайн, когда ответили все игроки сессии
+или когда администратор закрыл его кнопкой - что случится раньше.
+Дедлайн хранится в game_sessions, поэтому после перезапуска бота таймеры
+восстанавливаются, а просроченные вопросы закрываются на первом тике.
+"""
+
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Hashable
+
+from telegram import Bot
+
+from queries import AsyncDatabaseConnector, db_connector
+from logger import get_logger
+from settings import QUESTION_DURATION, SCHEDULER_TICK
+
+logger = get_logger(__name__)
+
+# число ячеек колеса: дедлайны в пределах WHEEL_SLOTS тиков срабатывают за один оборот
+WHEEL_SLOTS = 128
+
+
+class TimerWheel:
+    """
+    Хешированное колесо таймеров. Таймер попадает в ячейку (тик дедлайна) % slots
+    вместе с числом полных оборотов до срабатывания. На каждом тике просматривается
+    только одна ячейка, добавление и отмена таймера - O(1).
+    Время - секунды time.time(), чтобы дедлайны можно было сохранить в базе.
+    """
+    def __init__(self, tick: float, slots: int = WHEEL_SLOTS, now: float | None = None):
+        self.tick = tick
+        # ячейка: ключ таймера -> сколько ещё оборотов ждать
+        self.slots: list[dict[Hashable, int]] = [{} for _ in range(slots)]
+        self.positions: dict[Hashable, int] = {}
+        self.current_tick = int((time.time() if now is None else now) // tick)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, key: Hashable, deadline: float):
+        self.cancel(key)
+        target_tick = max(math.ceil(deadline / self.tick), self.current_tick + 1)
+        ticks = target_tick - self.current_tick
+        index = target_tick % len(self.slots)
+        self.slots[index][key] = (ticks - 1) // len(self.slots)
+        self.positions[key] = index
+
+    def cancel(self, key: Hashable):
+        index = self.positions.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    def advance(self, now: float) -> list[Hashable]:
+        """
+        Прокручивает колесо до момента now и возвращает ключи сработавших таймеров.
+        """
+        expired = []
+        target_tick = int(now // self.tick)
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            slot = self.slots[self.current_tick % len(self.slots)]
+            for key, rounds in list(slot.items()):
+                if rounds:
+                    slot[key] = rounds - 1
+                    continue
+                del slot[key]
+                del self.positions[key]
+                expired.append(key)
+        return expired
+
+
+class QuestionTimer:
+    __slots__ = ("game_session_id", "question_number", "deadline", "admin_id", "answered")
+
+    def __init__(self, game_session_id: str, question_number: int, deadline: float, admin_id: int):
+        self.game_session_id = game_session_id
+        self.question_number = question_number
+        self.deadline = deadline
+        self.admin_id = admin_id
+        self.answered: set[int] = set()
+
+    def __repr__(self):
+        return f"<QuestionTimer(game_session_id='{self.game_session_id}', question_number={self.question_number}, answered={len(self.answered)})>"
+
+
+class QuestionScheduler:
+    def __init__(self, connector: AsyncDatabaseConnector, tick: float = SCHEDULER_TICK):
+        self.connector = connector
+        self.tick = tick
+        self.wheel = TimerWheel(tick)
+        # game_session_id -> таймер текущего вопроса; у сессии открыт не больше одного вопроса
+        self.timers: dict[str, QuestionTimer] = {}
+        # вызывается при закрытии вопроса, назначается AdminFlow
+        self.on_close: Callable[[Bot, QuestionTimer], Awaitable[None]] | None = None
+        self.bot: Bot | None = None
+        self.task: asyncio.Task | None = None
+        self.closing: set[asyncio.Task] = set()
+
+    async def schedule(self, game_session_id: str, question_number: int, admin_id: int, duration: float = QUESTION_DURATION) -> QuestionTimer:
+        timer = QuestionTimer(game_session_id, question_number, time.time() + duration, admin_id)
+        self.timers[game_session_id] = timer
+        self.wheel.add(game_session_id, timer.deadline)
+        await self.connector.update_game_session_deadline(game_session_id, question_number, timer.deadline, admin_id)
+        return timer
+
+    def record_answer(self, game_session_id: str, telegram_id: int, player_count: int):
+        """
+        Отмечает ответ игрока. Когда ответили все, вопрос закрывается на ближайшем тике.
+        """
+        timer = self.timers.get(game_session_id)
+        if timer is None:
+            return
+        timer.answered.add(telegram_id)
+        if len(timer.answered) >= player_count:
+            self.close_now(game_session_id)
+
+    def close_now(self, game_session_id: str):
+        if game_session_id in self.timers:
+            self.wheel.add(game_session_id, time.time())
+
+    async def close(self, game_session_id: str):
+        timer = self.timers.pop(game_session_id, None)
+        if timer is None:
+            return
+        self.wheel.cancel(game_session_id)
+        logger.info(f"closing {timer}")
+        try:
+            await self.connector.clear_game_session_deadline(game_session_id)
+            if self.on_close is not None:
+                await self.on_close(self.bot, timer)
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии вопроса {timer}: {e}")
+
+    async def restore(self):
+        for game_session in await self.connector.get_game_sessions_with_deadline():
+            timer = QuestionTimer(
+                game_session.id,
+                game_session.question_number,
+                game_session.question_deadline,
+                game_session.admin_telegram_id,
+            )
+            self.timers[game_session.id] = timer
+            self.wheel.add(game_session.id, timer.deadline)
+            logger.info(f"restored {timer}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            for game_session_id in self.wheel.advance(time.time()):
+                # закрытие рассылает сообщения, тики не должны его ждать
+                task = asyncio.create_task(self.close(game_session_id))
+                self.closing.add(task)
+                task.add_done_callback(self.closing.discard)
+
+    async def start(self, bot: Bot):
+        self.bot = bot
+        if self.task is None:
+            await self.restore()
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"Планировщик вопросов запущен, открытых вопросов: {len(self.timers)}.")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.closing:
+            await asyncio.gather(*self.closing, return_exceptions=True)
+
+question_scheduler = QuestionScheduler(db_connector)
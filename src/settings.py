@@ -23,6 +23,72 @@ ADMIN_IDS = {
     ROOT_ID,
 }
 
+# База данных
+DATABASE_URL = getenv('DATABASE_URL', 'sqlite:///your_database.db')
+DATABASE_ECHO = getenv('DATABASE_ECHO', '0') == '1'
+DATABASE_POOL_SIZE = int(getenv('DATABASE_POOL_SIZE', 8))
+DATABASE_THREADS = int(getenv('DATABASE_THREADS', 8))
+
+# Сколько апдейтов обрабатывать параллельно (1 - последовательно).
+# Апдейты одного чата всегда обрабатываются по порядку (см. update_processor.py)
+CONCURRENT_UPDATES = int(getenv('CONCURRENT_UPDATES', 32))
+# Сколько апдейтов принимать в обработку, включая ждущих своей очереди
+UPDATE_QUEUE_LIMIT = int(getenv('UPDATE_QUEUE_LIMIT', 1024))
+
+# Режим получения апдейтов: polling или webhook
+BOT_MODE = getenv('BOT_MODE', 'polling')
+# Адрес Bot API, например локального сервера для бенчмарков: http://127.0.0.1:8081/bot
+BOT_API_BASE_URL = getenv('BOT_API_BASE_URL')
+# Webhook: публичный адрес, по которому Telegram присылает апдейты,
+# и адрес, который слушает сам бот
+WEBHOOK_URL = getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_PATH = getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET_TOKEN = getenv('WEBHOOK_SECRET_TOKEN')
+# Сколько одновременных соединений Telegram открывает к webhook (1..100)
+WEBHOOK_MAX_CONNECTIONS = int(getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+
+# Буфер ответов игроков: запись в базу раз в ANSWER_FLUSH_INTERVAL секунд
+# или при накоплении ANSWER_FLUSH_SIZE ответов
+ANSWER_FLUSH_INTERVAL = float(getenv('ANSWER_FLUSH_INTERVAL', 0.2))
+ANSWER_FLUSH_SIZE = int(getenv('ANSWER_FLUSH_SIZE', 100))
+# Сколько раз пробовать записать ответ; после этого ответ сохраняется в файл
+# в каталоге UNSAVED_ANSWERS_DIR, чтобы его можно было дописать в базу вручную
+ANSWER_FLUSH_RETRIES = int(getenv('ANSWER_FLUSH_RETRIES', 5))
+UNSAVED_ANSWERS_DIR = getenv('UNSAVED_ANSWERS_DIR', 'unsaved_answers')
+
+# Параметры массовой рассылки. Telegram допускает ~30 сообщений в секунду
+# на бота и ~1 сообщение в секунду в один чат.
+BROADCAST_WORKERS = int(getenv('BROADCAST_WORKERS', 16))
+BROADCAST_GLOBAL_RATE = float(getenv('BROADCAST_GLOBAL_RATE', 30))
+BROADCAST_PER_CHAT_INTERVAL = float(getenv('BROADCAST_PER_CHAT_INTERVAL', 1))
+BROADCAST_MAX_RETRIES = int(getenv('BROADCAST_MAX_RETRIES', 3))
+BROADCAST_BACKOFF_BASE = float(getenv('BROADCAST_BACKOFF_BASE', 0.5))
+
+# Сколько секунд игроки отвечают на вопрос и шаг таймера вопросов
+QUESTION_DURATION = float(getenv('QUESTION_DURATION', 63))
+SCHEDULER_TICK = float(getenv('SCHEDULER_TICK', 1))
+
+# Сколько callback-ов, не поместившихся в 64 байта, хранить на сервере
+CALLBACK_LOOKUP_SIZE = int(getenv('CALLBACK_LOOKUP_SIZE', 10000))
+
+# Сколько готовых inline-клавиатур держать в памяти (keyboard_cache.py)
+KEYBOARD_CACHE_SIZE = int(getenv('KEYBOARD_CACHE_SIZE', 2048))
+
+# Кэш состояния игроков (player_cache.py): сколько игроков и сколько секунд держать
+PLAYER_CACHE_SIZE = int(getenv('PLAYER_CACHE_SIZE', 10000))
+PLAYER_CACHE_TTL = float(getenv('PLAYER_CACHE_TTL', 600))
+
+# Сколько состояний администраторов держать в памяти (admin_sessions.py)
+ADMIN_SESSION_CACHE_SIZE = int(getenv('ADMIN_SESSION_CACHE_SIZE', 256))
+
+# Длина кода, который игроки вводят, чтобы войти в игру (game_codes.py)
+GAME_CODE_LENGTH = int(getenv('GAME_CODE_LENGTH', 4))
+
+# Каталог, куда после игры выгружается статистика (гистограммы времени ответа)
+STATS_DIR = getenv('STATS_DIR', 'stats')
+
 BEGINING = [
     {
         STATE:                  USERNAME,
@@ -0,0 +1,253 @@
+# state_machine.py
+"""
+Движок состояний по таблицам ADMIN_STATES (admin_settings.py) и GAMER_STATES (gamer_settings.py).
+При запуске таблица компилируется в граф переходов из StateNode:
+- проверяется, что у каждого состояния есть все поля, действие и зависимость известны,
+  переходы ведут в существующие состояния, кнопки переходов кодируются в callback_data,
+  а id, нужные кнопкам CALLBACK-состояния, можно получить из его зависимости.
+  Ошибка в таблице останавливает запуск (StateGraphError), а не всплывает при нажатии кнопки;
+- для каждого состояния заранее собирается шаблон клавиатуры (кнопки FORWARD_STATES
+  и BACKWARD_STATES и id, которые им нужны), клавиатуры без id собираются целиком;
+- обработчики ввода регистрируются декоратором on() по состоянию и виду ввода
+  (TEXT, IMAGE), и апдейт обрабатывается поиском в словаре вместо цепочки if/elif.
+Для каждого перехода считаются число вызовов и время обработки (metrics()).
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import admin_settings
+import gamer_settings
+from admin_constants import ADMIN
+from callback_codec import ACTION_IDS, encode_callback
+from constants import *
+from gamer_constants import GAMER
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+STATE_FIELDS = (LABEL, DEPENDENCIES, BEGIN_MESSAGE, ACTION, FORWARD_STATES, BACKWARD_STATES, END_MESSAGE)
+STATE_ACTIONS = (CALLBACK, TEXT, LIST, IMAGE, None)
+
+
+class StateGraphError(ValueError):
+    pass
+
+
+class ButtonTemplate:
+    __slots__ = ("target", "label", "dependency")
+
+    def __init__(self, target: str, label: str, dependency: str | None):
+        self.target = target
+        self.label = label
+        self.dependency = dependency
+
+
+class StateNode:
+    __slots__ = ("name", "label", "dependency", "begin_message", "action", "forward", "backward", "end_message", "buttons", "needs", "markup")
+
+    def __init__(self, name: str, description: dict):
+        self.name = name
+        self.label = description[LABEL]
+        self.dependency = description[DEPENDENCIES]
+        self.begin_message = description[BEGIN_MESSAGE]
+        self.action = description[ACTION]
+        self.forward = tuple(description[FORWARD_STATES] or ())
+        self.backward = tuple(description[BACKWARD_STATES] or ())
+        self.end_message = description[END_MESSAGE]
+        # заполняются при компиляции
+        self.buttons: tuple[ButtonTemplate, ...] = ()
+        self.needs: frozenset[str] = frozenset()
+        self.markup: InlineKeyboardMarkup | None = None
+
+    @property
+    def transitions(self) -> tuple[str, ...]:
+        return self.forward + self.backward
+
+    def __repr__(self):
+        return f"<StateNode({self.name}, action={self.action}, transitions={self.transitions})>"
+
+
+class TransitionStats:
+    __slots__ = ("count", "total_s", "max_s")
+
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_s / self.count * 1000, 3) if self.count else 0,
+            "max_ms": round(self.max_s * 1000, 3),
+        }
+
+
+class StateMachine:
+    def __init__(self, scope: str, states: dict[str, dict], dependency_ids: dict[str | None, tuple], input_kinds: tuple[str, ...], keyboards: bool = False):
+        """
+        dependency_ids - какие id известны в состоянии с данной зависимостью (DEPENDENCIES).
+        input_kinds - виды ввода, для которых у каждого такого состояния должен быть обработчик.
+        keyboards - строить ли клавиатуры переходов (кнопки кодируются в callback_data).
+        """
+        self.scope = scope
+        self.states = states
+        self.dependency_ids = dependency_ids
+        self.input_kinds = input_kinds
+        self.keyboards = keyboards
+        self.nodes: dict[str, StateNode] = {}
+        self.handlers: dict[tuple[str, str], Callable[..., Awaitable[Any]]] = {}
+        self.timings: dict[str, TransitionStats] = {}
+
+    def on(self, state: str, kind: str):
+        """
+        Регистрирует обработчик ввода вида kind (TEXT, IMAGE) в состоянии state.
+        """
+        def decorator(handler):
+            if (state, kind) in self.handlers:
+                raise StateGraphError(f"{self.scope}: обработчик {kind} для '{state}' уже зарегистрирован")
+            self.handlers[(state, kind)] = handler
+            return handler
+        return decorator
+
+    def validate(self) -> list[str]:
+        errors = []
+        for name, description in self.states.items():
+            missing = [field for field in STATE_FIELDS if field not in description]
+            if missing:
+                errors.append(f"'{name}': нет полей {missing}")
+                continue
+            if description[ACTION] not in STATE_ACTIONS:
+                errors.append(f"'{name}': неизвестное действие '{description[ACTION]}'")
+            if description[DEPENDENCIES] not in self.dependency_ids:
+                errors.append(f"'{name}': неизвестная зависимость '{description[DEPENDENCIES]}'")
+            for field in (FORWARD_STATES, BACKWARD_STATES):
+                targets = description[field]
+                if targets is None:
+                    continue
+                if not isinstance(targets, (list, tuple)):
+                    errors.append(f"'{name}': {field} должен быть списком, а не {type(targets).__name__}")
+                    continue
+                for target in targets:
+                    if target not in self.states:
+                        errors.append(f"'{name}': переход в неизвестное состояние '{target}'")
+                        continue
+                    if self.keyboards and target not in ACTION_IDS:
+                        errors.append(f"'{name}': переход '{target}' нельзя закодировать в callback_data")
+                    if self.keyboards and not self.states[target].get(LABEL):
+                        errors.append(f"'{name}': у состояния '{target}' нет подписи для кнопки")
+                    # кнопки CALLBACK-состояния строятся из его id, у остальных id приходят с вводом
+                    if (description[ACTION] == CALLBACK
+                            and description[DEPENDENCIES] in self.dependency_ids
+                            and self.states[target].get(DEPENDENCIES) is not None
+                            and self.states[target].get(DEPENDENCIES) not in self.dependency_ids[description[DEPENDENCIES]]):
+                        errors.append(f"'{name}': для перехода '{target}' нужен {self.states[target][DEPENDENCIES]}, а он неизвестен")
+        for (state, kind) in self.handlers:
+            if state not in self.states:
+                errors.append(f"обработчик {kind} для неизвестного состояния '{state}'")
+            elif self.states[state].get(ACTION) != kind:
+                errors.append(f"обработчик {kind} для '{state}', а состояние ожидает {self.states[state].get(ACTION)}")
+        for name, description in self.states.items():
+            if description.get(ACTION) in self.input_kinds and (name, description[ACTION]) not in self.handlers:
+                errors.append(f"'{name}': нет обработчика {description[ACTION]}")
+        return errors
+
+    def compile(self):
+        """
+        Проверяет таблицу состояний и строит граф. StateGraphError - если таблица некорректна.
+        """
+        errors = self.validate()
+        if errors:
+            raise StateGraphError(f"Некорректная таблица состояний {self.scope}:\n" + "\n".join(errors))
+        nodes = {name: StateNode(name, description) for name, description in self.states.items()}
+        for node in nodes.values():
+            if not self.keyboards or node.action == LIST:
+                # клавиатуру LIST-состояния собирает список строк
+                continue
+            node.buttons = tuple(
+                ButtonTemplate(target, nodes[target].label, nodes[target].dependency)
+                for target in node.transitions
+            )
+            node.needs = frozenset(button.dependency for button in node.buttons if button.dependency is not None)
+            if node.buttons and not node.needs:
+                node.markup = self.render(node, {})
+        self.nodes = nodes
+        transitions = sum(len(node.transitions) for node in nodes.values())
+        logger.info(f"Граф состояний {self.scope}: состояний {len(nodes)}, переходов {transitions}, обработчиков {len(self.handlers)}")
+
+    def get(self, state: str) -> StateNode | None:
+        return self.nodes.get(state)
+
+    def node(self, state: str) -> StateNode:
+        return self.nodes[state]
+
+    def render(self, node: StateNode, ids: dict[str, str]) -> InlineKeyboardMarkup | None:
+        keyboard = []
+        for button in node.buttons:
+            if button.dependency is None:
+                args = ()
+            elif ids.get(button.dependency) is not None:
+                args = (ids[button.dependency],)
+            else:
+                logger.debug(f"{node.name}: для кнопки '{button.target}' нет {button.dependency}")
+                return None
+            keyboard.append([InlineKeyboardButton(button.label, callback_data=encode_callback(self.scope, button.target, *args))])
+        return InlineKeyboardMarkup(keyboard) if keyboard else None
+
+    def keyboard(self, state: str, ids: dict[str, str]) -> InlineKeyboardMarkup | None:
+        """
+        Клавиатура переходов состояния. ids - известные id по зависимостям (GAME_ID, ...).
+        None - если у состояния нет кнопок или не хватает id.
+        """
+        node = self.nodes.get(state)
+        if node is None:
+            logger.error(f"state '{state}' does not exists")
+            return None
+        if node.markup is not None:
+            return node.markup
+        if not node.buttons:
+            return None
+        return self.render(node, ids)
+
+    @contextmanager
+    def timer(self, source: str | None, trigger: str):
+        """
+        Замеряет время перехода из source по trigger (целевое состояние или вид ввода).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            key = f"{source}>{trigger}"
+            stats = self.timings.get(key)
+            if stats is None:
+                stats = self.timings[key] = TransitionStats()
+            stats.record(time.perf_counter() - started)
+
+    async def dispatch(self, owner: object, state: str, kind: str, *args) -> bool:
+        """
+        Вызывает обработчик ввода kind в состоянии state как метод owner.
+        Возвращает False, если в этом состоянии такой ввод не ожидается.
+        """
+        handler = self.handlers.get((state, kind))
+        if handler is None:
+            return False
+        with self.timer(state, kind):
+            await handler(owner, *args)
+        return True
+
+    def metrics(self) -> dict:
+        return {key: stats.to_dict() for key, stats in sorted(self.timings.items())}
+
+
+admin_states = StateMachine(ADMIN, admin_settings.ADMIN_STATES, admin_settings.DEPENDENCY_IDS, input_kinds=(TEXT, IMAGE), keyboards=True)
+gamer_states = StateMachine(GAMER, gamer_settings.GAMER_STATES, {None: ()}, input_kinds=(TEXT,))
@@ -0,0 +1,125 @@
+# update_processor.py
+"""
+Параллельная обработка апдейтов с сохранением порядка внутри чата.
+Апдейты разных чатов обрабатываются одновременно (не больше CONCURRENT_UPDATES),
+а апдейты одного чата - строго по очереди, в порядке получения: у каждого чата
+своя блокировка, и слот обработки апдейт занимает только после неё, поэтому
+длинная рассылка администратора не держит нажатия кнопок игроками.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from broadcaster import percentile
+from logger import get_logger
+from settings import CONCURRENT_UPDATES, UPDATE_QUEUE_LIMIT
+
+logger = get_logger(__name__)
+
+# сколько последних замеров ожидания в очереди хранить для перцентилей
+WAIT_LATENCY_WINDOW = 1024
+
+
+class ChatLane:
+    """
+    Очередь одного чата: блокировка и число его апдейтов, ждущих или обрабатываемых.
+    """
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int = CONCURRENT_UPDATES, max_pending_updates: int = UPDATE_QUEUE_LIMIT):
+        # семафор базового класса ограничивает число принятых апдейтов (ждущих и обрабатываемых),
+        # одновременную обработку ограничивает self.slots
+        super().__init__(max(max_pending_updates, max_concurrent_updates, 2))
+        self.concurrency = max_concurrent_updates
+        self.slots = asyncio.Semaphore(max_concurrent_updates)
+        self.lanes: dict[int, ChatLane] = {}
+        # метрики
+        self.queued = 0
+        self.active = 0
+        self.max_queue_depth = 0
+        self.max_chat_queue_depth = 0
+        self.processed = 0
+        self.failed = 0
+        self.wait_latencies: deque[float] = deque(maxlen=WAIT_LATENCY_WINDOW)
+
+    @staticmethod
+    def chat_key(update: object) -> int | None:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        chat_id = self.chat_key(update)
+        if chat_id is None:
+            await self.run(coroutine, time.monotonic())
+            return
+
+        lane = self.lanes.get(chat_id)
+        if lane is None:
+            lane = self.lanes[chat_id] = ChatLane()
+        lane.pending += 1
+        self.max_chat_queue_depth = max(self.max_chat_queue_depth, lane.pending)
+        try:
+            # asyncio.Lock отдаёт блокировку ожидающим по очереди, поэтому порядок апдейтов чата сохраняется
+            async with lane.lock:
+                await self.run(coroutine, time.monotonic())
+        finally:
+            lane.pending -= 1
+            if lane.pending == 0:
+                del self.lanes[chat_id]
+
+    async def run(self, coroutine: Awaitable[Any], queued_at: float):
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        self.wait_latencies.append(time.monotonic() - queued_at)
+        self.active += 1
+        try:
+            await coroutine
+        except Exception:
+            # Application сам передаёт ошибки обработчиков в error handler, сюда доходят только сбои вне их
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self.processed += 1
+            self.slots.release()
+
+    async def initialize(self):
+        logger.info(f"Обработка апдейтов: {self.concurrency} параллельно, порядок внутри чата сохраняется.")
+
+    async def shutdown(self):
+        logger.info(f"Обработка апдейтов остановлена: {self.metrics()}")
+
+    def metrics(self) -> dict:
+        latencies = list(self.wait_latencies)
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "max_chat_queue_depth": self.max_chat_queue_depth,
+            "active": self.active,
+            "chats": len(self.lanes),
+            "processed": self.processed,
+            "failed": self.failed,
+            "wait_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "wait_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        }
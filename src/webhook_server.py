@@ -0,0 +1,124 @@
+# webhook_server.py
+"""
+Приём апдейтов через webhook.
+Telegram присылает каждый апдейт POST-запросом; обработчик только проверяет
+секретный токен, разбирает JSON и кладёт апдейт в очередь Application,
+а обработка идёт параллельно (CONCURRENT_UPDATES), как и при polling.
+Сервер на aiohttp: pip install aiohttp.
+"""
+
+import asyncio
+import signal
+
+from telegram import Update
+from telegram.ext import Application
+
+from logger import get_logger
+from settings import (
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_MAX_CONNECTIONS,
+)
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+logger = get_logger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(
+            self,
+            application: Application,
+            listen: str = WEBHOOK_LISTEN,
+            port: int = WEBHOOK_PORT,
+            path: str = WEBHOOK_PATH,
+            secret_token: str | None = WEBHOOK_SECRET_TOKEN,
+            ):
+        if web is None:
+            raise RuntimeError("Для режима webhook нужен aiohttp: pip install aiohttp")
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.runner: web.AppRunner | None = None
+        self.received = 0
+
+    async def handle_update(self, request: "web.Request") -> "web.Response":
+        if self.secret_token and request.headers.get(SECRET_TOKEN_HEADER) != self.secret_token:
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        update = Update.de_json(data, self.application.bot)
+        self.received += 1
+        # Telegram ждёт ответа на каждый запрос, поэтому обработка идёт после ответа
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.listen, self.port).start()
+        logger.info(f"Webhook слушает {self.listen}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+async def run_webhook(
+        application: Application,
+        webhook_url: str | None = WEBHOOK_URL,
+        max_connections: int = WEBHOOK_MAX_CONNECTIONS,
+        stop_event: asyncio.Event | None = None,
+        server: WebhookServer | None = None,
+        ):
+    """
+    Аналог application.run_polling() для webhook: запускает Application и сервер,
+    регистрирует webhook в Bot API и работает до SIGINT/SIGTERM или stop_event.
+    """
+    if not webhook_url:
+        raise ValueError("WEBHOOK_URL не задан")
+    server = server or WebhookServer(application)
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    await server.start()
+    try:
+        await application.bot.set_webhook(
+            url=f"{webhook_url.rstrip('/')}{server.path}",
+            secret_token=server.secret_token,
+            max_connections=max_connections,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        logger.info("Bot started successfully (webhook)!")
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
+        logger.info(f"Webhook остановлен, получено апдейтов: {server.received}")